@@ -0,0 +1,10 @@
+"""
+URL configuration of requests served by ASGI(see api/asgi.py).
+
+Routes are the same as in api.urls, but GET of categories, recipes and authors
+is served by async views of recipes.async_views.AsyncReadMixin.
+"""
+from api.urls import urlpatterns as wsgi_urlpatterns
+from recipes.async_views import async_patterns
+
+urlpatterns = async_patterns(wsgi_urlpatterns)
@@ -53,6 +53,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Outermost, so that time of all other middleware is measured
+    'recipes.metrics.MetricsMiddleware',
     'debug_toolbar.middleware.DebugToolbarMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -94,11 +96,43 @@ DATABASES = {
         'HOST': env("DB_HOST"),
         'USER': env("DB_USER"),
         'PASSWORD': env("DB_PASSWORD"),
-        'PORT': env("DB_PORT")
+        'PORT': env("DB_PORT"),
+        # Connections are reused by requests and by threads that run
+        # concurrent queries of async views(see recipes/async_views.py)
+        'CONN_MAX_AGE': env.int('DB_CONN_MAX_AGE', default=60),
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+# Local memory cache is separate for each process, shared cache
+# (e.g. Redis or Memcached) is required when running several workers in production,
+# as versions of cached responses and changes of ingredient index are shared through it,
+# 'django.core.cache.backends.filebased.FileBasedCache' can stand in for it locally
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+# Cache of GET responses of categories, recipes and authors(see recipes/cache.py)
+RESPONSE_CACHE = {
+    'ALIAS': 'default',
+    'TIMEOUT': 300,
+    'LOCK_TIMEOUT': 5,
+    'MAX_WAIT': 0.25,
+}
+
+# Metrics of endpoints served at /metrics(see recipes/metrics.py),
+# DIRECTORY has to be set when server runs several worker processes
+METRICS = {
+    'DIRECTORY': env('METRICS_DIRECTORY', default=None),
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -161,6 +195,9 @@ SIMPLE_JWT = {
 }
 
 DJOSER = {
+    # Only JWT is used, so there are no tokens to delete when user logs out
+    # or deletes account
+    'TOKEN_MODEL': None,
     'SERIALIZERS': {
         'user_create': 'users.serializers.UserCreateSerializer',
         'current_user': 'users.serializers.UserSerializer'
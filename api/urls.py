@@ -18,11 +18,13 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
+from recipes.metrics import metrics_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
-    path('auth/', include('djoser.urls')),
+    path('auth/', include('users.urls')),
     path('auth/', include('djoser.urls.jwt')),
+    path('metrics', metrics_view, name='metrics'),
     path('', include('recipes.urls')),
     path("__debug__/", include("debug_toolbar.urls")),
 ]
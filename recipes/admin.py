@@ -4,7 +4,8 @@ from django.db.models import Avg, Count
 from django.db.models.query import QuerySet
 from django.http.request import HttpRequest
 from django.utils.html import format_html
-from recipes.models import Recipe, RecipeImage, Rating, Review, Category, Ingredient
+from recipes.models import Recipe, RecipeImage, Rating, Review, Category, Ingredient, \
+    CanonicalIngredient, IngredientAlias
 
 
 @admin.register(Category)
@@ -51,12 +52,26 @@ class IngredientAdmin(admin.ModelAdmin):
                    'quantity', 'units_of_measurement']
 
     search_fields = ['name']
+    # It is resolved from name on save
+    exclude = ['canonical']
 
     def get_queryset(self, request):
         return super().get_queryset(request).\
             select_related('recipe')
 
 
+class IngredientAliasInline(admin.TabularInline):
+    model = IngredientAlias
+    extra = 0
+
+
+@admin.register(CanonicalIngredient)
+class CanonicalIngredientAdmin(admin.ModelAdmin):
+    list_display = ['name', 'slug']
+    search_fields = ['name', 'slug']
+    inlines = [IngredientAliasInline]
+
+
 @admin.register(Review)
 class ReviewAdmin(admin.ModelAdmin):
     list_display = [
@@ -96,9 +111,10 @@ class RecipeImageAdmin(admin.ModelAdmin):
     list_filter = [
         'recipe'
     ]
-    readonly_fields = ['image']
+    readonly_fields = ['image', 'width', 'height', 'variants']
 
     def image_tag(self, obj):
-        return format_html(f'<img src="{obj.image.url}" width="50" height="50">')
+        return format_html('<img src="{}" width="50" height="50">',
+                           obj.get_variant_url('thumbnail'))
 
     image_tag.short_description = 'Recipe image'
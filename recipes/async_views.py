@@ -0,0 +1,227 @@
+import asyncio
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.paginator import InvalidPage
+from django.db import close_old_connections, connection
+from django.http import Http404
+from django.urls import URLPattern, URLResolver
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from recipes.metrics import get_serialized_data
+from recipes.pagination import PageNumberOrCursorPagination
+from recipes.streaming import astream_serialized_list
+
+
+def uses_persistent_connections():
+    return connection.settings_dict['CONN_MAX_AGE'] != 0
+
+
+def run_in_own_connection(function):
+    # Persistent connection of thread is checked like at start of request,
+    # it is closed only when it is broken or older than CONN_MAX_AGE
+    close_old_connections()
+    return function()
+
+
+async def run_query(function):
+    # Async ORM of Django runs all queries of request one after another
+    # in the same thread, so independent queries are run in threads
+    # of their own, each with its own persistent database connection.
+    # Without persistent connections every query would open a new one,
+    # so queries are run one after another in thread of request.
+    if not uses_persistent_connections():
+        return await sync_to_async(function)()
+    return await sync_to_async(run_in_own_connection, thread_sensitive=False)(function)
+
+
+async def gather_queries(*functions):
+    return await asyncio.gather(*[run_query(function) for function in functions])
+
+
+async def apaginate_queryset(paginator, queryset, request, view=None):
+    if isinstance(paginator, PageNumberOrCursorPagination):
+        if paginator.use_cursor(request):
+            return await sync_to_async(paginator.paginate_queryset)(queryset, request, view)
+        paginator.paginator = paginator.page_number_class()
+        return await apaginate_queryset(paginator.paginator, queryset, request, view)
+    if isinstance(paginator, PageNumberPagination):
+        return await apaginate_by_page_number(paginator, queryset, request)
+    return await sync_to_async(paginator.paginate_queryset)(queryset, request, view)
+
+
+async def apaginate_by_page_number(paginator, queryset, request):
+    # Same as PageNumberPagination.paginate_queryset, but objects of page
+    # are loaded concurrently with count, when number of page is known
+    page_size = paginator.get_page_size(request)
+    if not page_size:
+        return None
+    django_paginator = paginator.django_paginator_class(queryset, page_size)
+    page_number = request.query_params.get(paginator.page_query_param) or 1
+    queries = [queryset.count]
+    bottom = -1
+    if page_number not in paginator.last_page_strings:
+        try:
+            bottom = (int(page_number) - 1) * page_size
+        except ValueError:
+            pass
+    if bottom >= 0:
+        queries.append(lambda: list(queryset[bottom:bottom + page_size]))
+    results = await gather_queries(*queries)
+    django_paginator.count = results[0]
+    if page_number in paginator.last_page_strings:
+        # Last page can only be found after count
+        page_number = django_paginator.num_pages
+    try:
+        page = django_paginator.page(page_number)
+    except InvalidPage as exc:
+        msg = paginator.invalid_page_message.format(
+            page_number=page_number, message=str(exc)
+        )
+        raise NotFound(msg)
+    if len(results) > 1:
+        page.object_list = results[1]
+    else:
+        page.object_list = [obj async for obj in page.object_list]
+    if django_paginator.num_pages > 1 and paginator.template is not None:
+        paginator.display_page_controls = True
+    paginator.page = page
+    paginator.request = request
+    return list(page)
+
+
+def set_prefetched_objects(instance, name, objects):
+    # Does what prefetch_related does with objects that were loaded separately,
+    # so that instance.<name>.all() returns them without query
+    manager = getattr(instance, name)
+    field_name = getattr(type(instance), name).field.name
+    for obj in objects:
+        setattr(obj, field_name, instance)
+    queryset = manager.get_queryset()
+    queryset._result_cache = objects
+    queryset._prefetch_done = True
+    if not hasattr(instance, '_prefetched_objects_cache'):
+        instance._prefetched_objects_cache = {}
+    instance._prefetched_objects_cache[name] = queryset
+
+
+class AsyncReadMixin:
+    # Async implementations of GET of viewset, served under ASGI,
+    # action 'list' is implemented by 'alist', 'get_recipes' by 'aget_recipes'
+    # and so on. Other methods and actions are served by sync dispatch.
+    async_actions = ['list', 'retrieve']
+
+    @classmethod
+    def as_async_view(cls, actions, **initkwargs):
+        sync_view = cls.as_view(actions, **initkwargs)
+
+        async def view(request, *args, **kwargs):
+            if request.method != 'GET' or actions.get('get') not in cls.async_actions:
+                return await sync_to_async(sync_view)(request, *args, **kwargs)
+            self = cls(**initkwargs)
+            self.action_map = actions
+            return await self.adispatch(request, *args, **kwargs)
+
+        view.cls = cls
+        view.initkwargs = sync_view.initkwargs
+        view.actions = actions
+        view.csrf_exempt = True
+        return view
+
+    async def adispatch(self, request, *args, **kwargs):
+        # Same as APIView.dispatch, handler can be wrapped in ainitial
+        # by mixins of viewset, e.g. to cache response
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+        try:
+            self.async_handler = getattr(self, f'a{self.action}')
+            await self.ainitial(request, *args, **kwargs)
+            response = await self.async_handler(request, *args, **kwargs)
+        except Exception as exc:
+            response = self.handle_exception(exc)
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+    async def ainitial(self, request, *args, **kwargs):
+        # Authentication, permissions and throttling of DRF are sync,
+        # database is used by them only if request has credentials
+        await sync_to_async(APIView.initial)(self, request, *args, **kwargs)
+
+    def get_object_queryset(self):
+        # Queryset of get_object, with lookup from url
+        queryset = self.filter_queryset(self.get_queryset())
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            return queryset.filter(**{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+        except (TypeError, ValueError, DjangoValidationError):
+            raise Http404
+
+    def check_object(self, obj):
+        if obj is None:
+            raise Http404
+        self.check_object_permissions(self.request, obj)
+        return obj
+
+    async def alist(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = await apaginate_queryset(self.paginator, queryset, request, self)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(get_serialized_data(serializer))
+        serializer = self.get_serializer([obj async for obj in queryset], many=True)
+        return Response(get_serialized_data(serializer))
+
+    async def aretrieve(self, request, *args, **kwargs):
+        instance = self.check_object(await self.get_object_queryset().afirst())
+        serializer = self.get_serializer(instance)
+        return Response(get_serialized_data(serializer))
+
+    async def aget_sub_collection_response(self, queryset, lookup, serializer_class, ordering):
+        # Same as SubCollectionMixin.get_sub_collection_response, object from url
+        # is loaded concurrently with page of its collection
+        object_queryset = self.get_object_queryset()
+        try:
+            queryset = queryset.filter(**{lookup: self.kwargs['pk']}).order_by(*ordering)
+        except (TypeError, ValueError, DjangoValidationError):
+            raise Http404
+        context = {'request': self.request}
+        if self.request.query_params.get(self.stream_query_param) == 'true':
+            self.check_object(await object_queryset.afirst())
+            return astream_serialized_list(queryset, serializer_class, context)
+        paginator = PageNumberOrCursorPagination(ordering=ordering)
+        obj, page = await asyncio.gather(
+            run_query(object_queryset.first),
+            apaginate_queryset(paginator, queryset, self.request),
+            return_exceptions=True
+        )
+        if isinstance(obj, Exception):
+            raise obj
+        self.check_object(obj)
+        if isinstance(page, Exception):
+            raise page
+        serializer = serializer_class(page, many=True, context=context)
+        return paginator.get_paginated_response(get_serialized_data(serializer))
+
+
+def async_patterns(patterns):
+    # Returns copy of urlpatterns, where views of viewsets with AsyncReadMixin
+    # are replaced with their async views
+    result = []
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            result.append(URLResolver(pattern.pattern, async_patterns(pattern.url_patterns),
+                                      pattern.default_kwargs, pattern.app_name,
+                                      pattern.namespace))
+            continue
+        view_class = getattr(pattern.callback, 'cls', None)
+        if view_class is not None and issubclass(view_class, AsyncReadMixin):
+            callback = view_class.as_async_view(pattern.callback.actions,
+                                                **pattern.callback.initkwargs)
+            pattern = URLPattern(pattern.pattern, callback,
+                                 pattern.default_args, pattern.name)
+        result.append(pattern)
+    return result
@@ -0,0 +1,36 @@
+import sys
+from django.conf import settings
+
+
+AUTOCOMPLETE = {
+    'DEFAULT_LIMIT': 10,
+    'MAX_LIMIT': 50,
+}
+
+
+def get_autocomplete_settings():
+    return {**AUTOCOMPLETE, **getattr(settings, 'AUTOCOMPLETE', {})}
+
+
+def prefix_upper_bound(prefix):
+    # The smallest string that is greater than all strings starting with prefix,
+    # None if there is no such string
+    while prefix and ord(prefix[-1]) == sys.maxunicode:
+        prefix = prefix[:-1]
+    if not prefix:
+        return None
+    code_point = ord(prefix[-1]) + 1
+    # Surrogates cannot be encoded, so they are skipped
+    if 0xD800 <= code_point <= 0xDFFF:
+        code_point = 0xE000
+    return prefix[:-1] + chr(code_point)
+
+
+def prefix_range(field, prefix):
+    # Filter of strings starting with prefix written as range of values,
+    # unlike 'LIKE prefix%' it is read from index by every database
+    lookups = {f'{field}__gte': prefix}
+    upper_bound = prefix_upper_bound(prefix)
+    if upper_bound is not None:
+        lookups[f'{field}__lt'] = upper_bound
+    return lookups
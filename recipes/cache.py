@@ -0,0 +1,276 @@
+import asyncio
+import hashlib
+import time
+from string import Formatter
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+
+RESPONSE_CACHE = {
+    'ALIAS': 'default',
+    # Seconds cached response is kept
+    'TIMEOUT': 300,
+    # Seconds in which lock of request that computes response expires
+    'LOCK_TIMEOUT': 5,
+    # Seconds other requests wait for response that is being computed,
+    # if there is no previous response to serve meanwhile
+    'MAX_WAIT': 0.25,
+    'POLL_INTERVAL': 0.05,
+}
+
+SEQUENCE_KEY = 'response-tag:sequence'
+
+
+def get_response_cache_settings():
+    return {**RESPONSE_CACHE, **getattr(settings, 'RESPONSE_CACHE', {})}
+
+
+def get_cache():
+    return caches[get_response_cache_settings()['ALIAS']]
+
+
+def tag_key(tag):
+    return f'response-tag:{tag}'
+
+
+# Invalidations are numbered by a counter shared through cache, version
+# of tag is number of its last invalidation. Response is fresh while
+# versions of all its tags are not greater than the number that was
+# current when it started to be computed. Counter starts from current time,
+# so that numbers keep growing after cache was cleared.
+def get_sequence():
+    cache = get_cache()
+    sequence = cache.get(SEQUENCE_KEY)
+    if sequence is None:
+        cache.add(SEQUENCE_KEY, time.time_ns(), timeout=None)
+        sequence = cache.get(SEQUENCE_KEY)
+    return sequence
+
+
+def next_sequence():
+    get_sequence()
+    try:
+        return get_cache().incr(SEQUENCE_KEY)
+    except ValueError:
+        # Key expired between get and incr
+        return get_sequence()
+
+
+def add_missing_tags(tags):
+    # Tag that is not in cache could have been invalidated before it was
+    # evicted, so it gets current number, that is not less than number
+    # of any invalidation that already happened
+    cache = get_cache()
+    keys = [tag_key(tag) for tag in tags]
+    missing = [key for key in keys if key not in cache.get_many(keys)]
+    if missing:
+        sequence = get_sequence()
+        for key in missing:
+            cache.add(key, sequence, timeout=None)
+
+
+def set_tag_versions(tags):
+    sequence = next_sequence()
+    get_cache().set_many({tag_key(tag): sequence for tag in tags}, timeout=None)
+
+
+def invalidate_tags(tags):
+    # Versions are changed after transaction is committed, otherwise request
+    # could read data before commit and cache it as fresh
+    tags = list(tags)
+    transaction.on_commit(lambda: set_tag_versions(tags))
+
+
+def is_fresh(entry, versions):
+    return all(versions.get(tag_key(tag)) is not None and
+               versions[tag_key(tag)] <= entry['sequence']
+               for tag in entry['tags'])
+
+
+def make_entry(response, sequence, tags):
+    return {'data': response.data, 'status': response.status_code,
+            'sequence': sequence, 'tags': tags}
+
+
+def is_cacheable(response):
+    # Streamed and failed responses are not cached
+    return isinstance(response, Response) and response.status_code == 200
+
+
+def get_response(entry):
+    return Response(entry['data'], status=entry['status'])
+
+
+def get_or_compute(key, compute, tags=(), get_item_tags=None):
+    # Only one request computes response for the key at a time (single-flight),
+    # others serve previous response meanwhile or, if there is none,
+    # wait for a moment and then compute response themselves.
+    # get_item_tags returns tags of objects in computed response.
+    cache = get_cache()
+    cache_settings = get_response_cache_settings()
+    entry = cache.get(key)
+    if entry is not None and \
+            is_fresh(entry, cache.get_many([tag_key(tag) for tag in entry['tags']])):
+        return get_response(entry)
+
+    lock_key = f'{key}:lock'
+    if not cache.add(lock_key, 1, timeout=cache_settings['LOCK_TIMEOUT']):
+        if entry is not None:
+            return get_response(entry)
+        deadline = time.monotonic() + cache_settings['MAX_WAIT']
+        while time.monotonic() < deadline:
+            time.sleep(cache_settings['POLL_INTERVAL'])
+            entry = cache.get(key)
+            if entry is not None:
+                return get_response(entry)
+        return compute()
+
+    try:
+        tags = list(tags)
+        add_missing_tags(tags)
+        sequence = get_sequence()
+        response = compute()
+        if is_cacheable(response):
+            item_tags = get_item_tags(response.data) if get_item_tags else []
+            add_missing_tags(item_tags)
+            cache.set(key, make_entry(response, sequence, tags + item_tags),
+                      timeout=cache_settings['TIMEOUT'])
+        return response
+    finally:
+        cache.delete(lock_key)
+
+
+async def aget_or_compute(key, compute, tags=(), get_item_tags=None):
+    # Same as get_or_compute, for async views, compute returns coroutine
+    cache = get_cache()
+    cache_settings = get_response_cache_settings()
+    entry = await cache.aget(key)
+    if entry is not None and \
+            is_fresh(entry, await cache.aget_many([tag_key(tag) for tag in entry['tags']])):
+        return get_response(entry)
+
+    lock_key = f'{key}:lock'
+    if not await cache.aadd(lock_key, 1, timeout=cache_settings['LOCK_TIMEOUT']):
+        if entry is not None:
+            return get_response(entry)
+        deadline = time.monotonic() + cache_settings['MAX_WAIT']
+        while time.monotonic() < deadline:
+            await asyncio.sleep(cache_settings['POLL_INTERVAL'])
+            entry = await cache.aget(key)
+            if entry is not None:
+                return get_response(entry)
+        return await compute()
+
+    try:
+        tags = list(tags)
+        await sync_to_async(add_missing_tags)(tags)
+        sequence = await sync_to_async(get_sequence)()
+        response = await compute()
+        if is_cacheable(response):
+            # Item tags can be looked up in the database
+            item_tags = await sync_to_async(get_item_tags)(response.data) if get_item_tags else []
+            await sync_to_async(add_missing_tags)(item_tags)
+            await cache.aset(key, make_entry(response, sequence, tags + item_tags),
+                             timeout=cache_settings['TIMEOUT'])
+        return response
+    finally:
+        await cache.adelete(lock_key)
+
+
+class ResponseCacheMixin:
+    # Caches data of GET and HEAD responses of actions listed in cache_tags.
+    # Tags are formatted with kwargs of url, e.g. 'recipe:{pk}', and are
+    # invalidated by signals in recipes.signals when related objects change.
+    # Lists are also tagged with every object they show, e.g. 'recipe:{id}'
+    # of item_tags, so change of one object invalidates only lists with it.
+    # Templates of item_tags can name other fields of shown objects too,
+    # e.g. 'author:{author_id}', they are loaded with one query from
+    # model of item_models, by default from model of queryset.
+    # Lists ordered by a field of ordering_tags are tagged with its tag too,
+    # as change of the field in any object can move it into the page.
+    cache_tags = {}
+    item_tags = {}
+    item_models = {}
+    ordering_tags = {}
+
+    def get_cache_tags(self):
+        tags = self.cache_tags.get(self.action)
+        if tags is None:
+            return None
+        kwargs = {name: str(int(value)) if str(value).isdigit() else value
+                  for name, value in self.kwargs.items()}
+        tags = [tag.format(**kwargs) for tag in tags]
+        if self.action == 'list':
+            ordering = self.request.query_params.get(api_settings.ORDERING_PARAM, '')
+            for field in ordering.split(','):
+                tag = self.ordering_tags.get(field.strip().lstrip('-'))
+                if tag is not None and tag not in tags:
+                    tags.append(tag)
+        return tags
+
+    def get_items(self, data):
+        # Pages have results, detail is one object
+        if isinstance(data, dict):
+            return data['results'] if 'results' in data else [data]
+        return data
+
+    def get_item_ids(self, data):
+        return [item['id'] for item in self.get_items(data)
+                if isinstance(item, dict) and 'id' in item]
+
+    def get_item_tags(self, data):
+        templates = self.item_tags.get(self.action, [])
+        item_ids = self.get_item_ids(data)
+        if not templates or not item_ids:
+            return []
+        fields = {name for template in templates
+                  for _, name, _, _ in Formatter().parse(template) if name} - {'id'}
+        if fields:
+            model = self.item_models.get(self.action, self.queryset.model)
+            items = model.objects.filter(id__in=item_ids).values('id', *fields)
+        else:
+            items = [{'id': item_id} for item_id in item_ids]
+        tags = [template.format(**item) for item in items for template in templates]
+        return list(dict.fromkeys(tags))
+
+    def get_cache_key(self, request):
+        # Hyperlinks in responses are built from host and scheme of request
+        authenticator = request.successful_authenticator
+        auth = type(authenticator).__name__ if authenticator else 'anonymous'
+        key = '|'.join([request.scheme, request.get_host(), request.get_full_path(), auth])
+        return 'response:' + hashlib.md5(key.encode()).hexdigest()
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        # Handler is looked up by dispatch after initial,
+        # so it is replaced here, when user was already authenticated
+        # and permissions were checked
+        if request.method in ('GET', 'HEAD'):
+            tags = self.get_cache_tags()
+            if tags is not None:
+                method = request.method.lower()
+                handler = getattr(self, method)
+                key = self.get_cache_key(request)
+
+                def cached_handler(request, *args, **kwargs):
+                    return get_or_compute(key, lambda: handler(request, *args, **kwargs),
+                                          tags, self.get_item_tags)
+                setattr(self, method, cached_handler)
+
+    async def ainitial(self, request, *args, **kwargs):
+        # Same as initial, for async handlers of recipes.async_views.AsyncReadMixin
+        await super().ainitial(request, *args, **kwargs)
+        if request.method in ('GET', 'HEAD'):
+            tags = self.get_cache_tags()
+            if tags is not None:
+                handler = self.async_handler
+                key = self.get_cache_key(request)
+
+                async def cached_handler(request, *args, **kwargs):
+                    return await aget_or_compute(key, lambda: handler(request, *args, **kwargs),
+                                                 tags, self.get_item_tags)
+                self.async_handler = cached_handler
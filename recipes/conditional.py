@@ -0,0 +1,121 @@
+import hashlib
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Count, F, Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+
+class ConditionalGetMixin:
+    # Answers GET and HEAD requests of list and retrieve with '304 Not Modified'
+    # if client's If-None-Match or If-Modified-Since still match. Validators are
+    # derived from 'updated' of object, or from max('updated') and count of
+    # filtered objects for list, so response is not serialized to compute them.
+    # 'updated' of related objects in validator_relations is added, as their
+    # fields are shown too, e.g. title of category of recipe. Timestamps
+    # in validator_fields are added as well, they are changed by writes that
+    # should not change 'updated', e.g. aggregates of ratings of recipe.
+    conditional_actions = ['list', 'retrieve']
+    validator_relations = []
+    validator_fields = []
+
+    def uses_conditional_get(self):
+        return self.request.method in ('GET', 'HEAD') and \
+            self.action in self.conditional_actions
+
+    def get_validators_queryset(self):
+        queryset = self.filter_queryset(self.get_queryset())
+        if self.action == 'retrieve':
+            lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+            try:
+                queryset = queryset.\
+                    filter(**{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+            except (TypeError, ValueError, DjangoValidationError):
+                # Handler will respond with 404
+                return None
+            return queryset.values('updated', *self.validator_fields,
+                                   **self.get_related_validators_fields())
+        return queryset
+
+    def get_related_validators_fields(self):
+        return {f'{relation}_updated': F(f'{relation}__updated')
+                for relation in self.validator_relations}
+
+    def get_validators_aggregates(self):
+        return {'updated': Max('updated'), 'count': Count('pk'),
+                **{field: Max(field) for field in self.validator_fields},
+                **{name: Max(field) for name, field in self.get_related_validators_fields().items()}}
+
+    def get_validators(self):
+        queryset = self.get_validators_queryset()
+        if queryset is None:
+            return None
+        if self.action == 'retrieve':
+            values = queryset.first()
+        else:
+            values = queryset.aggregate(**self.get_validators_aggregates())
+        return self.build_validators(values)
+
+    async def aget_validators(self):
+        queryset = self.get_validators_queryset()
+        if queryset is None:
+            return None
+        if self.action == 'retrieve':
+            values = await queryset.afirst()
+        else:
+            values = await queryset.aaggregate(**self.get_validators_aggregates())
+        return self.build_validators(values)
+
+    def build_validators(self, values):
+        if values is None:
+            # Handler will respond with 404
+            return None
+        names = ['updated', *self.validator_fields, *self.get_related_validators_fields()]
+        updated = [values[name] for name in names if values[name] is not None]
+        last_modified = int(max(updated).timestamp()) if updated else None
+        # Representation depends on renderer, e.g. JSON or browsable API
+        key = '|'.join(str(values[name]) for name in sorted(values))
+        key += '|' + str(self.request.accepted_media_type)
+        etag = 'W/"%s"' % hashlib.md5(key.encode()).hexdigest()
+        return etag, last_modified
+
+    def set_validators_headers(self, response, etag, last_modified):
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            if last_modified is not None:
+                response['Last-Modified'] = http_date(last_modified)
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if self.uses_conditional_get():
+            validators = self.get_validators()
+            if validators is not None:
+                method = request.method.lower()
+                handler = getattr(self, method)
+                etag, last_modified = validators
+
+                def conditional_handler(request, *args, **kwargs):
+                    response = get_conditional_response(request, etag=etag,
+                                                        last_modified=last_modified)
+                    if response is None:
+                        response = handler(request, *args, **kwargs)
+                    self.set_validators_headers(response, etag, last_modified)
+                    return response
+                setattr(self, method, conditional_handler)
+
+    async def ainitial(self, request, *args, **kwargs):
+        # Same as initial, for async handlers of recipes.async_views.AsyncReadMixin
+        await super().ainitial(request, *args, **kwargs)
+        if self.uses_conditional_get():
+            validators = await self.aget_validators()
+            if validators is not None:
+                handler = self.async_handler
+                etag, last_modified = validators
+
+                async def conditional_handler(request, *args, **kwargs):
+                    response = get_conditional_response(request, etag=etag,
+                                                        last_modified=last_modified)
+                    if response is None:
+                        response = await handler(request, *args, **kwargs)
+                    self.set_validators_headers(response, etag, last_modified)
+                    return response
+                self.async_handler = conditional_handler
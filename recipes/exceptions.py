@@ -14,3 +14,15 @@ class ConflictException(APIException):
         if detail is None:
             detail = force_str(self.default_detail).format(method=method)
         super().__init__(detail, code)
+
+
+class RequestEntityTooLarge(APIException):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = _('Request body is too large.')
+    default_code = 'request_entity_too_large'
+
+
+class RequestTimeout(APIException):
+    status_code = status.HTTP_408_REQUEST_TIMEOUT
+    default_detail = _('Request body was not received in time.')
+    default_code = 'request_timeout'
@@ -0,0 +1,56 @@
+from functools import reduce
+from operator import or_
+from django.db.models import Count, Sum, Q
+from rest_framework import filters
+from rest_framework.exceptions import ValidationError
+from rest_framework.settings import api_settings
+from recipes.autocomplete import prefix_range
+from recipes.search import split_words, MAX_QUERY_WORDS, MIN_TERM_LENGTH
+
+
+class RecipeSearchFilter(filters.SearchFilter):
+    # Searches recipes using RecipeSearchTerm index instead of 'LIKE %term%'
+    # over instructions. Every word of the query must be a prefix of a word
+    # in recipe's title or instructions, category's title or author's username,
+    # all of them are terms of the index. Unless client asked for particular
+    # ordering, recipes are ranked by weights of matched words.
+    # Words shorter than indexed terms are searched in fields of recipe
+    # like SearchFilter does.
+    short_word_fields = ['title', 'slug', 'instructions',
+                         'category__title', 'author__username']
+
+    def filter_queryset(self, request, queryset, view):
+        words = list(dict.fromkeys(word for search_term in self.get_search_terms(request)
+                                   for word in split_words(search_term)))
+        if not words:
+            return queryset
+        # Every word is joined and counted separately
+        if len(words) > MAX_QUERY_WORDS:
+            raise ValidationError(
+                detail=f"More than {MAX_QUERY_WORDS} words cannot be searched at once.")
+
+        terms = [word for word in words if len(word) >= MIN_TERM_LENGTH]
+        for word in words:
+            if len(word) < MIN_TERM_LENGTH:
+                queryset = queryset.filter(
+                    reduce(or_, [Q(**{f'{field}__icontains': word})
+                                 for field in self.short_word_fields]))
+        if not terms:
+            return queryset
+
+        # Recipes are joined only with their terms that start with any of words,
+        # so they are read by ranges of index on terms and then grouped by recipe.
+        # Prefixes are written as ranges, as 'LIKE BINARY word%' of MySQL
+        # is not read from index
+        prefixes = [Q(**prefix_range('search_terms__term', term)) for term in terms]
+        queryset = queryset.\
+            filter(reduce(or_, prefixes)).\
+            annotate(search_rank=Sum('search_terms__weight'),
+                     **{f'search_word_{number}': Count('search_terms', filter=prefix)
+                        for number, prefix in enumerate(prefixes)}).\
+            filter(**{f'search_word_{number}__gt': 0 for number in range(len(prefixes))})
+
+        if not request.query_params.get(api_settings.ORDERING_PARAM):
+            queryset = queryset.order_by('-search_rank',
+                                         *getattr(view, 'ordering', None) or [])
+        return queryset
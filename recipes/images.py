@@ -0,0 +1,144 @@
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connection, transaction
+from PIL import Image, ImageOps
+from recipes.cache import invalidate_tags
+
+
+logger = logging.getLogger(__name__)
+
+IMAGE_VARIANTS = {
+    # Pillow releases GIL while decoding, resizing and encoding,
+    # so threads are enough to process images in parallel
+    'MAX_WORKERS': 2,
+    # Longest side of variant in pixels, images are never upscaled
+    'SIZES': {
+        'thumbnail': 150,
+        'medium': 600,
+        'large': 1200,
+    },
+    # Extension of variant file: format of Pillow
+    'FORMATS': {
+        'webp': 'WEBP',
+        'jpeg': 'JPEG',
+    },
+    'QUALITY': 80,
+    'UPLOAD_TO': 'recipes/images/variants/',
+    # If False, images are processed right after commit in the same thread
+    'ASYNC': True,
+}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_image_variants_settings():
+    return {**IMAGE_VARIANTS, **getattr(settings, 'IMAGE_VARIANTS', {})}
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=get_image_variants_settings()['MAX_WORKERS'],
+                thread_name_prefix='recipe-image'
+            )
+    return _executor
+
+
+def render_variants(file):
+    # Returns width and height of original image and list of
+    # (name, extension, content) of every variant. Variants are encoded
+    # from decoded pixels only, so EXIF(e.g. GPS location), ICC profile
+    # and comments of uploaded file are not copied into them.
+    variants_settings = get_image_variants_settings()
+    sizes = sorted(variants_settings['SIZES'].items(),
+                   key=lambda item: item[1], reverse=True)
+    with Image.open(file) as image:
+        # Orientation from EXIF is applied to pixels before EXIF is dropped
+        image = ImageOps.exif_transpose(image)
+        width, height = image.size
+        has_alpha = image.mode in ('RGBA', 'LA') or \
+            (image.mode == 'P' and 'transparency' in image.info)
+        image = image.convert('RGBA' if has_alpha else 'RGB')
+    image.info = {}
+
+    variants = []
+    # Every variant is resized from the previous larger one,
+    # which is faster than resizing original every time
+    source = image
+    for name, size in sizes:
+        resized = source.copy()
+        resized.thumbnail((size, size), Image.Resampling.LANCZOS)
+        for extension, image_format in variants_settings['FORMATS'].items():
+            output = resized
+            if image_format == 'JPEG' and output.mode != 'RGB':
+                output = output.convert('RGB')
+            content = BytesIO()
+            output.save(content, image_format,
+                        quality=variants_settings['QUALITY'], optimize=True)
+            variants.append((name, extension, content.getvalue()))
+        source = resized
+    return width, height, variants
+
+
+def delete_variants(storage, variants):
+    for paths in variants.values():
+        for path in paths.values():
+            storage.delete(path)
+
+
+def process_recipe_image(image_id):
+    from recipes.models import RecipeImage
+
+    recipe_image = RecipeImage.objects.filter(pk=image_id).first()
+    if recipe_image is None or not recipe_image.image:
+        return
+    storage = recipe_image.image.storage
+    with recipe_image.image.open('rb') as file:
+        width, height, rendered = render_variants(file)
+
+    upload_to = get_image_variants_settings()['UPLOAD_TO']
+    base_name = os.path.splitext(os.path.basename(recipe_image.image.name))[0]
+    variants = {}
+    for name, extension, content in rendered:
+        path = storage.save(f'{upload_to}{base_name}_{name}.{extension}',
+                            ContentFile(content))
+        variants.setdefault(name, {})[extension] = path
+
+    # update() is used, so that post_save does not schedule processing again
+    updated = RecipeImage.objects.filter(pk=image_id).\
+        update(width=width, height=height, variants=variants)
+    if not updated:
+        # Image was deleted while it was processed
+        delete_variants(storage, variants)
+        return
+    delete_variants(storage, recipe_image.variants)
+    invalidate_tags([f'recipe:{recipe_image.recipe_id}'])
+
+
+def process_in_worker(image_id):
+    try:
+        process_recipe_image(image_id)
+    except Exception:
+        # Image stays without variants and original is served instead
+        logger.exception('Variants of recipe image %s were not created', image_id)
+    finally:
+        # Every worker thread has its own database connection
+        connection.close()
+
+
+def schedule_processing(image_id):
+    # Image is processed only after it was committed, outside of request
+    if get_image_variants_settings()['ASYNC']:
+        transaction.on_commit(
+            lambda: get_executor().submit(process_in_worker, image_id)
+        )
+    else:
+        transaction.on_commit(lambda: process_recipe_image(image_id))
@@ -0,0 +1,238 @@
+import heapq
+import threading
+import time
+from array import array
+from bisect import bisect_left, insort
+from collections import Counter, defaultdict
+from django.conf import settings
+from django.db import transaction
+from recipes.cache import get_cache
+from recipes.models import Ingredient
+
+
+INGREDIENT_INDEX = {
+    'DEFAULT_LIMIT': 20,
+    'MAX_LIMIT': 100,
+    # Most ingredients that can be asked for at once
+    'MAX_INGREDIENTS': 20,
+    'CHUNK_SIZE': 10000,
+    # Seconds changes of index are kept in cache for other processes
+    'CHANGE_TIMEOUT': 3600,
+    # Most changes process applies to catch up, it loads index again
+    # when it is behind by more
+    'MAX_CHANGES': 1000,
+}
+
+VERSION_KEY = 'ingredient-index:version'
+# Times rows are read again when version changes while they are read
+LOAD_ATTEMPTS = 3
+
+
+def change_key(version):
+    return f'ingredient-index:change:{version}'
+
+
+def get_ingredient_index_settings():
+    return {**INGREDIENT_INDEX, **getattr(settings, 'INGREDIENT_INDEX', {})}
+
+
+def get_version():
+    cache = get_cache()
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # Version starts from current time, so that index of process that
+        # outlived cache is not taken for current after cache is cleared
+        cache.add(VERSION_KEY, time.time_ns(), timeout=None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def increment_version():
+    get_version()
+    try:
+        return get_cache().incr(VERSION_KEY)
+    except ValueError:
+        # Key expired between get and incr
+        return None
+
+
+class IngredientIndex:
+    # Inverted index of ingredients, for every canonical ingredient it keeps
+    # sorted array of ids of recipes that have it, and it keeps number
+    # of ingredients of every recipe. Different ingredients of recipe can
+    # have the same canonical ingredient, e.g. 'egg' and 'eggs' merged into one,
+    # such repeats are counted aside, so that arrays have every recipe once. Index is loaded by every
+    # process at first search and then updated with writes of that process.
+    # Every write increments version shared through cache and stores its change
+    # under the version, so other processes apply changes they missed
+    # at their next search. Process loads index again only when a change is
+    # missing, e.g. after invalidate or when it expired, so cache has to be
+    # shared by processes.
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.version = None
+        self.recipe_ids = {}
+        self.repeats = Counter()
+        self.ingredient_counts = Counter()
+
+    def load(self):
+        # Rows read while version changed can have some of the changes already,
+        # so they are read again rather than changes are applied to them twice.
+        # If version keeps changing, index is loaded again at next search.
+        for _ in range(LOAD_ATTEMPTS):
+            version = get_version()
+            recipe_ids, repeats, ingredient_counts = self.read_rows()
+            if get_version() == version:
+                break
+        else:
+            version = None
+        with self.lock:
+            self.recipe_ids = {canonical_id: array('q', sorted(ids))
+                               for canonical_id, ids in recipe_ids.items()}
+            self.repeats = repeats
+            self.ingredient_counts = ingredient_counts
+            self.version = version
+
+    def read_rows(self):
+        chunk_size = get_ingredient_index_settings()['CHUNK_SIZE']
+        recipe_ids = defaultdict(set)
+        repeats = Counter()
+        ingredient_counts = Counter()
+        rows = Ingredient.objects.order_by().values_list('canonical_id', 'recipe_id').\
+            iterator(chunk_size=chunk_size)
+        for canonical_id, recipe_id in rows:
+            if recipe_id in recipe_ids[canonical_id]:
+                repeats[(canonical_id, recipe_id)] += 1
+            recipe_ids[canonical_id].add(recipe_id)
+            ingredient_counts[recipe_id] += 1
+        return recipe_ids, repeats, ingredient_counts
+
+    def refresh(self):
+        version = get_version()
+        if self.version == version:
+            return
+        if self.version is None or not 0 < version - self.version <= \
+                get_ingredient_index_settings()['MAX_CHANGES']:
+            self.load()
+            return
+        versions = range(self.version + 1, version + 1)
+        changes = get_cache().get_many([change_key(number) for number in versions])
+        if len(changes) != len(versions):
+            self.load()
+            return
+        with self.lock:
+            for number in versions:
+                if self.version is None or number != self.version + 1:
+                    # Already applied by another thread
+                    continue
+                added, removed = changes[change_key(number)]
+                self.update(added, removed)
+                self.version = number
+
+    def invalidate(self):
+        # Used after writes that do not send signals, e.g. bulk_create or update,
+        # every process loads index again
+        with self.lock:
+            increment_version()
+            self.version = None
+
+    def apply(self, added=(), removed=()):
+        # added and removed are pairs (canonical_id, recipe_id) of committed ingredients
+        added, removed = list(added), list(removed)
+        with self.lock:
+            version = increment_version()
+            if version is None:
+                self.version = None
+                return
+            get_cache().set(change_key(version), (added, removed),
+                            timeout=get_ingredient_index_settings()['CHANGE_TIMEOUT'])
+            if self.version is None or version != self.version + 1:
+                # Index is not loaded or misses writes of other processes,
+                # they are applied with this one at next refresh
+                return
+            self.update(added, removed)
+            self.version = version
+
+    def update(self, added, removed):
+        for canonical_id, recipe_id in removed:
+            self.remove(canonical_id, recipe_id)
+        for canonical_id, recipe_id in added:
+            self.add(canonical_id, recipe_id)
+
+    def add(self, canonical_id, recipe_id):
+        recipe_ids = self.recipe_ids.setdefault(canonical_id, array('q'))
+        if self.contains(recipe_ids, recipe_id):
+            self.repeats[(canonical_id, recipe_id)] += 1
+        else:
+            insort(recipe_ids, recipe_id)
+        self.ingredient_counts[recipe_id] += 1
+
+    def remove(self, canonical_id, recipe_id):
+        recipe_ids = self.recipe_ids.get(canonical_id)
+        if recipe_ids is None or not self.contains(recipe_ids, recipe_id):
+            return
+        key = (canonical_id, recipe_id)
+        if self.repeats[key]:
+            self.repeats[key] -= 1
+            if not self.repeats[key]:
+                del self.repeats[key]
+        else:
+            recipe_ids.pop(bisect_left(recipe_ids, recipe_id))
+            if not recipe_ids:
+                del self.recipe_ids[canonical_id]
+        self.ingredient_counts[recipe_id] -= 1
+        if self.ingredient_counts[recipe_id] <= 0:
+            del self.ingredient_counts[recipe_id]
+
+    def apply_on_commit(self, added=(), removed=()):
+        # Rolled back writes never reach index
+        added, removed = list(added), list(removed)
+        transaction.on_commit(lambda: self.apply(added, removed))
+
+    def search(self, canonical_ids, limit, match_all=False):
+        # Returns ids of recipes ranked by coverage (share of recipe's ingredients
+        # that were asked for), then by number of matched ingredients,
+        # with ids of matched canonical ingredients of every recipe
+        self.refresh()
+        canonical_ids = list(dict.fromkeys(canonical_ids))
+        # Lists are copied under the lock, as writes change them in place,
+        # and recipes are counted and ranked outside of it. Counts of
+        # ingredients are only looked up, one at a time, while they can change.
+        with self.lock:
+            lists = {canonical_id: array('q', self.recipe_ids.get(canonical_id, ()))
+                     for canonical_id in canonical_ids}
+            ingredient_counts = self.ingredient_counts
+        if match_all:
+            # Smallest list is intersected with the others
+            smallest = min(lists.values(), key=len, default=array('q'))
+            candidates = set(smallest)
+            for recipe_ids in lists.values():
+                if recipe_ids is not smallest:
+                    candidates.intersection_update(recipe_ids)
+            matches = Counter({recipe_id: len(canonical_ids) for recipe_id in candidates})
+        else:
+            matches = Counter()
+            for recipe_ids in lists.values():
+                matches.update(recipe_ids)
+
+        def rank(item):
+            recipe_id, matched = item
+            return matched / max(ingredient_counts.get(recipe_id, 0), 1), matched, -recipe_id
+
+        top = heapq.nlargest(limit, matches.items(), key=rank)
+        results = []
+        for recipe_id, matched in top:
+            results.append({
+                'recipe_id': recipe_id,
+                'matched_ingredients': [canonical_id for canonical_id in canonical_ids
+                                        if self.contains(lists[canonical_id], recipe_id)],
+                'coverage': rank((recipe_id, matched))[0],
+            })
+        return results
+
+    def contains(self, recipe_ids, recipe_id):
+        position = bisect_left(recipe_ids, recipe_id)
+        return position < len(recipe_ids) and recipe_ids[position] == recipe_id
+
+
+ingredient_index = IngredientIndex()
@@ -0,0 +1,42 @@
+from django.conf import settings
+from django.db.models import F, Case, When, Value, FloatField
+from django.db.models.functions import Cast
+
+
+LEADERBOARD = {
+    # Score of recipe is its average rating pulled towards PRIOR_MEAN,
+    # as if it had PRIOR_COUNT more ratings equal to PRIOR_MEAN, so one
+    # 10/10 rating does not rank recipe above thousand 9/10 ratings.
+    # After these are changed, scores have to be recomputed with
+    # 'python manage.py rebuild_leaderboard'
+    'PRIOR_MEAN': 5.0,
+    'PRIOR_COUNT': 10,
+    'DEFAULT_LIMIT': 10,
+    'MAX_LIMIT': 100,
+}
+
+
+def get_leaderboard_settings():
+    return {**LEADERBOARD, **getattr(settings, 'LEADERBOARD', {})}
+
+
+def rating_fields_expressions():
+    # Fields of recipe derived from rating_count and rating_sum,
+    # recipes without ratings have neither average nor score
+    leaderboard_settings = get_leaderboard_settings()
+    prior_count = leaderboard_settings['PRIOR_COUNT']
+    prior_total = leaderboard_settings['PRIOR_MEAN'] * prior_count
+    rating_sum = Cast('rating_sum', FloatField())
+    return {
+        'rating_average': Case(
+            When(rating_count=0, then=Value(None)),
+            default=rating_sum / F('rating_count'),
+            output_field=FloatField()
+        ),
+        'rating_score': Case(
+            When(rating_count=0, then=Value(None)),
+            default=(rating_sum + Value(float(prior_total))) /
+            (F('rating_count') + Value(float(prior_count))),
+            output_field=FloatField()
+        ),
+    }
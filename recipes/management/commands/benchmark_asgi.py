@@ -0,0 +1,170 @@
+import asyncio
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from statistics import quantiles
+from timeit import default_timer
+from urllib.parse import urlsplit
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+from recipes.models import Recipe
+
+
+HOST = 'localhost'
+# Address that is not in INTERNAL_IPS, so that debug toolbar is not shown
+CLIENT_ADDRESS = '192.0.2.1'
+
+
+class Command(BaseCommand):
+    help = 'Compares throughput of read-only endpoints served by WSGI and by ASGI on the same database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=1000,
+                            help='Number of requests sent to each handler')
+        parser.add_argument('--concurrency', type=int, default=20,
+                            help='Number of requests in flight, threads of WSGI server')
+        parser.add_argument('--use-cache', action='store_true',
+                            help='Keep response cache, by default every response is computed')
+
+    def get_paths(self):
+        recipe = Recipe.objects.order_by('id').first()
+        if recipe is None:
+            raise CommandError('Database has no recipes, run seed_data.')
+        return [
+            '/categories/',
+            f'/categories/{recipe.category_id}/get_recipes/',
+            '/recipes/',
+            '/recipes/?page=2&expand=images,rating_summary',
+            f'/recipes/{recipe.id}/',
+            f'/recipes/{recipe.id}/?expand=ingredients,images,reviews',
+            f'/recipes/{recipe.id}/get_ingredients/',
+            f'/recipes/{recipe.id}/get_reviews/',
+            f'/recipes/{recipe.id}/get_average_rating/',
+            '/authors/',
+            f'/authors/{recipe.author_id}/get_recipes/',
+        ]
+
+    def wsgi_request(self, handler, path):
+        url = urlsplit(path)
+        environ = {
+            'REQUEST_METHOD': 'GET',
+            'SCRIPT_NAME': '',
+            'PATH_INFO': url.path,
+            'QUERY_STRING': url.query,
+            'SERVER_NAME': HOST,
+            'SERVER_PORT': '80',
+            'SERVER_PROTOCOL': 'HTTP/1.1',
+            'HTTP_HOST': HOST,
+            'REMOTE_ADDR': CLIENT_ADDRESS,
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': 'http',
+            'wsgi.input': BytesIO(),
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': False,
+            'wsgi.run_once': False,
+        }
+        statuses = []
+
+        def start_response(status, headers, exc_info=None):
+            statuses.append(int(status[:3]))
+
+        start = default_timer()
+        response = handler(environ, start_response)
+        body = b''.join(response)
+        response.close()
+        return default_timer() - start, statuses[0], body
+
+    async def asgi_request(self, application, path):
+        url = urlsplit(path)
+        scope = {
+            'type': 'http',
+            'asgi': {'version': '3.0'},
+            'http_version': '1.1',
+            'method': 'GET',
+            'scheme': 'http',
+            'path': url.path,
+            'raw_path': url.path.encode(),
+            'query_string': url.query.encode(),
+            'root_path': '',
+            'headers': [(b'host', HOST.encode())],
+            'server': (HOST, 80),
+            'client': (CLIENT_ADDRESS, 0),
+        }
+        body_received = False
+        messages = []
+
+        async def receive():
+            nonlocal body_received
+            if not body_received:
+                body_received = True
+                return {'type': 'http.request', 'body': b'', 'more_body': False}
+            # Client stays connected until response is sent
+            await asyncio.Future()
+
+        async def send(message):
+            messages.append(message)
+
+        start = default_timer()
+        await application(scope, receive, send)
+        elapsed = default_timer() - start
+        status = next(message['status'] for message in messages
+                      if message['type'] == 'http.response.start')
+        body = b''.join(message.get('body', b'') for message in messages
+                        if message['type'] == 'http.response.body')
+        return elapsed, status, body
+
+    def run_wsgi(self, paths, number, concurrency):
+        handler = WSGIHandler()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            return list(executor.map(
+                lambda index: self.wsgi_request(handler, paths[index % len(paths)]),
+                range(number)
+            ))
+
+    async def run_asgi(self, application, paths, number, concurrency):
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def limited_request(index):
+            async with semaphore:
+                return await self.asgi_request(application, paths[index % len(paths)])
+
+        return await asyncio.gather(*[limited_request(index) for index in range(number)])
+
+    def check_same_responses(self, paths, application):
+        # Both handlers must return the same data, otherwise comparison is meaningless
+        handler = WSGIHandler()
+        for path in paths:
+            _, wsgi_status, wsgi_body = self.wsgi_request(handler, path)
+            _, asgi_status, asgi_body = asyncio.run(self.asgi_request(application, path))
+            if wsgi_status != 200 or asgi_status != 200:
+                raise CommandError(f'{path} returned {wsgi_status} under WSGI and {asgi_status} under ASGI.')
+            if wsgi_body != asgi_body:
+                raise CommandError(f'{path} returned different responses under WSGI and ASGI.')
+
+    def report(self, mode, results, elapsed):
+        timings = [result[0] for result in results]
+        errors = sum(1 for result in results if result[1] != 200)
+        percentiles = quantiles(timings, n=100)
+        self.stdout.write(f'{mode:<6}{len(results):>10}{elapsed:>10.2f}{len(results) / elapsed:>10.1f}'
+                          f'{percentiles[49] * 1000:>10.2f}{percentiles[94] * 1000:>10.2f}{errors:>8}')
+
+    def handle(self, *args, **options):
+        from api.asgi import application
+
+        cache_settings = {} if options['use_cache'] else {'RESPONSE_CACHE': {'TIMEOUT': 0}}
+        with override_settings(**cache_settings):
+            paths = self.get_paths()
+            self.check_same_responses(paths, application)
+            number, concurrency = options['requests'], options['concurrency']
+
+            self.stdout.write(f'{"mode":<6}{"requests":>10}{"seconds":>10}{"req/s":>10}'
+                              f'{"p50 ms":>10}{"p95 ms":>10}{"errors":>8}')
+            start = default_timer()
+            results = self.run_wsgi(paths, number, concurrency)
+            self.report('wsgi', results, default_timer() - start)
+
+            start = default_timer()
+            results = asyncio.run(self.run_asgi(application, paths, number, concurrency))
+            self.report('asgi', results, default_timer() - start)
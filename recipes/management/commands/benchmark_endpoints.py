@@ -0,0 +1,314 @@
+import json
+from math import ceil
+from statistics import mean
+from timeit import default_timer
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import URLPattern, URLResolver, get_resolver, resolve
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+from recipes.models import Recipe, Ingredient, RecipeImage, Review, Rating
+from users.models import CustomUser
+
+
+HOST = 'localhost'
+# Address that is not in INTERNAL_IPS, so that debug toolbar is not shown
+CLIENT_ADDRESS = '192.0.2.1'
+PASSWORD = '34benchmarkpassword34'
+# Routes that are not part of the API
+IGNORED_NAMESPACES = ['admin', 'djdt']
+# Response of metrics grows with every request, so it cannot be compared
+IGNORED_ROUTES = ['metrics']
+EXPECTED_STATUSES = {'get': 200, 'post': 201, 'put': 200, 'delete': 204}
+
+
+def percentile(values, percent):
+    # Nearest-rank percentile
+    values = sorted(values)
+    return values[max(ceil(len(values) * percent / 100) - 1, 0)]
+
+
+def scenario(method, path, data=None, user=None, status=None):
+    # user is a function that returns user who sends request, data can be
+    # a function of the user, then it is sent instead of token of the user
+    return {'method': method, 'path': path, 'data': data, 'user': user,
+            'status': status or EXPECTED_STATUSES[method]}
+
+
+def get_route_names(patterns, namespace=None):
+    names = set()
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            if pattern.namespace in IGNORED_NAMESPACES:
+                continue
+            inner_namespace = pattern.namespace or namespace
+            names |= get_route_names(pattern.url_patterns, inner_namespace)
+        elif isinstance(pattern, URLPattern) and pattern.name:
+            names.add(f'{namespace}:{pattern.name}' if namespace else pattern.name)
+    return names
+
+
+class Command(BaseCommand):
+    help = 'Measures latency, queries and size of responses of API endpoints on the current database, ' \
+           'or compares two files of results'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=50,
+                            help='Number of requests sent to each endpoint')
+        parser.add_argument('--output', help='JSON file to write results to')
+        parser.add_argument('--use-cache', action='store_true',
+                            help='Keep response cache, by default every response is computed')
+        parser.add_argument('--compare', nargs=2, metavar=('BASELINE', 'RESULTS'),
+                            help='Compare two files of results instead of running benchmark')
+        parser.add_argument('--threshold', type=float, default=0.1,
+                            help='Relative growth of latency or size that counts as regression')
+        parser.add_argument('--min-difference', type=float, default=0.5,
+                            help='Smaller growth of latency in milliseconds is ignored as noise')
+
+    def get_objects(self):
+        # The most rated recipe has the longest lists of reviews and ratings
+        recipe = Recipe.objects.select_related('author', 'category').\
+            order_by('-rating_count', 'id').first()
+        if recipe is None:
+            raise CommandError('Database has no recipes, run seed_data.')
+        review = Review.objects.filter(recipe=recipe).first()
+        rating = Rating.objects.filter(recipe=recipe).first()
+        ingredient = Ingredient.objects.filter(recipe=recipe).first()
+        if review is None or rating is None or ingredient is None:
+            raise CommandError('The most rated recipe has no reviews, ratings or ingredients, run seed_data.')
+        author = CustomUser.objects.filter(is_superuser=False).\
+            annotate(number_of_recipes=Count('recipes')).order_by('-number_of_recipes').first()
+        return {
+            'recipe': recipe,
+            'category': recipe.category,
+            'author': author,
+            'review': review,
+            'rating': rating,
+            'ingredient': ingredient,
+            'image': RecipeImage.objects.filter(recipe=recipe).first(),
+        }
+
+    def new_user(self):
+        # User that has not reviewed or rated anything,
+        # it is created inside of transaction that is rolled back
+        return CustomUser.objects.create_user(username='benchmark_user',
+                                              email='benchmark_user@example.com',
+                                              password=PASSWORD)
+
+    def get_scenarios(self, objects):
+        recipe, category, author = objects['recipe'], objects['category'], objects['author']
+        review, rating, ingredient = objects['review'], objects['rating'], objects['ingredient']
+        recipe_path = f'/recipes/{recipe.id}/'
+        category_url = f'http://{HOST}/categories/{category.id}/'
+        word = recipe.title.split()[-1].lower()
+        expand = 'expand=ingredients,images,reviews,rating_summary'
+        cook_with = f'eggs,flour,milk,{ingredient.slug}'
+        recipe_ids = ','.join(str(recipe_id) for recipe_id in
+                              Recipe.objects.order_by('-id').values_list('id', flat=True)[:30])
+
+        def recipe_author():
+            return recipe.author
+
+        scenarios = {
+            'api-root': scenario('get', '/'),
+            'category-list': scenario('get', '/categories/'),
+            'category-detail': scenario('get', f'/categories/{category.id}/'),
+            'category-get-recipes': scenario('get', f'/categories/{category.id}/get_recipes/'),
+            'category-leaderboard': scenario('get', f'/categories/{category.id}/leaderboard/'),
+            'recipe-list': scenario('get', '/recipes/'),
+            'recipe-list-last-page': scenario('get', '/recipes/?page=last&page_size=50'),
+            'recipe-list-cursor': scenario('get', '/recipes/?pagination=cursor'),
+            'recipe-list-search': scenario('get', f'/recipes/?search={word}'),
+            'recipe-list-ordering': scenario('get', '/recipes/?ordering=-rating_average'),
+            'recipe-list-expand': scenario('get', f'/recipes/?{expand}'),
+            'recipe-leaderboard': scenario('get', '/recipes/leaderboard/?limit=50'),
+            'recipe-cook-with': scenario('get', f'/recipes/cook_with/?ingredients={cook_with}'),
+            'recipe-cook-with-all': scenario(
+                'get', f'/recipes/cook_with/?ingredients={cook_with}&match=all'),
+            'recipe-detail': scenario('get', recipe_path),
+            'recipe-detail-expand': scenario('get', f'{recipe_path}?{expand}'),
+            'recipe-get-ingredients': scenario('get', f'{recipe_path}get_ingredients/'),
+            'recipe-scale': scenario('get', f'{recipe_path}scale/?factor=2&units=imperial'),
+            'recipe-scale-many': scenario('get', f'/recipes/scale_many/?ids={recipe_ids}&units=metric'),
+            'recipe-shopping-list': scenario('get', f'/recipes/shopping_list/?ids={recipe_ids}'),
+            'recipe-get-reviews': scenario('get', f'{recipe_path}get_reviews/'),
+            'recipe-get-ratings': scenario('get', f'{recipe_path}get_ratings/'),
+            'recipe-get-average-rating': scenario('get', f'{recipe_path}get_average_rating/'),
+            'recipe-get-rating-histogram': scenario('get', f'{recipe_path}get_rating_histogram/'),
+            'recipe-get-images': scenario('get', f'{recipe_path}get_images/'),
+            'recipe-ingredient-list': scenario('get', f'{recipe_path}ingredients/'),
+            'recipe-ingredient-detail': scenario('get', f'{recipe_path}ingredients/{ingredient.id}/'),
+            'recipe-image-list': scenario('get', f'{recipe_path}images/'),
+            'recipe-review-list': scenario('get', f'{recipe_path}reviews/'),
+            'recipe-review-detail': scenario('get', f'{recipe_path}reviews/{review.id}/'),
+            'recipe-rating-list': scenario('get', f'{recipe_path}ratings/'),
+            'recipe-rating-detail': scenario('get', f'{recipe_path}ratings/{rating.id}/'),
+            'author-list': scenario('get', '/authors/'),
+            'author-list-search': scenario('get', f'/authors/?search={author.username[:4]}'),
+            'author-detail': scenario('get', f'/authors/{author.id}/'),
+            'author-get-recipes': scenario('get', f'/authors/{author.id}/get_recipes/'),
+            'author-autocomplete': scenario('get', f'/authors/autocomplete/?q={author.username[:6]}'),
+            'customuser-me': scenario('get', '/auth/users/me/', user=recipe_author),
+            'customuser-detail': scenario('get', f'/auth/users/{recipe.author_id}/', user=recipe_author),
+            'customuser-create': scenario('post', '/auth/users/',
+                                          data={'username': 'benchmark_new_user',
+                                                'email': 'benchmark_new_user@example.com',
+                                                'password': PASSWORD}),
+            # Credentials are sent in data of these requests instead of token
+            'jwt-create': scenario('post', '/auth/jwt/create/', status=200, user=self.new_user,
+                                   data=lambda user: {'username': user.username,
+                                                      'password': PASSWORD}),
+            'jwt-refresh': scenario('post', '/auth/jwt/refresh/', status=200, user=recipe_author,
+                                    data=lambda user: {'refresh': str(RefreshToken.for_user(user))}),
+            'jwt-verify': scenario('post', '/auth/jwt/verify/', status=200, user=recipe_author,
+                                   data=lambda user: {'token': str(AccessToken.for_user(user))}),
+            'recipe-create': scenario('post', '/recipes/', user=recipe_author,
+                                      data={'title': 'Benchmark soup', 'instructions': 'Cook it',
+                                            'category': category_url}),
+            'recipe-update': scenario('put', recipe_path, user=recipe_author,
+                                      data={'title': recipe.title, 'category': category_url,
+                                            'instructions': recipe.instructions}),
+            'recipe-delete': scenario('delete', recipe_path, user=recipe_author),
+            'recipe-ingredient-create': scenario('post', f'{recipe_path}ingredients/', user=recipe_author,
+                                                 data={'name': 'Benchmark spice', 'quantity': 2,
+                                                       'units_of_measurement': 'gm'}),
+            'recipe-ingredient-bulk': scenario('post', f'{recipe_path}ingredients/bulk/', user=recipe_author,
+                                               data=[{'name': f'Benchmark spice {number}', 'quantity': 2}
+                                                     for number in range(20)]),
+            'recipe-review-create': scenario('post', f'{recipe_path}reviews/', user=self.new_user,
+                                             data={'content': 'Benchmark review'}),
+            'recipe-review-delete': scenario('delete', f'{recipe_path}reviews/{review.id}/',
+                                             user=lambda: review.author),
+            'recipe-rating-create': scenario('post', f'{recipe_path}ratings/', user=self.new_user,
+                                             data={'value': 7}),
+            'recipe-rating-update': scenario('put', f'{recipe_path}ratings/{rating.id}/',
+                                             user=lambda: rating.author,
+                                             data={'value': 10 - rating.value}),
+        }
+        if objects['image'] is not None:
+            scenarios['recipe-image-detail'] = scenario('get', f"{recipe_path}images/{objects['image'].id}/")
+        return scenarios
+
+    def send(self, client, scenario, user):
+        client.credentials()
+        data = scenario['data']
+        if callable(data):
+            data = data(user)
+        elif user is not None:
+            client.credentials(HTTP_AUTHORIZATION='JWT ' + str(AccessToken.for_user(user)))
+        with CaptureQueriesContext(connection) as queries:
+            start = default_timer()
+            response = getattr(client, scenario['method'])(scenario['path'], data=data, format='json')
+            content = b''.join(response) if response.streaming else response.content
+            elapsed = default_timer() - start
+        return response.status_code, elapsed, len(queries), len(content)
+
+    def measure(self, client, scenario):
+        # Writes are rolled back after every request, so that database
+        # stays the same and every request does the same work
+        with transaction.atomic():
+            user = scenario['user']() if scenario['user'] else None
+            result = self.send(client, scenario, user)
+            transaction.set_rollback(True)
+        return result
+
+    def run(self, scenarios, repeat):
+        client = APIClient(HTTP_HOST=HOST, REMOTE_ADDR=CLIENT_ADDRESS)
+        results = {}
+        self.stdout.write(f'{"endpoint":<30}{"p50 ms":>9}{"p95 ms":>9}{"p99 ms":>9}'
+                          f'{"queries":>9}{"bytes":>9}')
+        for name, scenario in scenarios.items():
+            method, path = scenario['method'], scenario['path']
+            # First request warms up caches of Django and checks the scenario
+            status, *_ = self.measure(client, scenario)
+            if status != scenario['status']:
+                raise CommandError(f"{method.upper()} {path} returned {status} instead of {scenario['status']}.")
+            timings, queries, sizes = [], [], []
+            for _ in range(repeat):
+                _, elapsed, number_of_queries, size = self.measure(client, scenario)
+                timings.append(elapsed * 1000)
+                queries.append(number_of_queries)
+                sizes.append(size)
+            results[name] = {
+                'method': method.upper(),
+                'path': path,
+                'route': resolve(path.split('?')[0]).view_name,
+                'requests': repeat,
+                'p50_ms': percentile(timings, 50),
+                'p95_ms': percentile(timings, 95),
+                'p99_ms': percentile(timings, 99),
+                'mean_ms': mean(timings),
+                'queries': max(queries),
+                'bytes': max(sizes),
+            }
+            result = results[name]
+            self.stdout.write(f'{name:<30}{result["p50_ms"]:>9.2f}{result["p95_ms"]:>9.2f}'
+                              f'{result["p99_ms"]:>9.2f}{result["queries"]:>9}{result["bytes"]:>9}')
+        return results
+
+    def report_not_covered(self, results):
+        routes = {result['route'] for result in results.values()}
+        not_covered = sorted(get_route_names(get_resolver().url_patterns) - routes - set(IGNORED_ROUTES))
+        if not_covered:
+            self.stdout.write(f"Routes without benchmark: {', '.join(not_covered)}")
+
+    def compare(self, baseline_path, results_path, threshold, min_difference):
+        try:
+            with open(baseline_path) as file:
+                baseline = json.load(file)['endpoints']
+            with open(results_path) as file:
+                results = json.load(file)['endpoints']
+        except (OSError, ValueError, KeyError) as exc:
+            raise CommandError(f'Cannot read results: {exc}')
+
+        regressions = []
+        self.stdout.write(f'{"endpoint":<30}{"p95 ms":>16}{"change":>9}{"queries":>10}{"bytes":>16}  ')
+        for name in sorted(baseline.keys() & results.keys()):
+            old, new = baseline[name], results[name]
+            problems = []
+            difference = new['p95_ms'] - old['p95_ms']
+            if difference > old['p95_ms'] * threshold and difference > min_difference:
+                problems.append('slower')
+            if new['queries'] > old['queries']:
+                problems.append('more queries')
+            if new['bytes'] > old['bytes'] * (1 + threshold):
+                problems.append('larger')
+            if problems:
+                regressions.append(name)
+            change = difference / old['p95_ms'] * 100 if old['p95_ms'] else 0
+            self.stdout.write(f'{name:<30}{old["p95_ms"]:>8.2f}{new["p95_ms"]:>8.2f}{change:>+8.1f}%'
+                              f'{old["queries"]:>5}{new["queries"]:>5}{old["bytes"]:>8}{new["bytes"]:>8}'
+                              f'  {", ".join(problems)}')
+        for name in sorted(baseline.keys() - results.keys()):
+            self.stdout.write(f'{name:<30}only in {baseline_path}')
+        for name in sorted(results.keys() - baseline.keys()):
+            self.stdout.write(f'{name:<30}only in {results_path}')
+        if regressions:
+            raise CommandError(f"Regressions: {', '.join(regressions)}")
+        self.stdout.write('No regressions.')
+
+    def handle(self, *args, **options):
+        if options['compare']:
+            return self.compare(*options['compare'], options['threshold'], options['min_difference'])
+        if options['repeat'] < 1:
+            raise CommandError('Number of requests must be positive.')
+
+        cache_settings = {} if options['use_cache'] else {'RESPONSE_CACHE': {'TIMEOUT': 0}}
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, HOST], **cache_settings):
+            scenarios = self.get_scenarios(self.get_objects())
+            results = self.run(scenarios, options['repeat'])
+        self.report_not_covered(results)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                json.dump({
+                    'created': timezone.now().isoformat(),
+                    'database': connection.vendor,
+                    'repeat': options['repeat'],
+                    'use_cache': options['use_cache'],
+                    'endpoints': results,
+                }, file, indent=2)
+            self.stdout.write(f"Results are written to {options['output']}")
@@ -0,0 +1,59 @@
+from timeit import timeit
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from rest_framework.reverse import reverse
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from recipes.models import Category, Recipe
+from recipes.serializers import RecipeSerializer
+from users.models import CustomUser
+
+
+class Command(BaseCommand):
+    help = 'Compares serialization of a page of recipes with cached url templates and with plain reverse'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--page-size', type=int, default=100)
+        parser.add_argument('--repeat', type=int, default=50)
+
+    def build_recipes(self, page_size):
+        # Recipes are not saved, serializer only needs their attributes
+        now = timezone.now()
+        category = Category(id=1, title='Soups', slug='soups')
+        recipes = []
+        for number in range(1, page_size + 1):
+            author = CustomUser(id=number % 10 + 1, username=f'user{number % 10}')
+            recipes.append(Recipe(id=number, title=f'Soup {number}', slug=f'soup-{number}',
+                                  instructions='Cook soup', author=author, category=category,
+                                  published=now, updated=now))
+        return recipes
+
+    def serialize(self, recipes, request, reverse_function=None):
+        serializer = RecipeSerializer(recipes, many=True,
+                                      context={'request': request})
+        if reverse_function is not None:
+            for field in serializer.child.fields.values():
+                if hasattr(field, 'reverse'):
+                    field.reverse = reverse_function
+        return serializer.data
+
+    def handle(self, *args, **options):
+        recipes = self.build_recipes(options['page_size'])
+
+        def new_request():
+            return Request(APIRequestFactory().get('/recipes/', HTTP_HOST='localhost'))
+
+        cached_data = self.serialize(recipes, new_request())
+        plain_data = self.serialize(recipes, new_request(), reverse)
+        if cached_data != plain_data:
+            raise CommandError('Cached url templates produced different output.')
+
+        repeat = options['repeat']
+        cached_time = timeit(lambda: self.serialize(recipes, new_request()),
+                             number=repeat) / repeat
+        plain_time = timeit(lambda: self.serialize(recipes, new_request(), reverse),
+                            number=repeat) / repeat
+        self.stdout.write(f"Page of {options['page_size']} recipes:")
+        self.stdout.write(f'  reverse:             {plain_time * 1000:.2f} ms')
+        self.stdout.write(f'  cached url template: {cached_time * 1000:.2f} ms')
+        self.stdout.write(f'  speedup:             {plain_time / cached_time:.2f}x')
@@ -0,0 +1,75 @@
+from statistics import median
+from timeit import default_timer
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from recipes.models import Recipe, Ingredient, Review, Rating
+from recipes.seeding import Seeder
+
+
+class Command(BaseCommand):
+    help = 'Explains and times ordered queries of list endpoints and reports ones that sort without index'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=0,
+                            help='Number of recipes to generate before running queries')
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--check', action='store_true',
+                            help='Fail if any query sorts without index')
+
+    def seed(self, number_of_recipes):
+        # Same data as seed_data generates, in proportion to number of recipes
+        Seeder().seed(users=max(number_of_recipes // 100, 10), categories=20,
+                      recipes=number_of_recipes, ingredients=number_of_recipes * 5,
+                      reviews=number_of_recipes, ratings=number_of_recipes * 2)
+
+    def get_querysets(self):
+        # The most rated recipe has the longest lists of reviews and ratings
+        recipe = Recipe.objects.order_by('-rating_count', 'id').first()
+        if recipe is None:
+            raise CommandError('Database has no recipes, run seed_data or this command with --seed.')
+        return {
+            'recipe-list': Recipe.objects.select_related('author', 'category').
+            order_by('title', 'id'),
+            'recipe-list-by-published': Recipe.objects.select_related('author', 'category').
+            order_by('-published'),
+            'category-get-recipes': Recipe.objects.select_related('author', 'category').
+            filter(category_id=recipe.category_id).order_by('title', 'id'),
+            'author-get-recipes': Recipe.objects.select_related('author', 'category').
+            filter(author_id=recipe.author_id).order_by('title', 'id'),
+            'recipe-get-ingredients': Ingredient.objects.select_related('recipe').
+            filter(recipe_id=recipe.id).order_by('name', 'id'),
+            'recipe-get-reviews': Review.objects.select_related('recipe', 'author').
+            filter(recipe_id=recipe.id).order_by('-published', '-id'),
+            'recipe-get-ratings': Rating.objects.select_related('recipe', 'author').
+            filter(recipe_id=recipe.id).order_by('-published', '-id'),
+        }
+
+    def sorts_without_index(self, plan):
+        plan = plan.lower()
+        # MySQL reports 'Using filesort', SQLite 'USE TEMP B-TREE FOR ORDER BY'
+        return 'filesort' in plan or 'temp b-tree for order by' in plan
+
+    def handle(self, *args, **options):
+        if options['seed']:
+            self.seed(options['seed'])
+            self.stdout.write(f"Generated {options['seed']} recipes.")
+
+        failed = []
+        self.stdout.write(f'{"query":<28}{"median ms":>12}  sorts without index')
+        for name, queryset in self.get_querysets().items():
+            page = queryset[:5]
+            plan = page.explain()
+            timings = []
+            for _ in range(options['repeat']):
+                start = default_timer()
+                list(page.all())
+                timings.append(default_timer() - start)
+            sorts = self.sorts_without_index(plan)
+            if sorts:
+                failed.append(name)
+            self.stdout.write(f'{name:<28}{median(timings) * 1000:>12.3f}  {"yes" if sorts else "no"}')
+            if options['verbosity'] > 1:
+                self.stdout.write(plan)
+        self.stdout.write(f'Database: {connection.vendor}')
+        if failed and options['check']:
+            raise CommandError(f"Queries sort without index: {', '.join(failed)}")
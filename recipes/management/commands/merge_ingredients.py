@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from recipes.cache import invalidate_tags
+from recipes.ingredient_index import ingredient_index
+from recipes.models import CanonicalIngredient
+
+
+class Command(BaseCommand):
+    help = 'Merges ingredients of dictionary into one, their slugs become aliases of it'
+
+    def add_arguments(self, parser):
+        parser.add_argument('target', help='Slug of ingredient other ingredients are merged into')
+        parser.add_argument('sources', nargs='+', help='Slugs of ingredients that are merged')
+
+    def get_ingredient(self, slug):
+        try:
+            return CanonicalIngredient.objects.get(slug=slug)
+        except CanonicalIngredient.DoesNotExist:
+            raise CommandError(f"Ingredient '{slug}' does not exist.")
+
+    def handle(self, *args, **options):
+        target = self.get_ingredient(options['target'])
+        sources = [self.get_ingredient(slug) for slug in options['sources']]
+        if target in sources:
+            raise CommandError('Ingredient cannot be merged into itself.')
+        with transaction.atomic():
+            for source in sources:
+                CanonicalIngredient.merge(source, target)
+            # Ingredients are moved by update, that does not send signals
+            transaction.on_commit(ingredient_index.invalidate)
+        invalidate_tags(['recipe', 'ingredient'])
+        self.stdout.write(f"Merged {len(sources)} ingredients into '{target.slug}'.")
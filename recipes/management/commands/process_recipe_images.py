@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from recipes.images import process_recipe_image
+from recipes.models import RecipeImage
+
+
+class Command(BaseCommand):
+    help = 'Creates variants of recipe images that do not have them yet, e.g. images uploaded before variants existed'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true',
+                            help='Recreate variants of every image')
+
+    def handle(self, *args, **options):
+        images = RecipeImage.objects.order_by('id')
+        if not options['all']:
+            images = images.filter(variants={})
+        image_ids = list(images.values_list('id', flat=True))
+        for image_id in image_ids:
+            process_recipe_image(image_id)
+        self.stdout.write(f'Processed {len(image_ids)} images')
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Max
+from recipes.cache import invalidate_tags
+from recipes.leaderboard import rating_fields_expressions
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'Recomputes scores of recipes on leaderboards, e.g. after LEADERBOARD setting was changed'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=10000,
+                            help='Number of recipes updated by one query')
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        last_id = Recipe.objects.aggregate(last_id=Max('id'))['last_id'] or 0
+        updated = 0
+        # Recipes are updated in ranges of ids, so that rows
+        # are not locked all at once
+        for start in range(0, last_id, chunk_size):
+            updated += Recipe.objects.filter(id__gt=start, id__lte=start + chunk_size).\
+                update(**rating_fields_expressions())
+        invalidate_tags(['recipe', 'rating'])
+        self.stdout.write(f'Updated scores of {updated} recipes.')
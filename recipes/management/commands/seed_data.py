@@ -0,0 +1,41 @@
+from timeit import default_timer
+from django.core.management.base import BaseCommand, CommandError
+from recipes.seeding import Seeder
+
+
+class Command(BaseCommand):
+    help = 'Generates users, categories, recipes, ingredients, reviews and ratings for benchmarks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--categories', type=int, default=20)
+        parser.add_argument('--recipes', type=int, default=10000)
+        parser.add_argument('--ingredients', type=int, default=100000)
+        parser.add_argument('--reviews', type=int, default=50000)
+        parser.add_argument('--ratings', type=int, default=200000)
+        parser.add_argument('--chunk-size', type=int, default=5000,
+                            help='Number of objects written by one query')
+        parser.add_argument('--exponent', type=float, default=1.1,
+                            help='Exponent of Zipf distributions of popularity and activity')
+        parser.add_argument('--random-seed', type=int, default=None,
+                            help='Seed of random generator, the same seed generates the same data')
+
+    def handle(self, *args, **options):
+        volumes = {name: options[name] for name in
+                   ('users', 'categories', 'recipes', 'ingredients', 'reviews', 'ratings')}
+        if any(volume < 0 for volume in volumes.values()):
+            raise CommandError('Numbers of objects cannot be negative.')
+        if options['chunk_size'] < 1:
+            raise CommandError('Chunk size must be positive.')
+        start = default_timer()
+
+        def log(message):
+            self.stdout.write(f'{default_timer() - start:>8.1f}s  {message}')
+
+        seeder = Seeder(chunk_size=options['chunk_size'], exponent=options['exponent'],
+                        random_seed=options['random_seed'], log=log)
+        try:
+            seeder.seed(**volumes)
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        log('Done.')
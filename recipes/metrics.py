@@ -0,0 +1,374 @@
+import atexit
+import fcntl
+import glob
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import BasePermission, IsAdminUser
+from rest_framework.response import Response
+
+
+METRICS = {
+    # Directory shared by all worker processes of server, every process
+    # writes its metrics into its own file there and /metrics sums them.
+    # If it is None, /metrics shows metrics of the process that serves it.
+    'DIRECTORY': None,
+    # Seconds between writes of metrics of process into its file
+    'FLUSH_INTERVAL': 5,
+    # Addresses from which /metrics can be read without authentication,
+    # e.g. address of Prometheus server, admin users can read it from any address
+    'ALLOWED_IPS': ['127.0.0.1', '::1'],
+    'BUCKETS': [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10],
+}
+
+# name: (type, help)
+METRIC_TYPES = {
+    'http_requests_total': ('counter', 'Number of requests by route, method and status.'),
+    'http_request_duration_seconds': ('histogram', 'Time spent to respond to request.'),
+    'http_response_bytes_total': ('counter', 'Bytes of response bodies.'),
+    'db_queries_total': ('counter', 'Number of database queries made by requests.'),
+    'db_query_duration_seconds_total': ('counter', 'Time spent in database queries of requests.'),
+    'serializer_duration_seconds_total': ('counter', 'Time spent in serializers of requests.'),
+}
+
+UNMATCHED_ROUTE = 'unmatched'
+
+# Samples of processes that exited are added up in this file of DIRECTORY,
+# so that counters summed by /metrics never go down
+ARCHIVE_FILE_NAME = 'archived_metrics.json'
+LOCK_FILE_NAME = 'metrics.lock'
+
+# Measurements of request that is being served, context is copied
+# into threads of sync_to_async, so queries made there are counted too
+current_request = ContextVar('current_request_metrics', default=None)
+
+
+def get_metrics_settings():
+    return {**METRICS, **getattr(settings, 'METRICS', {})}
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.queries = 0
+        self.query_duration = 0.0
+        self.serializer_duration = 0.0
+        self.lock = threading.Lock()
+
+
+class Registry:
+    # Metrics of one process, all of them only grow, so metrics of processes
+    # are aggregated by adding up their samples
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples = {}
+        self.last_flush = time.monotonic()
+        self.path = None
+
+    def inc(self, name, labels, value=1):
+        key = (name, tuple(sorted(labels.items())))
+        self.samples[key] = self.samples.get(key, 0) + value
+
+    def observe(self, route, method, status, duration, response_bytes, request_metrics):
+        labels = {'route': route, 'method': method}
+        buckets = get_metrics_settings()['BUCKETS']
+        with self.lock:
+            self.inc('http_requests_total', {**labels, 'status': str(status)})
+            for bucket in buckets:
+                if duration <= bucket:
+                    self.inc('http_request_duration_seconds_bucket', {**labels, 'le': str(bucket)})
+            self.inc('http_request_duration_seconds_bucket', {**labels, 'le': '+Inf'})
+            self.inc('http_request_duration_seconds_sum', labels, duration)
+            self.inc('http_request_duration_seconds_count', labels)
+            self.inc('http_response_bytes_total', labels, response_bytes)
+            self.inc('db_queries_total', labels, request_metrics.queries)
+            self.inc('db_query_duration_seconds_total', labels, request_metrics.query_duration)
+            self.inc('serializer_duration_seconds_total', labels,
+                     request_metrics.serializer_duration)
+
+    def snapshot(self):
+        with self.lock:
+            return [[name, dict(labels), value]
+                    for (name, labels), value in self.samples.items()]
+
+    def get_path(self, directory):
+        # Start time is part of name, so that new process
+        # with the same pid does not overwrite file of old one
+        if self.path is None:
+            self.path = os.path.join(directory, f'metrics_{os.getpid()}_{time.time_ns()}.json')
+            atexit.register(self.archive_file)
+        return self.path
+
+    def archive_file(self):
+        # File of process is moved into archive when it exits
+        if self.path is not None:
+            self.flush(force=True)
+            archive_files(os.path.dirname(self.path), [self.path])
+
+    def flush(self, force=False):
+        metrics_settings = get_metrics_settings()
+        directory = metrics_settings['DIRECTORY']
+        if directory is None:
+            return
+        now = time.monotonic()
+        if not force and now - self.last_flush < metrics_settings['FLUSH_INTERVAL']:
+            return
+        self.last_flush = now
+        os.makedirs(directory, exist_ok=True)
+        write_samples(self.get_path(directory), self.snapshot())
+
+    def collect(self):
+        # Returns samples of all processes
+        directory = get_metrics_settings()['DIRECTORY']
+        if directory is None:
+            return self.snapshot()
+        self.flush(force=True)
+        paths = glob.glob(os.path.join(directory, 'metrics_*.json'))
+        # Files of processes that were killed before they could archive them
+        stale_paths = [path for path in paths if not is_process_running(path)]
+        if stale_paths:
+            archive_files(directory, stale_paths)
+        samples = []
+        with lock_directory(directory, exclusive=False):
+            for path in [os.path.join(directory, ARCHIVE_FILE_NAME)] + paths:
+                if path not in stale_paths:
+                    samples.extend(read_samples(path))
+        return samples
+
+
+@contextmanager
+def lock_directory(directory, exclusive=True):
+    # Files are read under shared lock and archived under exclusive one,
+    # so that samples of archived file are never read twice or missed
+    with open(os.path.join(directory, LOCK_FILE_NAME), 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def read_samples(path):
+    try:
+        with open(path) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return []
+
+
+def write_samples(path, samples):
+    # File is replaced at once, so that it is never read half written
+    file_descriptor, temporary_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    with os.fdopen(file_descriptor, 'w') as file:
+        json.dump(samples, file)
+    os.replace(temporary_path, path)
+
+
+def archive_files(directory, paths):
+    # Samples of files are added to archive and files are removed
+    with lock_directory(directory):
+        archive_path = os.path.join(directory, ARCHIVE_FILE_NAME)
+        totals = {}
+        for path in [archive_path] + paths:
+            for name, labels, value in read_samples(path):
+                key = (name, tuple(sorted(labels.items())))
+                totals[key] = totals.get(key, 0) + value
+        write_samples(archive_path, [[name, dict(labels), value]
+                                     for (name, labels), value in totals.items()])
+        for path in paths:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def is_process_running(path):
+    try:
+        pid = int(os.path.basename(path).split('_')[1])
+    except (IndexError, ValueError):
+        return False
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        # Process exists, but belongs to another user
+        return True
+    return True
+
+
+registry = Registry()
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    escaped = {name: str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+               for name, value in labels.items()}
+    return '{' + ','.join(f'{name}="{value}"' for name, value in sorted(escaped.items())) + '}'
+
+
+def get_base_name(name):
+    for suffix in ('_bucket', '_sum', '_count'):
+        if name.endswith(suffix) and name[:-len(suffix)] in METRIC_TYPES:
+            return name[:-len(suffix)]
+    return name
+
+
+def render_metrics(samples):
+    # Prometheus text format, samples with the same name and labels are added up
+    totals = {}
+    for name, labels, value in samples:
+        key = (name, tuple(sorted(labels.items())))
+        totals[key] = totals.get(key, 0) + value
+
+    def sort_key(item):
+        (name, labels), _ = item
+        labels = dict(labels)
+        le = labels.pop('le', None)
+        bucket = float('inf') if le == '+Inf' else float(le or 0)
+        return get_base_name(name), sorted(labels.items()), name, bucket
+
+    lines = []
+    described = set()
+    for (name, labels), value in sorted(totals.items(), key=sort_key):
+        base_name = get_base_name(name)
+        if base_name not in described and base_name in METRIC_TYPES:
+            metric_type, help_text = METRIC_TYPES[base_name]
+            lines.append(f'# HELP {base_name} {help_text}')
+            lines.append(f'# TYPE {base_name} {metric_type}')
+            described.add(base_name)
+        lines.append(f'{name}{format_labels(dict(labels))} {value}')
+    return '\n'.join(lines) + '\n'
+
+
+class IsAllowedAddress(BasePermission):
+    def has_permission(self, request, view):
+        return request.META.get('REMOTE_ADDR') in get_metrics_settings()['ALLOWED_IPS']
+
+
+@api_view(['GET'])
+@permission_classes([IsAllowedAddress | IsAdminUser])
+def metrics_view(request):
+    return HttpResponse(render_metrics(registry.collect()),
+                        content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+def record_query(execute, sql, params, many, context):
+    request_metrics = current_request.get()
+    if request_metrics is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        with request_metrics.lock:
+            request_metrics.queries += 1
+            request_metrics.query_duration += time.perf_counter() - start
+
+
+def add_query_recorder(sender, connection, **kwargs):
+    # Every new connection, in any thread, reports its queries
+    # to the request that makes them
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, record_query)
+
+
+@contextmanager
+def measure_serialization():
+    request_metrics = current_request.get()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if request_metrics is not None:
+            with request_metrics.lock:
+                request_metrics.serializer_duration += time.perf_counter() - start
+
+
+def get_serialized_data(serializer):
+    # Serializer computes representation when its data is read first time,
+    # views read it with this function, so that time of serialization is recorded
+    with measure_serialization():
+        return serializer.data
+
+
+class SerializerMetricsMixin:
+    # Same list and retrieve as of ListModelMixin and RetrieveModelMixin,
+    # but data of serializers is read with get_serialized_data
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(get_serialized_data(serializer))
+        serializer = self.get_serializer(queryset, many=True)
+        return Response(get_serialized_data(serializer))
+
+    def retrieve(self, request, *args, **kwargs):
+        serializer = self.get_serializer(self.get_object())
+        return Response(get_serialized_data(serializer))
+
+
+def install():
+    connection_created.connect(add_query_recorder)
+
+
+def get_response_bytes(response):
+    if response.streaming:
+        # Length of streamed response is not known before it is sent
+        return 0
+    return len(response.content)
+
+
+class MetricsMiddleware:
+    # Records latency, queries, serializer time and size of response
+    # of every request by name of its route, e.g. 'recipe-get-reviews'
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        request_metrics = RequestMetrics()
+        token = current_request.set(request_metrics)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            current_request.reset(token)
+        self.record(request, response, time.perf_counter() - start, request_metrics)
+        return response
+
+    async def __acall__(self, request):
+        request_metrics = RequestMetrics()
+        token = current_request.set(request_metrics)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_request.reset(token)
+        self.record(request, response, time.perf_counter() - start, request_metrics)
+        return response
+
+    def record(self, request, response, duration, request_metrics):
+        resolver_match = getattr(request, 'resolver_match', None)
+        route = resolver_match.view_name if resolver_match else UNMATCHED_ROUTE
+        registry.observe(route, request.method, response.status_code, duration,
+                         get_response_bytes(response), request_metrics)
+        registry.flush()
@@ -0,0 +1,44 @@
+# Generated by Django 4.2.4 on 2026-10-18 09:05
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def fill_rating_aggregates(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    Rating = apps.get_model('recipes', 'Rating')
+    aggregates = Rating.objects.values('recipe_id').\
+        annotate(count=Count('id'), sum=Sum('value')).order_by()
+    for aggregate in aggregates.iterator():
+        Recipe.objects.filter(pk=aggregate['recipe_id']).update(
+            rating_count=aggregate['count'],
+            rating_sum=aggregate['sum'],
+            rating_average=aggregate['sum'] / aggregate['count']
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0008_alter_recipe_slug'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='rating_average',
+            field=models.FloatField(db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(fill_rating_aggregates,
+                             migrations.RunPython.noop),
+    ]
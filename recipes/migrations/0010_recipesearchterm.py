@@ -0,0 +1,63 @@
+# Generated by Django 4.2.4 on 2026-10-18 09:07
+
+import re
+from collections import Counter
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# Terms of recipes as recipes.search computed them when this migration
+# was written, copied, so that later changes of the app do not change it
+WORD_RE = re.compile(r'\w+')
+MAX_TERM_LENGTH = 50
+MIN_TERM_LENGTH = 2
+TITLE_WEIGHT = 3
+INSTRUCTIONS_WEIGHT = 1
+
+
+def tokenize(text):
+    words = [word[:MAX_TERM_LENGTH] for word in WORD_RE.findall(str(text).lower())]
+    return [word for word in words if len(word) >= MIN_TERM_LENGTH]
+
+
+def recipe_terms(title, instructions):
+    weights = Counter()
+    for term in tokenize(title):
+        weights[term] += TITLE_WEIGHT
+    for term in tokenize(instructions):
+        weights[term] += INSTRUCTIONS_WEIGHT
+    return weights
+
+
+def index_recipes(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    RecipeSearchTerm = apps.get_model('recipes', 'RecipeSearchTerm')
+    recipes = Recipe.objects.only('id', 'title', 'instructions').order_by('id')
+    for recipe in recipes.iterator(chunk_size=1000):
+        RecipeSearchTerm.objects.bulk_create([
+            RecipeSearchTerm(term=term, recipe_id=recipe.id, weight=weight)
+            for term, weight in recipe_terms(recipe.title, recipe.instructions).items()
+        ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0009_recipe_rating_aggregates'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeSearchTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=50)),
+                ('weight', models.PositiveIntegerField()),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_terms', to='recipes.recipe')),
+            ],
+            options={
+                'unique_together': {('term', 'recipe')},
+            },
+        ),
+        migrations.RunPython(index_recipes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 4.2.4 on 2026-10-18 09:49
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F, FloatField, Value
+from django.db.models.functions import Cast
+
+
+def fill_rating_scores(apps, schema_editor):
+    # Score as recipes.leaderboard computed it when this migration was written,
+    # copied, so that later changes of the app do not change it
+    leaderboard_settings = {'PRIOR_MEAN': 5.0, 'PRIOR_COUNT': 10,
+                            **getattr(settings, 'LEADERBOARD', {})}
+    prior_count = leaderboard_settings['PRIOR_COUNT']
+    prior_total = leaderboard_settings['PRIOR_MEAN'] * prior_count
+    Recipe = apps.get_model('recipes', 'Recipe')
+    Recipe.objects.filter(rating_count__gt=0).update(
+        rating_score=(Cast('rating_sum', FloatField()) + Value(float(prior_total))) /
+        (F('rating_count') + Value(float(prior_count)))
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0012_recipeimage_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='rating_score',
+            field=models.FloatField(null=True),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-rating_score', '-id'], name='recipe_score_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['category', '-rating_score', '-id'], name='recipe_category_score_idx'),
+        ),
+        migrations.RunPython(fill_rating_scores,
+                             migrations.RunPython.noop),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 4.2.4 on 2026-10-18 09:53
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_of(model, field):
+    # Number of objects of model that reference outer row with field
+    return Coalesce(Subquery(
+        model.objects.filter(**{field: OuterRef('pk')}).order_by().
+        values(field).annotate(count=Count('id')).values('count')
+    ), 0)
+
+
+def fill_counters(apps, schema_editor):
+    Category = apps.get_model('recipes', 'Category')
+    Recipe = apps.get_model('recipes', 'Recipe')
+    Review = apps.get_model('recipes', 'Review')
+    Rating = apps.get_model('recipes', 'Rating')
+    CustomUser = apps.get_model('users', 'CustomUser')
+    Category.objects.update(recipe_count=count_of(Recipe, 'category'))
+    CustomUser.objects.update(recipe_count=count_of(Recipe, 'author'),
+                              review_count=count_of(Review, 'author'),
+                              rating_count=count_of(Rating, 'author'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0013_recipe_rating_score'),
+        ('users', '0004_customuser_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='recipe_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(fill_counters,
+                             migrations.RunPython.noop),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 4.2.4 on 2026-10-18 10:01
+
+from django.db import migrations, models
+from django.db.models import Max, OuterRef, Subquery
+import django.db.models.deletion
+
+
+CHUNK_SIZE = 10000
+
+
+def fill_canonical_ingredients(apps, schema_editor):
+    # Ingredients are updated in ranges of ids, every range adds its new
+    # names to dictionary and references them with one UPDATE
+    Ingredient = apps.get_model('recipes', 'Ingredient')
+    CanonicalIngredient = apps.get_model('recipes', 'CanonicalIngredient')
+    last_id = Ingredient.objects.aggregate(last_id=Max('id'))['last_id'] or 0
+    for start in range(0, last_id, CHUNK_SIZE):
+        ingredients = Ingredient.objects.filter(id__gt=start, id__lte=start + CHUNK_SIZE)
+        names = dict(ingredients.order_by().values_list('slug', 'name').distinct())
+        existing = set(CanonicalIngredient.objects.filter(slug__in=names).
+                       values_list('slug', flat=True))
+        CanonicalIngredient.objects.bulk_create(
+            [CanonicalIngredient(name=name, slug=slug)
+             for slug, name in names.items() if slug not in existing]
+        )
+        ingredients.update(canonical_id=Subquery(
+            CanonicalIngredient.objects.filter(slug=OuterRef('slug')).values('id')[:1]
+        ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0014_category_recipe_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CanonicalIngredient',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=155)),
+                ('slug', models.SlugField(max_length=155, unique=True)),
+            ],
+            options={
+                'ordering': ['name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='IngredientAlias',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('slug', models.SlugField(max_length=155, unique=True)),
+                ('canonical', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='aliases', to='recipes.canonicalingredient')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='ingredient',
+            name='canonical',
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='ingredients', to='recipes.canonicalingredient'),
+        ),
+        migrations.RunPython(fill_canonical_ingredients, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,93 @@
+# Generated by Django 4.2.4 on 2026-10-18 10:12
+
+from django.db import migrations, models
+from django.db.models import Count, Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+CHUNK_SIZE = 10000
+
+
+def fill_rating_histograms(apps, schema_editor):
+    # Histograms are filled in ranges of ids of recipes,
+    # only recipes that have ratings are updated
+    Recipe = apps.get_model('recipes', 'Recipe')
+    Rating = apps.get_model('recipes', 'Rating')
+    histogram = {
+        f'rating_count_{value}': Coalesce(Subquery(
+            Rating.objects.filter(recipe=OuterRef('pk'), value=value).order_by().
+            values('recipe').annotate(count=Count('id')).values('count')
+        ), 0)
+        for value in range(11)
+    }
+    last_id = Recipe.objects.aggregate(last_id=Max('id'))['last_id'] or 0
+    for start in range(0, last_id, CHUNK_SIZE):
+        Recipe.objects.filter(id__gt=start, id__lte=start + CHUNK_SIZE, rating_count__gt=0).\
+            update(**histogram)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0017_recipe_servings'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='rating_count_0',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='rating_count_1',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='rating_count_10',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='rating_count_2',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='rating_count_3',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='rating_count_4',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='rating_count_5',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='rating_count_6',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='rating_count_7',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='rating_count_8',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='rating_count_9',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(fill_rating_histograms,
+                             migrations.RunPython.noop),
+    ]
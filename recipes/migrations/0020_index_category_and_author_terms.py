@@ -0,0 +1,63 @@
+# Generated by Django 4.2.4 on 2026-10-18 14:20
+
+import re
+from collections import Counter
+from django.db import migrations, transaction
+
+
+# Terms of recipes as recipes.search computed them when this migration
+# was written, copied, so that later changes of the app do not change it
+WORD_RE = re.compile(r'\w+')
+MAX_TERM_LENGTH = 50
+MIN_TERM_LENGTH = 2
+TITLE_WEIGHT = 3
+INSTRUCTIONS_WEIGHT = 1
+CATEGORY_WEIGHT = 1
+AUTHOR_WEIGHT = 1
+
+
+def tokenize(text):
+    words = [word[:MAX_TERM_LENGTH] for word in WORD_RE.findall(str(text).lower())]
+    return [word for word in words if len(word) >= MIN_TERM_LENGTH]
+
+
+def recipe_terms(title, instructions, category_title, author_username):
+    weights = Counter()
+    for text, weight in [(title, TITLE_WEIGHT), (instructions, INSTRUCTIONS_WEIGHT),
+                         (category_title, CATEGORY_WEIGHT), (author_username, AUTHOR_WEIGHT)]:
+        for term in tokenize(text):
+            weights[term] += weight
+    return weights
+
+
+def index_recipes(apps, schema_editor):
+    # Words of category's title and author's username become terms of recipe,
+    # index is rebuilt in chunks of recipes
+    Recipe = apps.get_model('recipes', 'Recipe')
+    RecipeSearchTerm = apps.get_model('recipes', 'RecipeSearchTerm')
+    recipes = Recipe.objects.order_by('id').\
+        values_list('id', 'title', 'instructions', 'category__title', 'author__username')
+    last_id = 0
+    while True:
+        chunk = list(recipes.filter(id__gt=last_id)[:1000])
+        if not chunk:
+            break
+        last_id = chunk[-1][0]
+        with transaction.atomic():
+            RecipeSearchTerm.objects.filter(recipe_id__in=[row[0] for row in chunk]).delete()
+            RecipeSearchTerm.objects.bulk_create([
+                RecipeSearchTerm(term=term, recipe_id=recipe_id, weight=weight)
+                for recipe_id, *fields in chunk
+                for term, weight in recipe_terms(*fields).items()
+            ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0019_category_updated'),
+    ]
+
+    operations = [
+        migrations.RunPython(index_recipes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.4 on 2026-10-18 16:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0020_index_category_and_author_terms'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='rating_updated',
+            field=models.DateTimeField(editable=False, null=True),
+        ),
+    ]
@@ -1,18 +1,38 @@
-from django.db import models
-from django.db.models import Avg
+from django.db import models, transaction
+from django.db.models import F
 from django.template.defaultfilters import slugify
+from django.utils import timezone
 from django.core.validators import MinValueValidator
 from users.models import CustomUser
 from recipes.validators import validate_file_size
+from recipes.search import recipe_terms
+from recipes.leaderboard import rating_fields_expressions
 
 
 class Category(models.Model):
     title = models.CharField(max_length=155, unique=True)
     slug = models.SlugField(max_length=155, unique=True)
+    # Maintained by signals in recipes.signals, it should never be set directly
+    recipe_count = models.PositiveIntegerField(default=0)
+    # Title of category is shown in recipes, so conditional GET
+    # of recipes uses it(see recipes/conditional.py)
+    updated = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.title
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember title that is stored in the database,
+        # so that recipes of category are indexed again when it changes
+        instance._loaded_title = instance.__dict__.get('title')
+        return instance
+
+    @classmethod
+    def update_recipe_count(cls, category_id, delta):
+        cls.objects.filter(pk=category_id).update(recipe_count=F('recipe_count') + delta)
+
     class Meta:
         ordering = ['title']
 
@@ -33,6 +53,41 @@ class Rating(models.Model):
     class Meta:
         ordering = ['-published']
         unique_together = ('recipe', 'author')
+        indexes = [
+            models.Index(fields=['recipe', '-published', '-id'],
+                         name='rating_recipe_published_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember value that is stored in the database,
+        # so that update of rating can move recipe's aggregates by the difference
+        instance._loaded_value = instance.__dict__.get('value')
+        return instance
+
+    def save(self, *args, **kwargs):
+        # Aggregates of recipe are moved by signals in recipes.signals,
+        # in the same transaction as rating
+        with transaction.atomic():
+            if not self._state.adding and getattr(self, '_loaded_value', None) is None:
+                # Rating was not loaded from the database, so stored value is read
+                self._loaded_value = Rating.objects.filter(pk=self.pk).\
+                    values_list('value', flat=True).first()
+            super(Rating, self).save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            return super(Rating, self).delete(*args, **kwargs)
+
+
+def histogram_field(value):
+    # Name of counter of recipe's ratings with value
+    return f'rating_count_{value}'
+
+
+RATING_VALUES = [value for value, _ in Rating.rating_choices]
+HISTOGRAM_FIELDS = [histogram_field(value) for value in RATING_VALUES]
 
 
 class Recipe(models.Model):
@@ -47,16 +102,155 @@ class Recipe(models.Model):
     # it was necessary because of some issues while running migration
     published = models.DateTimeField(auto_now_add=True, null=True)
     updated = models.DateTimeField(auto_now=True)
+    # Aggregates of recipe's ratings, they are maintained by signals
+    # in recipes.signals, so they should never be set directly
+    rating_count = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
+    rating_average = models.FloatField(null=True, db_index=True)
+    # Bayesian average of ratings that recipes are ranked by
+    # on leaderboards(see recipes/leaderboard.py)
+    rating_score = models.FloatField(null=True)
+    # Histogram of ratings, number of ratings with every value,
+    # maintained together with other aggregates of ratings
+    rating_count_0 = models.PositiveIntegerField(default=0)
+    rating_count_1 = models.PositiveIntegerField(default=0)
+    rating_count_2 = models.PositiveIntegerField(default=0)
+    rating_count_3 = models.PositiveIntegerField(default=0)
+    rating_count_4 = models.PositiveIntegerField(default=0)
+    rating_count_5 = models.PositiveIntegerField(default=0)
+    rating_count_6 = models.PositiveIntegerField(default=0)
+    rating_count_7 = models.PositiveIntegerField(default=0)
+    rating_count_8 = models.PositiveIntegerField(default=0)
+    rating_count_9 = models.PositiveIntegerField(default=0)
+    rating_count_10 = models.PositiveIntegerField(default=0)
+    # Time aggregates of ratings were last moved, conditional GET of recipe
+    # uses it next to 'updated'(see recipes/conditional.py), which is
+    # changed only when recipe itself is edited
+    rating_updated = models.DateTimeField(null=True, editable=False)
+    # Number of servings quantities of ingredients are given for,
+    # recipes are scaled to other numbers of servings by it
+    servings = models.PositiveSmallIntegerField(null=True, blank=True,
+                                                validators=[MinValueValidator(1)])
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember category that is stored in the database,
+        # so that counters of categories can be moved when it changes,
+        # and fields that are indexed for search
+        instance._loaded_category_id = instance.__dict__.get('category_id')
+        instance._loaded_search_fields = instance.get_search_fields()
+        return instance
+
+    def get_search_fields(self):
+        return tuple(self.__dict__.get(field) for field in
+                     ('title', 'instructions', 'category_id', 'author_id'))
 
     def save(self, *args, **kwargs):
         self.slug = slugify(self.title)
-        super(Recipe, self).save(*args, **kwargs)
+        # Words of recipe are indexed again only if they could change
+        reindex = self._state.adding or \
+            getattr(self, '_loaded_search_fields', None) != self.get_search_fields()
+        with transaction.atomic():
+            super(Recipe, self).save(*args, **kwargs)
+            if reindex:
+                RecipeSearchTerm.index_recipe(self)
+        self._loaded_search_fields = self.get_search_fields()
+
+    @classmethod
+    def update_rating_aggregates(cls, recipe_id, count_delta, sum_delta, histogram_deltas=None):
+        # Counters are moved with F expressions, so concurrent writes
+        # do not overwrite each other, average and score of leaderboards
+        # are derived from them afterwards. 'rating_updated' is changed as well,
+        # so that conditional GET of recipe does not answer with stale aggregates
+        histogram = {histogram_field(value): F(histogram_field(value)) + delta
+                     for value, delta in (histogram_deltas or {}).items()}
+        recipes = cls.objects.filter(pk=recipe_id)
+        recipes.update(rating_count=F('rating_count') + count_delta,
+                       rating_sum=F('rating_sum') + sum_delta,
+                       rating_updated=timezone.now(),
+                       **histogram)
+        recipes.update(**rating_fields_expressions())
+
+    @property
+    def rating_histogram(self):
+        # Number of ratings with every value from 0 to 10
+        return [getattr(self, field) for field in HISTOGRAM_FIELDS]
 
     def __str__(self):
         return self.title
 
     class Meta:
         ordering = ['title']
+        indexes = [
+            models.Index(fields=['title', 'id'],
+                         name='recipe_title_idx'),
+            models.Index(fields=['category', 'title', 'id'],
+                         name='recipe_category_title_idx'),
+            models.Index(fields=['author', 'title', 'id'],
+                         name='recipe_author_title_idx'),
+            models.Index(fields=['published'],
+                         name='recipe_published_idx'),
+            # Top of leaderboard is a range read of these indexes
+            models.Index(fields=['-rating_score', '-id'],
+                         name='recipe_score_idx'),
+            models.Index(fields=['category', '-rating_score', '-id'],
+                         name='recipe_category_score_idx'),
+        ]
+
+
+class CanonicalIngredient(models.Model):
+    # Dictionary of ingredients, every ingredient of recipe references
+    # its entry, so recipes with ingredient are found by small integer key
+    id = models.AutoField(primary_key=True)
+    name = models.CharField(max_length=155)
+    slug = models.SlugField(max_length=155, unique=True)
+
+    def __str__(self):
+        return self.name
+
+    class Meta:
+        ordering = ['name']
+
+    @classmethod
+    def resolve(cls, names, create=True):
+        # Returns id of canonical ingredient for slug of every name, slugs
+        # of aliases are resolved to ingredients they were merged into.
+        # Unknown ingredients are added to dictionary, unless create is False.
+        names = {slugify(name): str(name).lower() for name in names}
+        ids = dict(IngredientAlias.objects.filter(slug__in=names).
+                   values_list('slug', 'canonical_id'))
+        missing = [slug for slug in names if slug not in ids]
+        if missing:
+            ids.update(cls.objects.filter(slug__in=missing).values_list('slug', 'id'))
+            missing = [slug for slug in missing if slug not in ids]
+        if missing and create:
+            # The same ingredients can be added by concurrent request
+            cls.objects.bulk_create([cls(name=names[slug], slug=slug) for slug in missing],
+                                    ignore_conflicts=True)
+            ids.update(cls.objects.filter(slug__in=missing).values_list('slug', 'id'))
+        return ids
+
+    @classmethod
+    def merge(cls, source, target):
+        # Ingredients of source are moved to target,
+        # and slug of source becomes alias of target
+        with transaction.atomic():
+            Ingredient.objects.filter(canonical=source).update(canonical=target)
+            IngredientAlias.objects.filter(canonical=source).update(canonical=target)
+            IngredientAlias.objects.create(slug=source.slug, canonical=target)
+            source.delete()
+
+
+class IngredientAlias(models.Model):
+    # Slug of ingredient that was merged into another one,
+    # e.g. 'all-purpose-flour' into 'flour'
+    slug = models.SlugField(max_length=155, unique=True)
+    canonical = models.ForeignKey(
+        CanonicalIngredient, related_name='aliases', on_delete=models.CASCADE)
+
+    def __str__(self):
+        return self.slug
 
 
 class Ingredient(models.Model):
@@ -83,16 +277,54 @@ class Ingredient(models.Model):
                                             choices=UNITS_OF_MEASUREMENT, null=True)
     recipe = models.ForeignKey(
         Recipe, related_name='ingredients', on_delete=models.CASCADE)
+    # It is set from name on save, objects created with bulk_create
+    # have to take it from CanonicalIngredient.resolve themselves
+    canonical = models.ForeignKey(
+        CanonicalIngredient, related_name='ingredients',
+        on_delete=models.PROTECT, db_index=False)
 
     def __str__(self):
         return self.name
 
     class Meta:
         ordering = ['name']
+        indexes = [
+            models.Index(fields=['recipe', 'name'],
+                         name='ingredient_recipe_name_idx'),
+            # Recipes with ingredient
+            models.Index(fields=['canonical', 'recipe'],
+                         name='ingredient_canonical_idx'),
+        ]
 
-    def save(self, *args, **kwargs):
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember slug, canonical ingredient and recipe stored in the database,
+        # so that canonical ingredient is resolved again when name changes
+        # and index of ingredients can be updated
+        instance._loaded_slug = instance.__dict__.get('slug')
+        instance._loaded_canonical_id = instance.__dict__.get('canonical_id')
+        instance._loaded_recipe_id = instance.__dict__.get('recipe_id')
+        return instance
+
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        self._loaded_slug = self.slug
+        self._loaded_canonical_id = self.canonical_id
+        self._loaded_recipe_id = self.recipe_id
+
+    def normalize_name(self):
+        # Called by save, objects created with bulk_create
+        # have to call it themselves
         self.slug = slugify(self.name)
         self.name = self.name.lower()
+
+    def save(self, *args, **kwargs):
+        self.normalize_name()
+        renamed = self.slug != getattr(self, '_loaded_slug', self.slug)
+        canonical_changed = self.canonical_id != getattr(self, '_loaded_canonical_id', None)
+        if self.canonical_id is None or (renamed and not canonical_changed):
+            self.canonical_id = CanonicalIngredient.resolve([self.name])[self.slug]
         super(Ingredient, self).save(*args, **kwargs)
 
 
@@ -101,6 +333,18 @@ class RecipeImage(models.Model):
         Recipe, related_name='images', on_delete=models.CASCADE)
     image = models.ImageField(
         upload_to='recipes/images/', validators=[validate_file_size])
+    # Filled in background by recipes.images after image was uploaded
+    width = models.PositiveIntegerField(null=True, blank=True)
+    height = models.PositiveIntegerField(null=True, blank=True)
+    # {'thumbnail': {'webp': path, 'jpeg': path}, 'medium': {...}, ...}
+    variants = models.JSONField(default=dict, blank=True)
+
+    def get_variant_url(self, name, extension='webp'):
+        # Original image is used until variants are created
+        path = self.variants.get(name, {}).get(extension)
+        if path is None:
+            return self.image.url
+        return self.image.storage.url(path)
 
     class Meta:
         ordering = ['id']
@@ -118,3 +362,48 @@ class Review(models.Model):
     class Meta:
         ordering = ['-published']
         unique_together = ('recipe', 'author')
+        indexes = [
+            models.Index(fields=['recipe', '-published', '-id'],
+                         name='review_recipe_published_idx'),
+        ]
+
+
+class RecipeSearchTerm(models.Model):
+    # Inverted index of words in recipe's title and instructions, category's title
+    # and author's username, it is rebuilt when any of them changes
+    term = models.CharField(max_length=50)
+    recipe = models.ForeignKey(
+        Recipe, related_name='search_terms', on_delete=models.CASCADE)
+    weight = models.PositiveIntegerField()
+
+    class Meta:
+        unique_together = ('term', 'recipe')
+
+    @classmethod
+    def index_recipe(cls, recipe):
+        cls.objects.filter(recipe=recipe).delete()
+        cls.objects.bulk_create([
+            cls(term=term, recipe=recipe, weight=weight)
+            for term, weight in recipe_terms(recipe.title, recipe.instructions,
+                                             recipe.category.title, recipe.author.username).items()
+        ])
+
+    @classmethod
+    def index_recipes(cls, recipes, chunk_size=1000):
+        # Rebuilds index of many recipes, e.g. of category whose title changed,
+        # in chunks of recipes
+        recipes = recipes.order_by('id').values_list('id', 'title', 'instructions',
+                                                      'category__title', 'author__username')
+        last_id = 0
+        while True:
+            chunk = list(recipes.filter(id__gt=last_id)[:chunk_size])
+            if not chunk:
+                break
+            last_id = chunk[-1][0]
+            with transaction.atomic():
+                cls.objects.filter(recipe_id__in=[row[0] for row in chunk]).delete()
+                cls.objects.bulk_create([
+                    cls(term=term, recipe_id=recipe_id, weight=weight)
+                    for recipe_id, *fields in chunk
+                    for term, weight in recipe_terms(*fields).items()
+                ])
@@ -0,0 +1,79 @@
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import BasePagination, PageNumberPagination, CursorPagination
+
+
+class RecipesPageNumberPagination(PageNumberPagination):
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+class RecipesCursorPagination(CursorPagination):
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+    def get_ordering(self, request, queryset, view):
+        # Default ordering is taken from the view, so that every view
+        # is paginated by the same stable ordering in both modes,
+        # paginator that is used without view keeps its own ordering
+        default_ordering = tuple(getattr(view, 'ordering', None) or self.ordering)
+        self.ordering = default_ordering
+        ordering = super().get_ordering(request, queryset, view)
+        # Position of the cursor is built from the first field of ordering
+        # and objects with the same value are skipped by offset, so only
+        # indexed, nearly unique fields that are not nullable and are not
+        # lookups through relations can be used for it
+        cursor_ordering_fields = getattr(view, 'cursor_ordering_fields', [])
+        if tuple(ordering) != default_ordering and \
+                ordering[0].lstrip('-') not in cursor_ordering_fields:
+            raise ValidationError(
+                detail=f"Cursor pagination cannot be ordered by {ordering[0].lstrip('-')}, "
+                f"available fields are: {', '.join(cursor_ordering_fields)}.")
+        return ordering
+
+
+class PageNumberOrCursorPagination(BasePagination):
+    # Page number pagination is used by default,
+    # cursor pagination is used if client asks for it with '?pagination=cursor'
+    # or follows a link that already contains a cursor
+    mode_query_param = 'pagination'
+    cursor_mode = 'cursor'
+    page_number_class = RecipesPageNumberPagination
+    cursor_class = RecipesCursorPagination
+
+    def __init__(self, ordering=None):
+        # Ordering is given when paginator is used without view,
+        # e.g. for collections of related objects returned by actions
+        self.ordering = ordering
+        self.paginator = self.page_number_class()
+
+    def use_cursor(self, request):
+        return request.query_params.get(self.mode_query_param) == self.cursor_mode or \
+            self.cursor_class.cursor_query_param in request.query_params
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.use_cursor(request):
+            self.paginator = self.cursor_class()
+            if self.ordering:
+                self.paginator.ordering = tuple(self.ordering)
+        else:
+            self.paginator = self.page_number_class()
+        return self.paginator.paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        return self.paginator.get_paginated_response(data)
+
+    def get_paginated_response_schema(self, schema):
+        return self.paginator.get_paginated_response_schema(schema)
+
+    @property
+    def display_page_controls(self):
+        return getattr(self.paginator, 'display_page_controls', False)
+
+    def to_html(self):
+        return self.paginator.to_html()
+
+    def get_results(self, data):
+        return self.paginator.get_results(data)
+
+    def get_schema_operation_parameters(self, view):
+        return self.paginator.get_schema_operation_parameters(view)
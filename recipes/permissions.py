@@ -1,6 +1,5 @@
 from rest_framework.permissions import BasePermission, SAFE_METHODS
-from rest_framework.exceptions import NotFound
-from recipes.models import Recipe, Ingredient
+from recipes.models import Ingredient
 
 
 class IsAdminOrReadOnly(BasePermission):
@@ -21,11 +20,8 @@ class IsAuthorOrReadOnly(BasePermission):
 class NestedIsAuthenticatedOrReadOnly(BasePermission):
 
     def has_permission(self, request, view):
-        recipe_id = view.kwargs['recipe_pk']
-        recipe = Recipe.objects.filter(id=recipe_id).first()
-        if not recipe:
-            raise NotFound(
-                detail=f"Recipe with id {recipe_id} was not found.")
+        # Raises NotFound if recipe referenced in url does not exist
+        view.get_recipe()
         if request.method in SAFE_METHODS:
             return True
         else:
@@ -35,10 +31,7 @@ class NestedIsAuthenticatedOrReadOnly(BasePermission):
 class NestedIsAuthorOrReadOnly(BasePermission):
 
     def has_object_permission(self, request, view, obj):
-        recipe_id = view.kwargs['recipe_pk']
-        recipe = Recipe.objects.filter(id=recipe_id).first()
-        if not recipe:
-            raise NotFound(detail=f"Recipe with id {recipe_id} was not found.")
+        view.get_recipe()
         if request.method in SAFE_METHODS:
             return True
         return obj.author == request.user
@@ -50,11 +43,7 @@ class IsRecipeAuthorOrReadOnly(BasePermission):
     def has_permission(self, request, view):
         # If recipe that is referenced in url does not exist,
         # then it does not matter if user is authenticated or not
-        recipe_id = view.kwargs['recipe_pk']
-        recipe = Recipe.objects.filter(id=recipe_id).first()
-        if not recipe:
-            raise NotFound(
-                detail=f"Recipe with id {recipe_id} was not found.")
+        recipe = view.get_recipe()
         if request.method in SAFE_METHODS:
             return True
         return recipe.author == request.user
@@ -62,11 +51,7 @@ class IsRecipeAuthorOrReadOnly(BasePermission):
     def has_object_permission(self, request, view, obj: Ingredient):
         # If recipe that is referenced in url does not exist,
         # then it does not matter if user is authenticated or not
-        recipe_id = view.kwargs['recipe_pk']
-        recipe = Recipe.objects.filter(id=recipe_id).first()
-        if not recipe:
-            raise NotFound(
-                detail=f"Recipe with id {recipe_id} was not found.")
+        recipe = view.get_recipe()
         if request.method in SAFE_METHODS:
             return True
-        return obj.recipe.author == request.user
+        return recipe.author == request.user
@@ -0,0 +1,66 @@
+from functools import lru_cache
+from django.urls import reverse as django_reverse, get_script_prefix, get_urlconf
+from rest_framework import serializers
+from rest_framework.reverse import reverse
+from rest_framework.settings import api_settings
+from rest_framework_nested import relations
+
+
+# Values that are put into url instead of real kwargs while building template,
+# they are digits, so that they match any lookup pattern of the router
+PLACEHOLDER_BASE = 10 ** 18
+
+
+@lru_cache(maxsize=None)
+def get_url_template(script_prefix, urlconf, view_name, kwarg_names):
+    # Reverses view name once with placeholders and turns result
+    # into format string, e.g. '/recipes/{recipe_pk}/reviews/{pk}/'
+    placeholders = {name: str(PLACEHOLDER_BASE + index)
+                    for index, name in enumerate(kwarg_names)}
+    url = django_reverse(view_name, urlconf=urlconf, kwargs=placeholders)
+    template = url.replace('{', '{{').replace('}', '}}')
+    for name, placeholder in placeholders.items():
+        template = template.replace(placeholder, '{' + name + '}')
+    return template
+
+
+def get_absolute_url_prefix(request):
+    # Scheme and host are the same for all urls built during request
+    prefix = getattr(request, '_absolute_url_prefix', None)
+    if prefix is None:
+        prefix = request.build_absolute_uri('/')[:-1]
+        request._absolute_url_prefix = prefix
+    return prefix
+
+
+def cached_reverse(viewname, args=None, kwargs=None, request=None, format=None, **extra):
+    # Same as rest_framework.reverse.reverse, but fills cached url template
+    # instead of resolving view name every time. Cases that template
+    # does not cover are passed to rest_framework.reverse.reverse.
+    if args or extra or format is not None or request is None or \
+            getattr(request, 'versioning_scheme', None) is not None or \
+            api_settings.URL_FORMAT_OVERRIDE in request.GET or \
+            not kwargs or not all(isinstance(value, int) for value in kwargs.values()):
+        return reverse(viewname, args=args, kwargs=kwargs, request=request,
+                       format=format, **extra)
+    template = get_url_template(get_script_prefix(), get_urlconf(), viewname,
+                                tuple(sorted(kwargs)))
+    return get_absolute_url_prefix(request) + template.format(**kwargs)
+
+
+class HyperlinkedRelatedField(serializers.HyperlinkedRelatedField):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.reverse = cached_reverse
+
+
+class HyperlinkedIdentityField(serializers.HyperlinkedIdentityField):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.reverse = cached_reverse
+
+
+class NestedHyperlinkedIdentityField(relations.NestedHyperlinkedIdentityField):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.reverse = cached_reverse
@@ -0,0 +1,101 @@
+from bisect import bisect_right
+from django.conf import settings
+
+
+SCALING = {
+    # Most recipes that can be scaled by one request
+    'MAX_RECIPES': 50,
+    # Most recipes that shopping list can be made for
+    'MAX_SHOPPING_LIST_RECIPES': 300,
+    'MAX_FACTOR': 100,
+    'DECIMAL_PLACES': 2,
+}
+
+MASS = 'mass'
+VOLUME = 'volume'
+COUNT = 'count'
+
+# Unit of ingredient: (dimension, size of unit in grams or millilitres),
+# ingredients without unit are counted in pieces
+UNITS = {
+    'mg': (MASS, 0.001),
+    'gm': (MASS, 1.0),
+    'oz': (MASS, 28.349523125),
+    'ml': (VOLUME, 1.0),
+    'l': (VOLUME, 1000.0),
+    None: (COUNT, 1.0),
+}
+
+ORIGINAL_UNITS = 'original'
+# Units of every dimension sorted by size, quantity is shown in the largest
+# unit that makes it at least 1, units of count are never changed
+UNIT_SYSTEMS = {
+    'metric': {
+        MASS: [('mg', 0.001), ('gm', 1.0), ('kg', 1000.0)],
+        VOLUME: [('ml', 1.0), ('l', 1000.0)],
+    },
+    'imperial': {
+        MASS: [('oz', 28.349523125), ('lb', 453.59237)],
+        VOLUME: [('tsp', 4.92892159375), ('tbsp', 14.78676478125),
+                 ('fl oz', 29.5735295625), ('cup', 236.5882365)],
+    },
+}
+
+
+def get_scaling_settings():
+    return {**SCALING, **getattr(settings, 'SCALING', {})}
+
+
+def to_base_units(quantities, units, factors):
+    # Columns of ingredients are converted at once: quantity times factor
+    # of its recipe in grams, millilitres or pieces, with dimension of each
+    sizes = [UNITS[unit][1] for unit in units]
+    dimensions = [UNITS[unit][0] for unit in units]
+    values = [quantity * factor * size
+              for quantity, factor, size in zip(quantities, factors, sizes)]
+    return values, dimensions
+
+
+def from_base_units(values, dimensions, unit_system):
+    # Returns columns of quantities and units of unit system
+    # for values in grams, millilitres or pieces
+    decimal_places = get_scaling_settings()['DECIMAL_PLACES']
+    system = UNIT_SYSTEMS[unit_system]
+    boundaries = {dimension: [size for _, size in units] for dimension, units in system.items()}
+    quantities, units = [], []
+    for value, dimension in zip(values, dimensions):
+        if dimension not in system:
+            quantities.append(round(value, decimal_places))
+            units.append(None)
+            continue
+        position = max(bisect_right(boundaries[dimension], value) - 1, 0)
+        unit, size = system[dimension][position]
+        quantities.append(round(value / size, decimal_places))
+        units.append(unit)
+    return quantities, units
+
+
+def convert(quantities, units, factors, unit_system=ORIGINAL_UNITS):
+    # Scales column of quantities by factors and converts them to unit system,
+    # in original units only quantities are scaled
+    if unit_system == ORIGINAL_UNITS:
+        decimal_places = get_scaling_settings()['DECIMAL_PLACES']
+        return [round(quantity * factor, decimal_places)
+                for quantity, factor in zip(quantities, factors)], list(units)
+    values, dimensions = to_base_units(quantities, units, factors)
+    return from_base_units(values, dimensions, unit_system)
+
+
+def combine(keys, quantities, units, factors, unit_system):
+    # Sums quantities of rows with the same key in one pass, quantities
+    # of different units of one dimension are added up in grams or millilitres.
+    # Returns (key, quantity, unit) for every key and dimension.
+    values, dimensions = to_base_units(quantities, units, factors)
+    totals = {}
+    for key, value, dimension in zip(keys, values, dimensions):
+        group = (key, dimension)
+        totals[group] = totals.get(group, 0.0) + value
+    quantities, units = from_base_units(totals.values(),
+                                        [dimension for _, dimension in totals], unit_system)
+    return [(key, quantity, unit)
+            for (key, _), quantity, unit in zip(totals, quantities, units)]
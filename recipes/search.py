@@ -0,0 +1,37 @@
+import re
+from collections import Counter
+
+
+WORD_RE = re.compile(r'\w+')
+# Terms are stored in a CharField, longer words are truncated
+MAX_TERM_LENGTH = 50
+# Single characters are not indexed, words of query that are shorter
+# are searched in fields of recipe(see recipes.filters.RecipeSearchFilter)
+MIN_TERM_LENGTH = 2
+# Most words of query that are searched at once
+MAX_QUERY_WORDS = 10
+TITLE_WEIGHT = 3
+INSTRUCTIONS_WEIGHT = 1
+CATEGORY_WEIGHT = 1
+AUTHOR_WEIGHT = 1
+
+
+def split_words(text):
+    return [word[:MAX_TERM_LENGTH] for word in WORD_RE.findall(str(text).lower())]
+
+
+def tokenize(text):
+    return [word for word in split_words(text) if len(word) >= MIN_TERM_LENGTH]
+
+
+def recipe_terms(title, instructions, category_title='', author_username=''):
+    # Returns weight of each term of recipe,
+    # term found in title weighs more than term found in instructions.
+    # Words of category's title and author's username are indexed as terms
+    # of recipe too, so that search is one lookup of the index.
+    weights = Counter()
+    for text, weight in [(title, TITLE_WEIGHT), (instructions, INSTRUCTIONS_WEIGHT),
+                         (category_title, CATEGORY_WEIGHT), (author_username, AUTHOR_WEIGHT)]:
+        for term in tokenize(text):
+            weights[term] += weight
+    return weights
@@ -0,0 +1,393 @@
+import random
+from bisect import bisect_left
+from contextlib import contextmanager
+from datetime import timedelta
+from itertools import accumulate
+from django.contrib.auth.hashers import make_password
+from django.db.models import Count, Sum, Max, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.template.defaultfilters import slugify
+from django.utils import timezone
+from recipes.cache import invalidate_tags
+from recipes.ingredient_index import ingredient_index
+from recipes.leaderboard import rating_fields_expressions
+from recipes.models import Category, Recipe, CanonicalIngredient, Ingredient, Review, Rating, RecipeSearchTerm, \
+    RATING_VALUES, HISTOGRAM_FIELDS, histogram_field
+from recipes.search import recipe_terms
+from users.models import CustomUser, fold_username
+
+
+ADJECTIVES = [
+    'classic', 'spicy', 'creamy', 'quick', 'roasted', 'grilled', 'baked', 'crispy',
+    'smoky', 'fresh', 'hearty', 'sweet', 'tangy', 'rustic', 'homemade', 'lemon',
+    'garlic', 'herb', 'honey', 'summer', 'winter', 'easy', 'slow cooked', 'one pot',
+]
+DISHES = [
+    'soup', 'salad', 'pasta', 'stew', 'curry', 'pie', 'risotto', 'tacos', 'burger',
+    'casserole', 'stir fry', 'omelette', 'pancakes', 'bread', 'cake', 'sandwich',
+    'noodles', 'skewers', 'bowl', 'tart', 'gratin', 'chili', 'dumplings', 'pizza',
+]
+# Ordered from the most to the least common, frequency of ingredients
+# in recipes follows Zipf's law as well
+INGREDIENTS = [
+    'salt', 'black pepper', 'olive oil', 'garlic', 'onion', 'butter', 'water',
+    'sugar', 'flour', 'eggs', 'milk', 'lemon juice', 'tomatoes', 'parsley',
+    'chicken breast', 'carrots', 'rice', 'potatoes', 'cheese', 'cream', 'basil',
+    'paprika', 'cumin', 'ginger', 'soy sauce', 'honey', 'spinach', 'mushrooms',
+    'bell pepper', 'beef', 'pasta', 'thyme', 'oregano', 'vinegar', 'coriander',
+    'zucchini', 'chickpeas', 'yogurt', 'bacon', 'celery', 'cinnamon', 'lime',
+    'coconut milk', 'pork', 'salmon', 'shrimp', 'beans', 'corn', 'broccoli',
+    'cabbage', 'avocado', 'chili flakes', 'almonds', 'walnuts', 'oats', 'tofu',
+    'lentils', 'peas', 'leek', 'eggplant', 'mint', 'rosemary', 'vanilla', 'cocoa',
+]
+UNITS = [unit for unit, _ in Ingredient.UNITS_OF_MEASUREMENT] + [None]
+STEPS = [
+    'Chop the {0} and the {1}.',
+    'Heat the {0} in a large pan over medium heat.',
+    'Add the {0} and cook for {2} minutes, stirring from time to time.',
+    'Mix the {0} with the {1} in a bowl.',
+    'Season with {0} and {1} to taste.',
+    'Bake for {2} minutes until golden.',
+    'Simmer for {2} minutes, then add the {0}.',
+    'Serve warm with {0}.',
+]
+REVIEWS = [
+    'Turned out great, will cook it again.',
+    'Too salty for my taste.',
+    'My family loved it!',
+    'Easy to follow and quick to make.',
+    'I added more {0} and it was even better.',
+    'Not bad, but it took longer than expected.',
+    'Perfect for a weekend dinner.',
+]
+# Weights of rating values 0..10, most ratings are good ones
+RATING_WEIGHTS = [1, 1, 1, 2, 3, 5, 8, 12, 16, 14, 10]
+# Dates of recipes, reviews and ratings are spread over this period
+HISTORY_DAYS = 3 * 365
+
+
+class ZipfSampler:
+    # Draws items so that item of rank r is drawn with probability
+    # proportional to 1 / r ** exponent, items are ranked in random order
+    # unless they are already ordered by popularity
+    def __init__(self, items, exponent, rng, shuffle=True):
+        self.items = list(items)
+        if shuffle:
+            rng.shuffle(self.items)
+        self.cum_weights = list(accumulate(1 / rank ** exponent
+                                           for rank in range(1, len(self.items) + 1)))
+        self.rng = rng
+
+    def __len__(self):
+        return len(self.items)
+
+    def weight(self, index):
+        previous = self.cum_weights[index - 1] if index else 0
+        return (self.cum_weights[index] - previous) / self.cum_weights[-1]
+
+    def choice(self):
+        point = self.rng.random() * self.cum_weights[-1]
+        return self.items[min(bisect_left(self.cum_weights, point), len(self.items) - 1)]
+
+    def sample(self, k):
+        return self.rng.choices(self.items, cum_weights=self.cum_weights, k=k)
+
+    def sample_distinct(self, k):
+        # Popular items are drawn many times, so items are drawn until
+        # there are enough different ones, the rest is filled uniformly
+        k = min(k, len(self.items))
+        chosen = set()
+        for _ in range(10):
+            chosen.update(self.sample(k - len(chosen)))
+            if len(chosen) == k:
+                return list(chosen)
+        while len(chosen) < k:
+            chosen.add(self.rng.choice(self.items))
+        return list(chosen)
+
+
+def split_total(total, sampler, cap, rng):
+    # Splits total between items of sampler in proportion to their weights,
+    # no item gets more than cap, returns {item: number}
+    total = min(total, cap * len(sampler))
+    counts = {}
+    active = list(range(len(sampler)))
+    remaining = total
+    while active and remaining:
+        active_weight = sum(sampler.weight(index) for index in active)
+        capped = [index for index in active
+                  if remaining * sampler.weight(index) / active_weight >= cap]
+        if not capped:
+            break
+        for index in capped:
+            counts[index] = cap
+        remaining -= cap * len(capped)
+        capped = set(capped)
+        active = [index for index in active if index not in capped]
+    if active and remaining:
+        active_weight = sum(sampler.weight(index) for index in active)
+        for index in active:
+            counts[index] = int(remaining * sampler.weight(index) / active_weight)
+        # Parts lost by rounding down go to random items
+        missing = total - sum(counts.values())
+        for index in rng.sample(active, min(missing, len(active))):
+            counts[index] += 1
+    return {sampler.items[index]: count for index, count in counts.items() if count}
+
+
+def count_of(model, field, **filters):
+    # Number of objects of model that reference outer row with field
+    return Coalesce(Subquery(
+        model.objects.filter(**{field: OuterRef('pk')}, **filters).order_by().
+        values(field).annotate(count=Count('id')).values('count')
+    ), 0)
+
+
+@contextmanager
+def dates_set_manually(*models):
+    # Seeded objects get dates from the past,
+    # auto_now and auto_now_add would replace them with current time
+    fields = [field for model in models for field in model._meta.concrete_fields
+              if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)]
+    flags = [(field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, (auto_now, auto_now_add) in zip(fields, flags):
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class Seeder:
+    # Generates users, categories, recipes and their related objects,
+    # everything is written with bulk_create in chunks.
+    # Popularity of recipes and categories, activity of users
+    # and number of recipes of authors follow power laws.
+    def __init__(self, chunk_size=5000, exponent=1.1, random_seed=None, log=None):
+        self.chunk_size = chunk_size
+        self.exponent = exponent
+        self.rng = random.Random(random_seed)
+        self.log = log or (lambda message: None)
+        self.now = timezone.now()
+
+    def random_date(self):
+        return self.now - timedelta(days=HISTORY_DAYS) * self.rng.random()
+
+    def write(self, model, objects):
+        # Batches keep every INSERT below max_allowed_packet of MySQL
+        model.objects.bulk_create(objects, batch_size=self.chunk_size)
+        objects.clear()
+
+    def new_ids(self, model, last_id):
+        # MySQL does not return ids of objects created with bulk_create
+        return list(model.objects.filter(id__gt=last_id).order_by('id').
+                    values_list('id', flat=True))
+
+    def last_id(self, model):
+        return model.objects.aggregate(last_id=Max('id'))['last_id'] or 0
+
+    def seed(self, users=0, categories=0, recipes=0, ingredients=0, reviews=0, ratings=0):
+        user_ids = self.create_users(users)
+        category_ids = self.create_categories(categories)
+        # Recipes can be written by existing users in existing categories,
+        # ingredients, reviews and ratings are created only for new recipes
+        if recipes and not (user_ids and category_ids):
+            user_ids = user_ids or list(CustomUser.objects.values_list('id', flat=True))
+            category_ids = category_ids or list(Category.objects.values_list('id', flat=True))
+            if not (user_ids and category_ids):
+                raise ValueError('Recipes cannot be created without users and categories.')
+        recipe_ids = self.create_recipes(recipes, user_ids, category_ids)
+        self.create_ingredients(ingredients, recipe_ids)
+        self.create_reviews(reviews, recipe_ids, user_ids)
+        self.create_ratings(ratings, recipe_ids, user_ids)
+        if recipe_ids:
+            self.update_counters(user_ids, category_ids)
+        # Signals are not sent by bulk_create
+        invalidate_tags(['category', 'recipe', 'author', 'ingredient', 'review', 'rating'])
+        if recipe_ids:
+            ingredient_index.invalidate()
+
+    def create_users(self, number):
+        if not number:
+            return []
+        last_id = self.last_id(CustomUser)
+        # Hashing password for every user would take longer than the rest of seeding
+        password = make_password(None)
+        users = []
+        for index in range(last_id + 1, last_id + number + 1):
+            username = f'seed_user_{index}'
+            # save() that folds username is not called by bulk_create
+            users.append(CustomUser(username=username,
+                                    username_folded=fold_username(username),
+                                    email=f'{username}@example.com',
+                                    password=password))
+            if len(users) == self.chunk_size:
+                self.write(CustomUser, users)
+        self.write(CustomUser, users)
+        user_ids = self.new_ids(CustomUser, last_id)
+        self.log(f'Created {len(user_ids)} users.')
+        return user_ids
+
+    def create_categories(self, number):
+        if not number:
+            return []
+        last_id = self.last_id(Category)
+        categories = [Category(title=f'Seed category {index}', slug=f'seed-category-{index}')
+                      for index in range(last_id + 1, last_id + number + 1)]
+        Category.objects.bulk_create(categories, batch_size=self.chunk_size)
+        category_ids = self.new_ids(Category, last_id)
+        self.log(f'Created {len(category_ids)} categories.')
+        return category_ids
+
+    def make_instructions(self):
+        steps = []
+        for template in self.rng.sample(STEPS, self.rng.randint(2, 5)):
+            steps.append(template.format(*self.rng.sample(INGREDIENTS, 2),
+                                         self.rng.randint(5, 60)))
+        return ' '.join(steps)
+
+    def create_recipes(self, number, user_ids, category_ids):
+        if not number:
+            return []
+        last_id = self.last_id(Recipe)
+        authors = ZipfSampler(user_ids, self.exponent, self.rng)
+        categories = ZipfSampler(category_ids, self.exponent, self.rng)
+        recipes = []
+        with dates_set_manually(Recipe):
+            for _ in range(number):
+                title = f'{self.rng.choice(ADJECTIVES)} {self.rng.choice(INGREDIENTS)} ' \
+                        f'{self.rng.choice(DISHES)}'.capitalize()
+                published = self.random_date()
+                recipes.append(Recipe(author_id=authors.choice(),
+                                      category_id=categories.choice(),
+                                      title=title, slug=slugify(title),
+                                      instructions=self.make_instructions(),
+                                      published=published, updated=published))
+                if len(recipes) == self.chunk_size:
+                    self.write(Recipe, recipes)
+            self.write(Recipe, recipes)
+        self.create_search_terms(last_id)
+        recipe_ids = self.new_ids(Recipe, last_id)
+        self.log(f'Created {len(recipe_ids)} recipes.')
+        return recipe_ids
+
+    def create_search_terms(self, last_id):
+        # Recipe.save indexes words of recipe, it is not called by bulk_create
+        recipes = Recipe.objects.filter(id__gt=last_id).order_by('id').\
+            values_list('id', 'title', 'instructions', 'category__title', 'author__username')
+        terms = []
+        for recipe_id, *fields in recipes.iterator(chunk_size=self.chunk_size):
+            for term, weight in recipe_terms(*fields).items():
+                terms.append(RecipeSearchTerm(term=term, recipe_id=recipe_id, weight=weight))
+            if len(terms) >= self.chunk_size:
+                self.write(RecipeSearchTerm, terms)
+        self.write(RecipeSearchTerm, terms)
+
+    def create_ingredients(self, number, recipe_ids):
+        if not number or not recipe_ids:
+            return
+        names = ZipfSampler(INGREDIENTS, self.exponent, self.rng, shuffle=False)
+        canonical_ids = CanonicalIngredient.resolve(INGREDIENTS)
+        per_recipe, extra = divmod(min(number, len(recipe_ids) * len(INGREDIENTS)), len(recipe_ids))
+        with_extra = set(self.rng.sample(range(len(recipe_ids)), extra))
+        ingredients = []
+        created = 0
+        for index, recipe_id in enumerate(recipe_ids):
+            count = per_recipe + (index in with_extra)
+            for name in names.sample_distinct(count):
+                ingredient = Ingredient(recipe_id=recipe_id, name=name,
+                                        quantity=self.rng.randint(1, 500),
+                                        units_of_measurement=self.rng.choice(UNITS))
+                ingredient.normalize_name()
+                ingredient.canonical_id = canonical_ids[ingredient.slug]
+                ingredients.append(ingredient)
+            if len(ingredients) >= self.chunk_size:
+                created += len(ingredients)
+                self.write(Ingredient, ingredients)
+        created += len(ingredients)
+        self.write(Ingredient, ingredients)
+        self.log(f'Created {created} ingredients.')
+
+    def create_by_users(self, number, recipe_ids, user_ids, make_object, model):
+        # Every user writes at most one review or rating for recipe,
+        # active users write many of them, mostly for popular recipes
+        if not number or not recipe_ids or not user_ids:
+            return 0
+        recipes = ZipfSampler(recipe_ids, self.exponent, self.rng)
+        users = ZipfSampler(user_ids, self.exponent, self.rng)
+        counts = split_total(number, users, max(len(recipe_ids) // 2, 1), self.rng)
+        objects = []
+        created = 0
+        with dates_set_manually(model):
+            for user_id, count in counts.items():
+                # The most active user can write objects for half of recipes,
+                # so objects are written while they are made
+                for recipe_id in recipes.sample_distinct(count):
+                    objects.append(make_object(recipe_id, user_id))
+                    if len(objects) >= self.chunk_size:
+                        created += len(objects)
+                        self.write(model, objects)
+            created += len(objects)
+            self.write(model, objects)
+        return created
+
+    def make_review(self, recipe_id, user_id):
+        published = self.random_date()
+        return Review(recipe_id=recipe_id, author_id=user_id,
+                      content=self.rng.choice(REVIEWS).format(self.rng.choice(INGREDIENTS)),
+                      published=published, updated=published)
+
+    def make_rating(self, recipe_id, user_id):
+        published = self.random_date()
+        return Rating(recipe_id=recipe_id, author_id=user_id,
+                      value=self.rng.choices(range(11), weights=RATING_WEIGHTS)[0],
+                      published=published, updated=published)
+
+    def create_reviews(self, number, recipe_ids, user_ids):
+        created = self.create_by_users(number, recipe_ids, user_ids, self.make_review, Review)
+        if created:
+            self.log(f'Created {created} reviews.')
+
+    def create_ratings(self, number, recipe_ids, user_ids):
+        created = self.create_by_users(number, recipe_ids, user_ids, self.make_rating, Rating)
+        if created:
+            self.update_rating_aggregates(recipe_ids)
+            self.log(f'Created {created} ratings.')
+
+    def update_rating_aggregates(self, recipe_ids):
+        # Signals maintain aggregates of recipe, they are not sent by bulk_create.
+        # Ratings of new recipes are aggregated in one pass grouped by recipe
+        # and aggregates are written in chunks
+        aggregates = Rating.objects.filter(recipe_id__gte=recipe_ids[0]).\
+            order_by('recipe_id').values('recipe_id').\
+            annotate(rating_count=Count('id'), rating_sum=Sum('value'),
+                     **{histogram_field(value): Count('id', filter=Q(value=value))
+                        for value in RATING_VALUES})
+        recipes = []
+        for row in aggregates.iterator(chunk_size=self.chunk_size):
+            recipes.append(Recipe(id=row.pop('recipe_id'), **row))
+            if len(recipes) >= self.chunk_size:
+                self.write_rating_aggregates(recipes)
+        self.write_rating_aggregates(recipes)
+
+    def write_rating_aggregates(self, recipes):
+        if not recipes:
+            return
+        Recipe.objects.bulk_update(recipes, ['rating_count', 'rating_sum', *HISTOGRAM_FIELDS])
+        Recipe.objects.filter(id__gte=recipes[0].id, id__lte=recipes[-1].id).\
+            update(**rating_fields_expressions())
+        recipes.clear()
+
+    def update_counters(self, user_ids, category_ids):
+        # Counters of categories and users are maintained by signals,
+        # they are not sent by bulk_create
+        for start in range(0, len(category_ids), self.chunk_size):
+            Category.objects.filter(id__in=category_ids[start:start + self.chunk_size]).\
+                update(recipe_count=count_of(Recipe, 'category'))
+        for start in range(0, len(user_ids), self.chunk_size):
+            CustomUser.objects.filter(id__in=user_ids[start:start + self.chunk_size]).\
+                update(recipe_count=count_of(Recipe, 'author'),
+                       review_count=count_of(Review, 'author'),
+                       rating_count=count_of(Rating, 'author'))
+        self.log('Updated counters of categories and users.')
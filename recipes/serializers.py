@@ -1,65 +1,117 @@
 from django.db.models import Avg
 from rest_framework import serializers
-from rest_framework_nested.relations import NestedHyperlinkedIdentityField, NestedHyperlinkedRelatedField
 from rest_framework_nested.serializers import NestedHyperlinkedModelSerializer
 from recipes.models import Category, Recipe, Ingredient, RecipeImage, Review, Rating
+from recipes.relations import HyperlinkedRelatedField, HyperlinkedIdentityField, \
+    NestedHyperlinkedIdentityField
 from users.models import CustomUser
 
 
 class CategorySerializer(serializers.HyperlinkedModelSerializer):
-    get_recipes = serializers.HyperlinkedIdentityField(
+    serializer_url_field = HyperlinkedIdentityField
+    serializer_related_field = HyperlinkedRelatedField
+    get_recipes = HyperlinkedIdentityField(
         view_name='category-get-recipes', read_only=True
     )
 
     class Meta:
         model = Category
-        fields = ['url', 'id', 'title', 'slug', 'get_recipes']
+        fields = ['url', 'id', 'title', 'slug', 'recipe_count', 'get_recipes']
+        read_only_fields = ['recipe_count']
 
 
 class RecipeSerializer(serializers.HyperlinkedModelSerializer):
+    serializer_url_field = HyperlinkedIdentityField
+    serializer_related_field = HyperlinkedRelatedField
     author_name = serializers.ReadOnlyField(source='author.username')
-    author = serializers.HyperlinkedRelatedField(view_name='author-detail',
-                                                 read_only=True)
+    author = HyperlinkedRelatedField(view_name='author-detail',
+                                     read_only=True)
     category_title = serializers.ReadOnlyField(source='category.title')
-    category = serializers.HyperlinkedRelatedField(view_name='category-detail',
-                                                   read_only=True)
-    get_ingredients = serializers.HyperlinkedIdentityField(
+    category = HyperlinkedRelatedField(view_name='category-detail',
+                                       read_only=True)
+    get_ingredients = HyperlinkedIdentityField(
         view_name='recipe-get-ingredients', read_only=True
     )
 
-    get_reviews = serializers.HyperlinkedIdentityField(
+    get_reviews = HyperlinkedIdentityField(
         view_name='recipe-get-reviews', read_only=True
     )
 
-    get_ratings = serializers.HyperlinkedIdentityField(
+    get_ratings = HyperlinkedIdentityField(
         view_name='recipe-get-ratings', read_only=True
     )
 
-    get_average_rating = serializers.HyperlinkedIdentityField(
+    get_average_rating = HyperlinkedIdentityField(
         view_name='recipe-get-average-rating', read_only=True
     )
 
-    get_images = serializers.HyperlinkedIdentityField(
+    get_images = HyperlinkedIdentityField(
         view_name='recipe-get-images', read_only=True
     )
 
     class Meta:
         model = Recipe
         fields = ['url', 'id', 'title', 'slug',
-                  'instructions', 'published', 'updated',
+                  'instructions', 'servings', 'published', 'updated',
+                  'rating_count', 'rating_sum', 'rating_average', 'rating_score',
                   'author_name', 'author',
                   'category_title', 'category',
                   'get_ingredients', 'get_reviews',
                   'get_ratings', 'get_average_rating',
                   'get_images']
+        read_only_fields = ['rating_count', 'rating_sum', 'rating_average', 'rating_score']
+
+    def to_representation(self, instance):
+        representation = super().to_representation(instance)
+        # Sub-resources requested with '?expand=' are embedded into recipe,
+        # view prefetches them, so no queries are made for each recipe
+        expand = self.context.get('expand', [])
+        if 'ingredients' in expand:
+            representation['ingredients'] = IngredientSerializer(
+                instance.ingredients.all(), many=True, context=self.context).data
+        if 'images' in expand:
+            representation['images'] = RecipeImageSerializer(
+                instance.images.all(), many=True, context=self.context).data
+        if 'reviews' in expand:
+            # Only latest reviews are embedded, get_reviews lists all of them
+            representation['reviews'] = ReviewSerializer(
+                instance.latest_reviews, many=True, context=self.context).data
+        if 'rating_summary' in expand:
+            representation['rating_summary'] = {
+                'count': instance.rating_count,
+                'sum': instance.rating_sum,
+                'average': instance.rating_average
+            }
+        if 'rating_histogram' in expand:
+            representation['rating_histogram'] = instance.rating_histogram
+        return representation
+
+
+class LeaderboardRecipeSerializer(RecipeSerializer):
+    # Rank is set on recipes by view, they are ordered by score
+    rank = serializers.IntegerField(read_only=True)
+
+    class Meta(RecipeSerializer.Meta):
+        fields = ['rank'] + RecipeSerializer.Meta.fields
+
+
+class IngredientMatchRecipeSerializer(RecipeSerializer):
+    # Set on recipes by view from index of ingredients
+    matched_ingredients = serializers.ListField(child=serializers.SlugField(), read_only=True)
+    coverage = serializers.FloatField(read_only=True)
+
+    class Meta(RecipeSerializer.Meta):
+        fields = ['matched_ingredients', 'coverage'] + RecipeSerializer.Meta.fields
 
 
 class CreateUpdateRecipeSerializer(serializers.HyperlinkedModelSerializer):
+    serializer_url_field = HyperlinkedIdentityField
+    serializer_related_field = HyperlinkedRelatedField
     category_title = serializers.ReadOnlyField(source='category.title')
 
     class Meta:
         model = Recipe
-        fields = ['url', 'id', 'title', 'instructions', 'published', 'updated',
+        fields = ['url', 'id', 'title', 'instructions', 'servings', 'published', 'updated',
                   'category_title', 'category']
 
 
@@ -72,7 +124,7 @@ class IngredientSerializer(NestedHyperlinkedModelSerializer):
         }
     )
     recipe_title = serializers.ReadOnlyField(source='recipe.title')
-    recipe = serializers.HyperlinkedRelatedField(
+    recipe = HyperlinkedRelatedField(
         view_name='recipe-detail', read_only=True)
 
     class Meta:
@@ -104,7 +156,7 @@ class CreateUpdateIngredientSerializer(NestedHyperlinkedModelSerializer):
     )
 
     recipe_title = serializers.ReadOnlyField(source='recipe.title')
-    recipe = serializers.HyperlinkedRelatedField(
+    recipe = HyperlinkedRelatedField(
         view_name='recipe-detail', read_only=True)
 
     class Meta:
@@ -125,15 +177,32 @@ class RecipeImageSerializer(NestedHyperlinkedModelSerializer):
     )
 
     recipe_title = serializers.ReadOnlyField(source='recipe.title')
-    recipe = serializers.HyperlinkedRelatedField(
+    recipe = HyperlinkedRelatedField(
         view_name='recipe-detail', read_only=True
     )
+    variants = serializers.SerializerMethodField()
 
     class Meta:
         model = RecipeImage
         fields = [
-            'url', 'id', 'image', 'recipe_title', 'recipe'
+            'url', 'id', 'image', 'recipe_title', 'recipe',
+            'width', 'height', 'variants'
         ]
+        read_only_fields = ['width', 'height']
+
+    def get_variants(self, image):
+        # Paths of variants are turned into urls the same way as url of image
+        request = self.context.get('request')
+        storage = image.image.storage
+        variants = {}
+        for name, paths in image.variants.items():
+            variants[name] = {}
+            for extension, path in paths.items():
+                url = storage.url(path)
+                if request is not None:
+                    url = request.build_absolute_uri(url)
+                variants[name][extension] = url
+        return variants
 
 
 class ReviewSerializer(NestedHyperlinkedModelSerializer):
@@ -146,11 +215,11 @@ class ReviewSerializer(NestedHyperlinkedModelSerializer):
     )
 
     recipe_title = serializers.ReadOnlyField(source='recipe.title')
-    recipe = serializers.HyperlinkedRelatedField(
+    recipe = HyperlinkedRelatedField(
         view_name='recipe-detail', read_only=True
     )
     author_name = serializers.ReadOnlyField(source='author.username')
-    author = serializers.HyperlinkedRelatedField(
+    author = HyperlinkedRelatedField(
         view_name='author-detail', read_only=True
     )
 
@@ -172,11 +241,11 @@ class RatingSerializer(NestedHyperlinkedModelSerializer):
     )
 
     recipe_title = serializers.ReadOnlyField(source='recipe.title')
-    recipe = serializers.HyperlinkedRelatedField(
+    recipe = HyperlinkedRelatedField(
         view_name='recipe-detail', read_only=True
     )
     author_name = serializers.ReadOnlyField(source='author.username')
-    author = serializers.HyperlinkedRelatedField(
+    author = HyperlinkedRelatedField(
         view_name='author-detail', read_only=True
     )
 
@@ -189,15 +258,25 @@ class RatingSerializer(NestedHyperlinkedModelSerializer):
 
 
 class AuthorSerializer(serializers.ModelSerializer):
-    url = serializers.HyperlinkedIdentityField(
+    url = HyperlinkedIdentityField(
         view_name='author-detail', read_only=True)
 
-    get_recipes = serializers.HyperlinkedIdentityField(
+    get_recipes = HyperlinkedIdentityField(
         view_name='author-get-recipes', read_only=True
     )
 
     class Meta:
         model = CustomUser
         fields = [
-            'url', 'id', 'username', 'image', 'get_recipes'
+            'url', 'id', 'username', 'image',
+            'recipe_count', 'review_count', 'rating_count', 'get_recipes'
         ]
+
+
+class AuthorAutocompleteSerializer(serializers.ModelSerializer):
+    url = HyperlinkedIdentityField(
+        view_name='author-detail', read_only=True)
+
+    class Meta:
+        model = CustomUser
+        fields = ['url', 'id', 'username']
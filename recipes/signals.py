@@ -0,0 +1,179 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from recipes.cache import invalidate_tags
+from recipes.images import delete_variants, schedule_processing
+from recipes.ingredient_index import ingredient_index
+from recipes.models import Category, Recipe, Ingredient, RecipeImage, Review, Rating, RecipeSearchTerm
+from users.models import CustomUser
+
+
+@receiver([post_save, post_delete], sender=Category)
+def invalidate_category(sender, instance, **kwargs):
+    invalidate_tags(['category', f'category:{instance.pk}'])
+
+
+@receiver([post_save, post_delete], sender=Recipe)
+def invalidate_recipe(sender, instance, **kwargs):
+    invalidate_tags(['recipe', f'recipe:{instance.pk}'])
+
+
+# Lists of recipes are tagged with every recipe they show, so they are
+# invalidated by tag of recipe. Tags of models are used by lists that
+# are ordered or filtered by related objects, e.g. leaderboards by ratings.
+RELATED_OBJECT_TAGS = {Ingredient: ['ingredient'], RecipeImage: [],
+                       Review: ['review'], Rating: ['rating']}
+
+
+@receiver([post_save, post_delete], sender=Ingredient)
+@receiver([post_save, post_delete], sender=RecipeImage)
+@receiver([post_save, post_delete], sender=Review)
+@receiver([post_save, post_delete], sender=Rating)
+def invalidate_recipe_of_related_object(sender, instance, **kwargs):
+    invalidate_tags([f'recipe:{instance.recipe_id}', *RELATED_OBJECT_TAGS[sender]])
+
+
+# Responses show only username and image of user, so saves that change
+# other fields, e.g. last_login on every login, keep them cached.
+# Lists of authors get new authors and are ordered by username.
+# It runs before index_recipes_of_author, which updates _loaded_username.
+@receiver(post_save, sender=CustomUser)
+def invalidate_author(sender, instance, created, **kwargs):
+    image = instance.image.name or None
+    if created:
+        invalidate_tags(['author'])
+    elif getattr(instance, '_loaded_username', None) != instance.username:
+        invalidate_tags(['author', f'author:{instance.pk}'])
+    elif getattr(instance, '_loaded_image', None) != image:
+        invalidate_tags([f'author:{instance.pk}'])
+    instance._loaded_image = image
+
+
+@receiver(post_delete, sender=CustomUser)
+def invalidate_deleted_author(sender, instance, **kwargs):
+    invalidate_tags(['author', f'author:{instance.pk}'])
+
+
+@receiver(post_save, sender=RecipeImage)
+def process_recipe_image(sender, instance, created, **kwargs):
+    if created:
+        schedule_processing(instance.pk)
+
+
+@receiver(post_delete, sender=RecipeImage)
+def delete_recipe_image_variants(sender, instance, **kwargs):
+    # Original file is deleted by django_cleanup, but it does not know about variants
+    transaction.on_commit(
+        lambda: delete_variants(instance.image.storage, instance.variants)
+    )
+
+
+# Counters are moved when objects are created or deleted, post_delete
+# is also sent for objects deleted by cascade. Counters are part of
+# responses of categories and authors, so their cache is invalidated,
+# lists ordered by counters are invalidated by tags of counted objects.
+def update_category_recipe_count(category_id, delta):
+    Category.update_recipe_count(category_id, delta)
+    invalidate_tags([f'category:{category_id}'])
+
+
+def update_user_counters(user_id, **deltas):
+    CustomUser.update_counters(user_id, **deltas)
+    invalidate_tags([f'author:{user_id}'])
+
+
+@receiver(post_save, sender=Recipe)
+def count_saved_recipe(sender, instance, created, **kwargs):
+    previous_category_id = getattr(instance, '_loaded_category_id', None)
+    if created:
+        update_category_recipe_count(instance.category_id, 1)
+        update_user_counters(instance.author_id, recipe_count=1)
+    elif previous_category_id is not None and previous_category_id != instance.category_id:
+        update_category_recipe_count(previous_category_id, -1)
+        update_category_recipe_count(instance.category_id, 1)
+    instance._loaded_category_id = instance.category_id
+
+
+@receiver(post_delete, sender=Recipe)
+def count_deleted_recipe(sender, instance, **kwargs):
+    update_category_recipe_count(instance.category_id, -1)
+    update_user_counters(instance.author_id, recipe_count=-1)
+
+
+@receiver(post_save, sender=Review)
+def count_saved_review(sender, instance, created, **kwargs):
+    if created:
+        update_user_counters(instance.author_id, review_count=1)
+
+
+@receiver(post_delete, sender=Review)
+def count_deleted_review(sender, instance, **kwargs):
+    update_user_counters(instance.author_id, review_count=-1)
+
+
+@receiver(post_save, sender=Rating)
+def count_saved_rating(sender, instance, created, **kwargs):
+    previous_value = getattr(instance, '_loaded_value', None)
+    if created or previous_value is None:
+        update_user_counters(instance.author_id, rating_count=1)
+        Recipe.update_rating_aggregates(instance.recipe_id,
+                                        count_delta=1,
+                                        sum_delta=instance.value,
+                                        histogram_deltas={instance.value: 1})
+    elif previous_value != instance.value:
+        # Vote moves from one bucket of histogram to another
+        Recipe.update_rating_aggregates(instance.recipe_id,
+                                        count_delta=0,
+                                        sum_delta=instance.value - previous_value,
+                                        histogram_deltas={previous_value: -1,
+                                                          instance.value: 1})
+    instance._loaded_value = instance.value
+
+
+@receiver(post_delete, sender=Rating)
+def count_deleted_rating(sender, instance, origin=None, **kwargs):
+    update_user_counters(instance.author_id, rating_count=-1)
+    # Aggregates of recipe that is deleted itself are not moved
+    if not (isinstance(origin, Recipe) and origin.pk == instance.recipe_id):
+        Recipe.update_rating_aggregates(instance.recipe_id,
+                                        count_delta=-1,
+                                        sum_delta=-instance.value,
+                                        histogram_deltas={instance.value: -1})
+
+
+# Words of category's title and author's username are indexed
+# as terms of their recipes
+@receiver(post_save, sender=Category)
+def index_recipes_of_category(sender, instance, created, **kwargs):
+    if not created and getattr(instance, '_loaded_title', instance.title) != instance.title:
+        RecipeSearchTerm.index_recipes(Recipe.objects.filter(category=instance))
+    instance._loaded_title = instance.title
+
+
+@receiver(post_save, sender=CustomUser)
+def index_recipes_of_author(sender, instance, created, **kwargs):
+    if not created and getattr(instance, '_loaded_username', instance.username) != instance.username:
+        RecipeSearchTerm.index_recipes(Recipe.objects.filter(author=instance))
+    instance._loaded_username = instance.username
+
+
+# Index of ingredients is updated after transaction is committed
+@receiver(post_save, sender=Ingredient)
+def index_saved_ingredient(sender, instance, created, **kwargs):
+    previous = (getattr(instance, '_loaded_canonical_id', None),
+                getattr(instance, '_loaded_recipe_id', None))
+    current = (instance.canonical_id, instance.recipe_id)
+    if created:
+        ingredient_index.apply_on_commit(added=[current])
+    elif previous[0] is None:
+        # Ingredient was not loaded from the database, its previous values are not known
+        transaction.on_commit(ingredient_index.invalidate)
+    elif previous != current:
+        ingredient_index.apply_on_commit(added=[current], removed=[previous])
+    instance._loaded_canonical_id, instance._loaded_recipe_id = current
+    instance._loaded_slug = instance.slug
+
+
+@receiver(post_delete, sender=Ingredient)
+def index_deleted_ingredient(sender, instance, **kwargs):
+    ingredient_index.apply_on_commit(removed=[(instance.canonical_id, instance.recipe_id)])
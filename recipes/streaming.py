@@ -0,0 +1,53 @@
+import json
+from itertools import islice
+from django.http import StreamingHttpResponse
+from rest_framework.utils.encoders import JSONEncoder
+
+
+def iterate_chunks(iterable, chunk_size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def serialize_chunk(chunk, serializer_class, context):
+    data = serializer_class(chunk, many=True, context=context).data
+    return ','.join(json.dumps(item, cls=JSONEncoder) for item in data)
+
+
+def stream_serialized_list(queryset, serializer_class, context, chunk_size=500):
+    # Returns JSON array of all objects of queryset, objects are fetched
+    # from database and serialized by chunks while response is being sent,
+    # so memory used does not depend on number of objects
+    def generate():
+        yield '['
+        separator = ''
+        for chunk in iterate_chunks(queryset.iterator(chunk_size=chunk_size), chunk_size):
+            yield separator + serialize_chunk(chunk, serializer_class, context)
+            separator = ','
+        yield ']'
+
+    return StreamingHttpResponse(generate(), content_type='application/json')
+
+
+def astream_serialized_list(queryset, serializer_class, context, chunk_size=500):
+    # Same as stream_serialized_list, for async views, ASGI server
+    # would otherwise read whole sync iterator into memory before sending it
+    async def generate():
+        yield '['
+        separator = ''
+        chunk = []
+        async for obj in queryset.aiterator(chunk_size=chunk_size):
+            chunk.append(obj)
+            if len(chunk) == chunk_size:
+                yield separator + serialize_chunk(chunk, serializer_class, context)
+                separator = ','
+                chunk = []
+        if chunk:
+            yield separator + serialize_chunk(chunk, serializer_class, context)
+        yield ']'
+
+    return StreamingHttpResponse(generate(), content_type='application/json')
@@ -0,0 +1,134 @@
+import json
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.test import AsyncClient, override_settings
+from rest_framework import status
+from rest_framework.test import APITransactionTestCase
+from rest_framework_simplejwt.tokens import AccessToken
+from recipes.models import Category, Recipe, Ingredient, Review, Rating
+from users.models import CustomUser
+
+
+# Queries of async views run in threads with their own connections,
+# so data of tests has to be committed
+class AsyncReadViewsTests(APITransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user(username='user1',
+                                                   email='user1@gmail.com',
+                                                   password='34somepassword34')
+        user_2 = CustomUser.objects.create_user(username='user2',
+                                                email='user2@gmail.com',
+                                                password='34somepassword34')
+        self.category = Category.objects.create(title='Pasta', slug='pasta')
+        self.recipe = Recipe.objects.create(author=self.user,
+                                            category=self.category,
+                                            title='Pasta 1',
+                                            instructions='Cook pasta 1')
+        for number in range(2, 9):
+            Recipe.objects.create(author=user_2,
+                                  category=self.category,
+                                  title=f'Pasta {number}',
+                                  instructions=f'Cook pasta {number}')
+        Ingredient.objects.create(recipe=self.recipe, name='Pasta', quantity=200,
+                                  units_of_measurement='g')
+        Ingredient.objects.create(recipe=self.recipe, name='Salt', quantity=1)
+        Review.objects.create(recipe=self.recipe, author=user_2, content='Nice')
+        Rating.objects.create(recipe=self.recipe, author=user_2, value=8)
+        self.async_client = AsyncClient()
+
+    def request_async(self, method, path, **kwargs):
+        # Requests are resolved with urlconf of ASGI, see api/asgi.py
+        async def send_request():
+            return await getattr(self.async_client, method)(path, **kwargs)
+        with override_settings(ROOT_URLCONF='api.asgi_urls'):
+            return async_to_sync(send_request)()
+
+    def get_async(self, path, **kwargs):
+        return self.request_async('get', path, **kwargs)
+
+    def test_async_responses_match_sync_responses(self):
+        paths = [
+            '/categories/',
+            f'/categories/{self.category.id}/',
+            f'/categories/{self.category.id}/get_recipes/?page=2',
+            '/recipes/',
+            '/recipes/?page=2&page_size=3',
+            '/recipes/?page=last',
+            '/recipes/?search=pasta&ordering=-title',
+            '/recipes/?expand=ingredients,reviews,rating_summary',
+            f'/recipes/{self.recipe.id}/',
+            f'/recipes/{self.recipe.id}/?expand=ingredients,images,reviews,rating_summary',
+            f'/recipes/{self.recipe.id}/get_ingredients/',
+            f'/recipes/{self.recipe.id}/get_reviews/',
+            f'/recipes/{self.recipe.id}/get_ratings/?pagination=cursor',
+            f'/recipes/{self.recipe.id}/get_average_rating/',
+            f'/recipes/{self.recipe.id}/get_images/',
+            '/authors/',
+            f'/authors/{self.user.id}/',
+            f'/authors/{self.user.id}/get_recipes/',
+        ]
+        for path in paths:
+            with self.subTest(path=path):
+                cache.clear()
+                sync_response = self.client.get(path)
+                cache.clear()
+                async_response = self.get_async(path)
+                self.assertEqual(sync_response.status_code, status.HTTP_200_OK)
+                self.assertEqual(async_response.status_code, status.HTTP_200_OK)
+                self.assertEqual(async_response.json(), sync_response.json())
+
+    def test_not_found(self):
+        paths = [
+            '/categories/78/',
+            '/categories/78/get_recipes/',
+            '/recipes/78/',
+            '/recipes/abc/',
+            '/recipes/78/get_reviews/',
+            '/recipes/78/get_average_rating/',
+            '/recipes/?page=10',
+            '/authors/78/get_recipes/',
+        ]
+        for path in paths:
+            with self.subTest(path=path):
+                response = self.get_async(path)
+                self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_invalid_expand(self):
+        response = self.get_async('/recipes/?expand=authors')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_stream_sub_collection(self):
+        response = self.get_async(f'/recipes/{self.recipe.id}/get_ingredients/?stream=true')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        content = async_to_sync(self.collect_streaming_content)(response)
+        self.assertEqual([ingredient['name'] for ingredient in content],
+                         ['pasta', 'salt'])
+
+    async def collect_streaming_content(self, response):
+        return json.loads(b''.join([part async for part in response.streaming_content]))
+
+    def test_not_modified(self):
+        response = self.get_async(f'/recipes/{self.recipe.id}/')
+        etag = response['ETag']
+        response = self.get_async(f'/recipes/{self.recipe.id}/',
+                                  headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_cached_response_is_invalidated(self):
+        self.get_async('/categories/')
+        Category.objects.create(title='Soup', slug='soup')
+        response = self.get_async('/categories/')
+        self.assertEqual(response.json()['count'], 2)
+
+    def test_write_requests_are_served_by_sync_views(self):
+        token = AccessToken.for_user(self.user)
+        response = self.request_async(
+            'post', '/recipes/',
+            data={'title': 'Pasta 10', 'instructions': 'Cook pasta 10',
+                  'category': f'http://testserver/categories/{self.category.id}/'},
+            content_type='application/json',
+            headers={'Authorization': 'JWT ' + str(token)}
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertTrue(Recipe.objects.filter(title='Pasta 10').exists())
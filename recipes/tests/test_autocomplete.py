@@ -0,0 +1,58 @@
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from recipes.autocomplete import prefix_range, prefix_upper_bound
+from users.models import CustomUser
+
+
+@override_settings(RESPONSE_CACHE={'TIMEOUT': 0})
+class AuthorAutocompleteTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls) -> None:
+        for username in ['Anna', 'annette', 'ANNIKA', 'Bob', 'Straße']:
+            CustomUser.objects.create_user(username=username,
+                                           email=f'{username}@gmail.com',
+                                           password='34somepassword34')
+        CustomUser.objects.create_superuser(username='annadmin',
+                                            email='annadmin@gmail.com',
+                                            password='34somepassword34')
+
+    def get_usernames(self, query):
+        response = self.client.get(reverse('author-autocomplete') + query)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [author['username'] for author in response.data]
+
+    def test_username_is_folded_on_save(self):
+        user = CustomUser.objects.get(username='ANNIKA')
+        self.assertEqual(user.username_folded, 'annika')
+        user.username = 'Annabel'
+        user.save(update_fields=['username'])
+        user.refresh_from_db()
+        self.assertEqual(user.username_folded, 'annabel')
+
+    def test_autocomplete(self):
+        # Superusers are not authors
+        self.assertEqual(self.get_usernames('?q=ann'), ['Anna', 'annette', 'ANNIKA'])
+        self.assertEqual(self.get_usernames('?q=ANNe'), ['annette'])
+        self.assertEqual(self.get_usernames('?q=strass'), ['Straße'])
+        self.assertEqual(self.get_usernames('?q=annz'), [])
+
+    def test_autocomplete_limit(self):
+        self.assertEqual(self.get_usernames('?q=a&limit=2'), ['Anna', 'annette'])
+        response = self.client.get(reverse('author-autocomplete') + '?q=a&limit=51')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_empty_query(self):
+        self.assertEqual(self.get_usernames(''), [])
+        self.assertEqual(self.get_usernames('?q=%20'), [])
+
+    def test_search(self):
+        response = self.client.get(reverse('author-list') + '?search=bo')
+        self.assertEqual([author['username'] for author in response.data['results']], ['Bob'])
+
+    def test_prefix_range(self):
+        self.assertEqual(prefix_range('name', 'ab'), {'name__gte': 'ab', 'name__lt': 'ac'})
+        self.assertEqual(prefix_upper_bound('a\U0010ffff'), 'b')
+        self.assertIsNone(prefix_upper_bound('\U0010ffff'))
+        self.assertEqual(prefix_upper_bound('\ud7ff'), '\ue000')
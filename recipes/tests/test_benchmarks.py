@@ -0,0 +1,62 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+from recipes.models import Recipe, Review
+
+
+class BenchmarkEndpointsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls) -> None:
+        call_command('seed_data', users=10, categories=2, recipes=20, ingredients=60,
+                     reviews=40, ratings=60, random_seed=1, stdout=StringIO())
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def write_results(self, name, endpoints):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w') as file:
+            json.dump({'endpoints': endpoints}, file)
+        return path
+
+    def test_results_are_written(self):
+        path = os.path.join(self.directory, 'results.json')
+        call_command('benchmark_endpoints', repeat=2, output=path, stdout=StringIO())
+        with open(path) as file:
+            endpoints = json.load(file)['endpoints']
+        self.assertEqual(endpoints['recipe-list']['route'], 'recipe-list')
+        self.assertEqual(endpoints['recipe-list']['requests'], 2)
+        self.assertGreater(endpoints['recipe-list']['queries'], 0)
+        self.assertGreater(endpoints['recipe-list']['bytes'], 0)
+        self.assertLessEqual(endpoints['recipe-list']['p50_ms'], endpoints['recipe-list']['p99_ms'])
+        self.assertIn('recipe-review-create', endpoints)
+        # Writes are rolled back
+        self.assertEqual(Recipe.objects.count(), 20)
+        self.assertEqual(Review.objects.count(), 40)
+
+    def test_compare(self):
+        result = {'p95_ms': 10.0, 'queries': 3, 'bytes': 1000}
+        baseline = self.write_results('baseline.json', {
+            'recipe-list': result, 'recipe-detail': result, 'author-list': result,
+        })
+        results = self.write_results('results.json', {
+            'recipe-list': {**result, 'p95_ms': 10.4},
+            'recipe-detail': {**result, 'p95_ms': 15.0},
+            'author-list': {**result, 'queries': 4},
+        })
+        with self.assertRaisesMessage(CommandError, 'Regressions: author-list, recipe-detail'):
+            call_command('benchmark_endpoints', compare=[baseline, results], stdout=StringIO())
+
+    def test_compare_without_regressions(self):
+        result = {'p95_ms': 10.0, 'queries': 3, 'bytes': 1000}
+        baseline = self.write_results('baseline.json', {'recipe-list': result})
+        results = self.write_results('results.json', {'recipe-list': {**result, 'p95_ms': 9.0}})
+        stdout = StringIO()
+        call_command('benchmark_endpoints', compare=[baseline, results], stdout=stdout)
+        self.assertIn('No regressions.', stdout.getvalue())
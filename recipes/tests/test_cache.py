@@ -0,0 +1,170 @@
+from django.core.cache import cache
+from django.test import override_settings
+from django.utils import timezone
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.test import APITestCase
+from recipes.cache import get_or_compute, invalidate_tags
+from recipes.models import Category, Recipe, Rating
+from users.models import CustomUser
+
+
+class ResponseCacheTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls) -> None:
+        user_1 = CustomUser.objects.create_user(username='user1',
+                                                email='user1@gmail.com',
+                                                password='34somepassword34')
+        CustomUser.objects.create_user(username='user2',
+                                       email='user2@gmail.com',
+                                       password='34somepassword34')
+        category = Category.objects.create(title='Pasta', slug='pasta')
+        Recipe.objects.create(author=user_1,
+                              category=category,
+                              title='Pasta 1',
+                              instructions='Cook pasta 1')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_get_recipe_detail_from_cache(self):
+        recipe = Recipe.objects.filter(title='Pasta 1').first()
+        url = reverse('recipe-detail', kwargs={'pk': recipe.id})
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # Only validators of conditional GET are queried
+        with self.assertNumQueries(1):
+            cached_response = self.client.get(url)
+        self.assertEqual(cached_response.status_code, status.HTTP_200_OK)
+        self.assertEqual(cached_response.data, response.data)
+
+    def test_recipe_detail_is_invalidated_by_new_rating(self):
+        recipe = Recipe.objects.filter(title='Pasta 1').first()
+        user = CustomUser.objects.filter(username='user2').first()
+        url = reverse('recipe-detail', kwargs={'pk': recipe.id})
+        response = self.client.get(url)
+        self.assertEqual(response.data['rating_count'], 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            Rating.objects.create(recipe=recipe, author=user, value=8)
+        response = self.client.get(url)
+        self.assertEqual(response.data['rating_count'], 1)
+
+    def test_tags_are_invalidated_after_commit(self):
+        recipe = Recipe.objects.filter(title='Pasta 1').first()
+        user = CustomUser.objects.filter(username='user2').first()
+        url = reverse('recipe-detail', kwargs={'pk': recipe.id})
+        self.client.get(url)
+        with self.captureOnCommitCallbacks() as callbacks:
+            Rating.objects.create(recipe=recipe, author=user, value=8)
+            # Response is not computed again before transaction is committed
+            self.assertEqual(self.client.get(url).data['rating_count'], 0)
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self.client.get(url).data['rating_count'], 1)
+
+    def test_rating_invalidates_only_lists_with_its_recipe(self):
+        recipe = Recipe.objects.filter(title='Pasta 1').first()
+        other_recipe = Recipe.objects.create(author=recipe.author, category=recipe.category,
+                                             title='Pasta 2', instructions='Cook pasta 2')
+        user = CustomUser.objects.filter(username='user2').first()
+        url = reverse('recipe-list') + '?page_size=1'
+        self.client.get(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            Rating.objects.create(recipe=other_recipe, author=user, value=8)
+        # Only validators of conditional GET are queried
+        with self.assertNumQueries(1):
+            self.client.get(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            Rating.objects.create(recipe=recipe, author=user, value=6)
+        response = self.client.get(url)
+        self.assertEqual(response.data['results'][0]['rating_count'], 1)
+
+    def test_list_ordered_by_ratings_is_invalidated_by_any_rating(self):
+        recipe = Recipe.objects.filter(title='Pasta 1').first()
+        other_recipe = Recipe.objects.create(author=recipe.author, category=recipe.category,
+                                             title='Pasta 2', instructions='Cook pasta 2')
+        user = CustomUser.objects.filter(username='user2').first()
+        url = reverse('recipe-list') + '?page_size=1&ordering=-rating_count'
+        self.assertEqual(self.client.get(url).data['results'][0]['title'], 'Pasta 1')
+        with self.captureOnCommitCallbacks(execute=True):
+            Rating.objects.create(recipe=other_recipe, author=user, value=8)
+        self.assertEqual(self.client.get(url).data['results'][0]['title'], 'Pasta 2')
+
+    @override_settings(ALLOWED_HOSTS=['testserver', 'example.com'])
+    def test_responses_are_cached_for_every_host(self):
+        recipe = Recipe.objects.filter(title='Pasta 1').first()
+        url = reverse('recipe-detail', kwargs={'pk': recipe.id})
+        self.client.get(url)
+        response = self.client.get(url, HTTP_HOST='example.com', secure=True)
+        self.assertTrue(response.data['url'].startswith('https://example.com/'))
+
+    def test_category_list_is_invalidated_by_new_category(self):
+        url = reverse('category-list')
+        response = self.client.get(url)
+        self.assertEqual(response.data['count'], 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            Category.objects.create(title='Soups', slug='soups')
+        response = self.client.get(url)
+        self.assertEqual(response.data['count'], 2)
+
+    def test_other_category_is_not_invalidated(self):
+        category = Category.objects.filter(title='Pasta').first()
+        url = reverse('category-detail', kwargs={'pk': category.id})
+        self.client.get(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            Category.objects.create(title='Soups', slug='soups')
+        with self.assertNumQueries(0):
+            self.client.get(url)
+
+    def test_recipe_detail_is_not_invalidated_by_other_users(self):
+        recipe = Recipe.objects.filter(title='Pasta 1').first()
+        url = reverse('recipe-detail', kwargs={'pk': recipe.id})
+        self.client.get(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            CustomUser.objects.create_user(username='user3',
+                                           email='user3@gmail.com',
+                                           password='34somepassword34')
+            user = CustomUser.objects.filter(username='user2').first()
+            user.username = 'user22'
+            user.save()
+            # Login of author does not change what recipe shows
+            author = CustomUser.objects.filter(username='user1').first()
+            author.last_login = timezone.now()
+            author.save(update_fields=['last_login'])
+        # Only validators of conditional GET are queried
+        with self.assertNumQueries(1):
+            self.client.get(url)
+
+    def test_recipe_detail_is_invalidated_by_new_username_of_author(self):
+        recipe = Recipe.objects.filter(title='Pasta 1').first()
+        url = reverse('recipe-detail', kwargs={'pk': recipe.id})
+        self.client.get(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            author = CustomUser.objects.filter(username='user1').first()
+            author.username = 'user11'
+            author.save()
+        self.assertEqual(self.client.get(url).data['author_name'], 'user11')
+
+    @override_settings(RESPONSE_CACHE={'MAX_WAIT': 0.2})
+    def test_request_waits_for_response_being_computed(self):
+        cache.add('response:test:lock', 1)
+        # Lock is held by other request, which never puts response into cache,
+        # so after waiting response is computed anyway
+        response = get_or_compute('response:test', lambda: Response({'value': 1}))
+        self.assertEqual(response.data, {'value': 1})
+        cache.delete('response:test:lock')
+        get_or_compute('response:test', lambda: Response({'value': 2}))
+        response = get_or_compute('response:test', lambda: Response({'value': 3}))
+        self.assertEqual(response.data, {'value': 2})
+
+    def test_previous_response_is_served_while_response_is_computed(self):
+        get_or_compute('response:test', lambda: Response({'value': 1}), tags=['test'])
+        with self.captureOnCommitCallbacks(execute=True):
+            invalidate_tags(['test'])
+        cache.add('response:test:lock', 1)
+        response = get_or_compute('response:test', lambda: Response({'value': 2}), tags=['test'])
+        self.assertEqual(response.data, {'value': 1})
+        cache.delete('response:test:lock')
+        response = get_or_compute('response:test', lambda: Response({'value': 3}), tags=['test'])
+        self.assertEqual(response.data, {'value': 3})
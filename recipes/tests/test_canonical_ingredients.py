@@ -0,0 +1,105 @@
+from io import StringIO
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
+from recipes.models import Category, Recipe, Ingredient, CanonicalIngredient, IngredientAlias
+from users.models import CustomUser
+
+
+@override_settings(RESPONSE_CACHE={'TIMEOUT': 0})
+class CanonicalIngredientTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.user = CustomUser.objects.create_user(username='user1',
+                                                  email='user1@gmail.com',
+                                                  password='34somepassword34')
+        category = Category.objects.create(title='Baking', slug='baking')
+        cls.recipe = Recipe.objects.create(author=cls.user, category=category,
+                                           title='Pancakes', instructions='Cook pancakes')
+        cls.other_recipe = Recipe.objects.create(author=cls.user, category=category,
+                                                 title='Bread', instructions='Bake bread')
+        Ingredient.objects.create(recipe=cls.other_recipe, name='Flour', quantity=500)
+
+    def setUp(self):
+        cache.clear()
+        self.client.credentials(HTTP_AUTHORIZATION='JWT ' + str(AccessToken.for_user(self.user)))
+
+    def ingredients_url(self, recipe):
+        return reverse('recipe-ingredient-list', kwargs={'recipe_pk': recipe.id})
+
+    def test_same_names_share_canonical_ingredient(self):
+        response = self.client.post(self.ingredients_url(self.recipe),
+                                    data={'name': 'FLOUR', 'quantity': 200})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        flour = CanonicalIngredient.objects.get(slug='flour')
+        self.assertEqual(flour.name, 'flour')
+        self.assertEqual(Ingredient.objects.filter(canonical=flour).count(), 2)
+        self.assertEqual(CanonicalIngredient.objects.count(), 1)
+
+    def test_rename_resolves_canonical_ingredient(self):
+        ingredient = Ingredient.objects.get(recipe=self.other_recipe)
+        response = self.client.put(
+            reverse('recipe-ingredient-detail',
+                    kwargs={'recipe_pk': self.other_recipe.id, 'pk': ingredient.id}),
+            data={'name': 'Rye flour', 'quantity': 500}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        ingredient.refresh_from_db()
+        self.assertEqual(ingredient.canonical.slug, 'rye-flour')
+        # Renamed outside of views
+        ingredient.name = 'Wheat flour'
+        ingredient.save()
+        ingredient.refresh_from_db()
+        self.assertEqual(ingredient.canonical.slug, 'wheat-flour')
+
+    def test_bulk_create_resolves_canonical_ingredients(self):
+        response = self.client.post(
+            reverse('recipe-ingredient-bulk', kwargs={'recipe_pk': self.recipe.id}),
+            data=[{'name': 'Flour', 'quantity': 200}, {'name': 'Milk', 'quantity': 300}],
+            format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            sorted(Ingredient.objects.filter(recipe=self.recipe).values_list('canonical__slug', flat=True)),
+            ['flour', 'milk']
+        )
+        self.assertEqual(CanonicalIngredient.objects.count(), 2)
+
+    def test_merge(self):
+        Ingredient.objects.create(recipe=self.recipe, name='All-purpose flour', quantity=200)
+        out = StringIO()
+        call_command('merge_ingredients', 'flour', 'all-purpose-flour', stdout=out)
+        self.assertIn("Merged 1 ingredients into 'flour'.", out.getvalue())
+        flour = CanonicalIngredient.objects.get(slug='flour')
+        self.assertFalse(CanonicalIngredient.objects.filter(slug='all-purpose-flour').exists())
+        self.assertEqual(IngredientAlias.objects.get(slug='all-purpose-flour').canonical, flour)
+        self.assertEqual(Ingredient.objects.filter(canonical=flour).count(), 2)
+
+        # Names of aliases are resolved to ingredient they were merged into
+        response = self.client.post(
+            reverse('recipe-ingredient-bulk', kwargs={'recipe_pk': self.other_recipe.id}),
+            data=[{'name': 'All purpose flour', 'quantity': 100}], format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Ingredient.objects.filter(canonical=flour).count(), 3)
+        response = self.client.get(reverse('recipe-cook-with') + '?ingredients=all-purpose-flour')
+        self.assertEqual([recipe['title'] for recipe in response.data], ['Pancakes', 'Bread'])
+        self.assertEqual(response.data[1]['matched_ingredients'], ['all-purpose-flour'])
+
+    def test_merge_errors(self):
+        for args in [('flour', 'flour'), ('flour', 'sugar'), ('sugar', 'flour')]:
+            with self.subTest(args=args):
+                with self.assertRaises(CommandError):
+                    call_command('merge_ingredients', *args, stdout=StringIO())
+
+    def test_unknown_ingredients_are_not_added_by_search(self):
+        response = self.client.get(reverse('recipe-cook-with') + '?ingredients=flour,saffron')
+        self.assertEqual([recipe['title'] for recipe in response.data], ['Bread'])
+        response = self.client.get(reverse('recipe-cook-with') + '?ingredients=flour,saffron&match=all')
+        self.assertEqual(response.data, [])
+        self.assertFalse(CanonicalIngredient.objects.filter(slug='saffron').exists())
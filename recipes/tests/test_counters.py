@@ -0,0 +1,126 @@
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
+from recipes.models import Category, Recipe, Review, Rating
+from users.models import CustomUser
+
+
+class CountersTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.author = CustomUser.objects.create_user(username='user1',
+                                                    email='user1@gmail.com',
+                                                    password='34somepassword34')
+        cls.reviewer = CustomUser.objects.create_user(username='user2',
+                                                      email='user2@gmail.com',
+                                                      password='34somepassword34')
+        cls.soups = Category.objects.create(title='Soups', slug='soups')
+        cls.pasta = Category.objects.create(title='Pasta', slug='pasta')
+        cls.recipe = Recipe.objects.create(author=cls.author, category=cls.soups,
+                                           title='Soup 1', instructions='Cook soup 1')
+        Recipe.objects.create(author=cls.author, category=cls.soups,
+                              title='Soup 2', instructions='Cook soup 2')
+        Review.objects.create(recipe=cls.recipe, author=cls.reviewer, content='Nice')
+        Rating.objects.create(recipe=cls.recipe, author=cls.reviewer, value=8)
+
+    def assertCounters(self, user, recipe_count, review_count, rating_count):
+        user.refresh_from_db()
+        self.assertEqual((user.recipe_count, user.review_count, user.rating_count),
+                         (recipe_count, review_count, rating_count))
+
+    def assertRecipeCount(self, category, recipe_count):
+        category.refresh_from_db()
+        self.assertEqual(category.recipe_count, recipe_count)
+
+    def authenticate(self, user):
+        self.client.credentials(HTTP_AUTHORIZATION='JWT ' + str(AccessToken.for_user(user)))
+
+    def test_counters_of_created_objects(self):
+        self.assertRecipeCount(self.soups, 2)
+        self.assertRecipeCount(self.pasta, 0)
+        self.assertCounters(self.author, 2, 0, 0)
+        self.assertCounters(self.reviewer, 0, 1, 1)
+
+    def test_counters_are_serialized(self):
+        response = self.client.get(reverse('category-detail', kwargs={'pk': self.soups.id}))
+        self.assertEqual(response.data['recipe_count'], 2)
+        response = self.client.get(reverse('author-detail', kwargs={'pk': self.reviewer.id}))
+        self.assertEqual(response.data['review_count'], 1)
+        self.assertEqual(response.data['rating_count'], 1)
+
+    def test_category_of_recipe_is_changed(self):
+        self.authenticate(self.author)
+        response = self.client.put(reverse('recipe-detail', kwargs={'pk': self.recipe.id}),
+                                   data={'title': 'Soup 1', 'instructions': 'Cook soup 1',
+                                         'category': 'http://testserver' +
+                                         reverse('category-detail', kwargs={'pk': self.pasta.id})},
+                                   format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertRecipeCount(self.soups, 1)
+        self.assertRecipeCount(self.pasta, 1)
+        self.assertCounters(self.author, 2, 0, 0)
+
+    def test_recipe_is_created_and_deleted(self):
+        self.authenticate(self.reviewer)
+        response = self.client.post(reverse('recipe-list'),
+                                    data={'title': 'Pasta 1', 'instructions': 'Cook pasta 1',
+                                          'category': 'http://testserver' +
+                                          reverse('category-detail', kwargs={'pk': self.pasta.id})},
+                                    format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertRecipeCount(self.pasta, 1)
+        self.assertCounters(self.reviewer, 1, 1, 1)
+        response = self.client.delete(reverse('recipe-detail', kwargs={'pk': response.data['id']}))
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertRecipeCount(self.pasta, 0)
+        self.assertCounters(self.reviewer, 0, 1, 1)
+
+    def test_reviews_and_ratings_deleted_by_cascade(self):
+        self.authenticate(self.author)
+        response = self.client.delete(reverse('recipe-detail', kwargs={'pk': self.recipe.id}))
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertRecipeCount(self.soups, 1)
+        self.assertCounters(self.author, 1, 0, 0)
+        self.assertCounters(self.reviewer, 0, 0, 0)
+
+    def test_rating_author_is_deleted(self):
+        Rating.objects.create(recipe=self.recipe, author=self.author, value=4)
+        self.authenticate(self.reviewer)
+        response = self.client.delete(reverse('customuser-me'),
+                                      data={'current_password': '34somepassword34'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.recipe.refresh_from_db()
+        self.assertEqual((self.recipe.rating_count, self.recipe.rating_sum, self.recipe.rating_average),
+                         (1, 4, 4.0))
+        self.assertEqual(self.recipe.rating_histogram, [0, 0, 0, 0, 1, 0, 0, 0, 0, 0, 0])
+
+    def test_ratings_deleted_with_queryset(self):
+        Rating.objects.filter(recipe=self.recipe).delete()
+        self.recipe.refresh_from_db()
+        self.assertEqual((self.recipe.rating_count, self.recipe.rating_sum), (0, 0))
+        self.assertIsNone(self.recipe.rating_average)
+        self.assertEqual(sum(self.recipe.rating_histogram), 0)
+        self.assertCounters(self.reviewer, 0, 1, 0)
+
+    def test_review_and_rating_are_posted_and_deleted(self):
+        self.authenticate(self.author)
+        url = reverse('recipe-review-list', kwargs={'recipe_pk': self.recipe.id})
+        response = self.client.post(url, data={'content': 'Mine'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        url = reverse('recipe-rating-list', kwargs={'recipe_pk': self.recipe.id})
+        response = self.client.post(url, data={'value': 9}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertCounters(self.author, 2, 1, 1)
+        url = reverse('recipe-rating-detail', kwargs={'recipe_pk': self.recipe.id,
+                                                      'pk': response.data['id']})
+        self.client.delete(url)
+        self.assertCounters(self.author, 2, 1, 0)
+
+    def test_ordering_by_counters(self):
+        response = self.client.get(reverse('category-list') + '?ordering=-recipe_count')
+        self.assertEqual([category['title'] for category in response.data['results']],
+                         ['Soups', 'Pasta'])
+        response = self.client.get(reverse('author-list') + '?ordering=-review_count')
+        self.assertEqual([author['username'] for author in response.data['results']],
+                         ['user2', 'user1'])
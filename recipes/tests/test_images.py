@@ -0,0 +1,118 @@
+import shutil
+import tempfile
+from io import BytesIO
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import override_settings
+from django.urls import reverse
+from PIL import Image
+from rest_framework import status
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
+from recipes.images import render_variants, process_recipe_image
+from recipes.models import Category, Recipe, RecipeImage
+from users.models import CustomUser
+
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def make_image_file(size=(1600, 800), image_format='jpeg', exif=None):
+    image = Image.new('RGB', size, color='red')
+    image_file = BytesIO()
+    if exif is not None:
+        image.save(image_file, image_format, exif=exif)
+    else:
+        image.save(image_file, image_format)
+    image_file.seek(0)
+    return image_file
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, IMAGE_VARIANTS={'ASYNC': False})
+class RecipeImageVariantsTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls) -> None:
+        user = CustomUser.objects.create_user(username='user1',
+                                              email='user1@gmail.com',
+                                              password='34somepassword34')
+        category = Category.objects.create(title='Pasta', slug='pasta')
+        Recipe.objects.create(author=user,
+                              category=category,
+                              title='Pasta 1',
+                              instructions='Cook pasta')
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def test_variants_are_resized_without_metadata(self):
+        exif = Image.Exif()
+        # Orientation: rotated 90 degrees
+        exif[0x0112] = 6
+        exif[0x010e] = 'Secret description'
+        width, height, variants = render_variants(
+            make_image_file(exif=exif.tobytes()))
+        # Orientation is applied to dimensions
+        self.assertEqual((width, height), (800, 1600))
+        self.assertEqual([(name, extension) for name, extension, _ in variants],
+                         [('large', 'webp'), ('large', 'jpeg'),
+                          ('medium', 'webp'), ('medium', 'jpeg'),
+                          ('thumbnail', 'webp'), ('thumbnail', 'jpeg')])
+        sizes = {'large': (600, 1200), 'medium': (300, 600), 'thumbnail': (75, 150)}
+        for name, extension, content in variants:
+            with Image.open(BytesIO(content)) as variant:
+                self.assertEqual(variant.size, sizes[name])
+                self.assertEqual(variant.format, extension.upper())
+                self.assertFalse(variant.getexif())
+                self.assertNotIn('icc_profile', variant.info)
+
+    def test_small_image_is_not_upscaled(self):
+        width, height, variants = render_variants(make_image_file(size=(100, 50)))
+        self.assertEqual((width, height), (100, 50))
+        for _, _, content in variants:
+            with Image.open(BytesIO(content)) as variant:
+                self.assertEqual(variant.size, (100, 50))
+
+    def test_posted_image_is_processed_after_commit(self):
+        recipe = Recipe.objects.get(title='Pasta 1')
+        user = CustomUser.objects.get(username='user1')
+        token = AccessToken.for_user(user)
+        self.client.credentials(HTTP_AUTHORIZATION='JWT ' + str(token))
+        uploaded_file = SimpleUploadedFile('variant_image.jpg',
+                                           make_image_file().read(),
+                                           content_type='image/jpeg')
+        url = reverse('recipe-image-list', kwargs={'recipe_pk': recipe.id})
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(url, data={'image': uploaded_file},
+                                        format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        # Response is returned before image is processed
+        self.assertEqual(response.data['variants'], {})
+
+        image = RecipeImage.objects.get(id=response.data['id'])
+        self.assertEqual((image.width, image.height), (1600, 800))
+        self.assertEqual(set(image.variants),
+                         {'thumbnail', 'medium', 'large'})
+        self.assertTrue(image.image.storage.exists(image.variants['thumbnail']['webp']))
+
+        response = self.client.get(response.data['url'])
+        self.assertEqual(response.data['width'], 1600)
+        self.assertEqual(response.data['variants']['thumbnail']['jpeg'],
+                         'http://testserver/media/' + image.variants['thumbnail']['jpeg'])
+        self.assertEqual(image.get_variant_url('thumbnail'),
+                         '/media/' + image.variants['thumbnail']['webp'])
+
+    def test_variants_are_deleted_with_image(self):
+        recipe = Recipe.objects.get(title='Pasta 1')
+        image = RecipeImage.objects.create(
+            recipe=recipe,
+            image=SimpleUploadedFile('deleted_image.jpg', make_image_file().read())
+        )
+        process_recipe_image(image.id)
+        image.refresh_from_db()
+        path = image.variants['medium']['jpeg']
+        storage = image.image.storage
+        self.assertTrue(storage.exists(path))
+        with self.captureOnCommitCallbacks(execute=True):
+            image.delete()
+        self.assertFalse(storage.exists(path))
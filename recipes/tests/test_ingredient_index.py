@@ -0,0 +1,170 @@
+from django.core.cache import cache
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
+from recipes.ingredient_index import IngredientIndex, get_version, ingredient_index
+from recipes.models import Category, Recipe, Ingredient
+from users.models import CustomUser
+
+
+@override_settings(RESPONSE_CACHE={'TIMEOUT': 0})
+class CookWithTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.user = CustomUser.objects.create_user(username='user1',
+                                                  email='user1@gmail.com',
+                                                  password='34somepassword34')
+        category = Category.objects.create(title='Baking', slug='baking')
+        recipes = {
+            'Pancakes': ['Eggs', 'Flour', 'Milk'],
+            'Omelette': ['Eggs', 'Milk', 'Cheese', 'Ham'],
+            'Bread': ['Flour', 'Water', 'Yeast', 'Salt'],
+            'Boiled eggs': ['Eggs'],
+        }
+        for title, names in recipes.items():
+            recipe = Recipe.objects.create(author=cls.user, category=category,
+                                           title=title, instructions=f'Cook {title}')
+            for name in names:
+                Ingredient.objects.create(recipe=recipe, name=name, quantity=1)
+
+    def setUp(self):
+        # Index of process is loaded again for data of every test
+        cache.clear()
+        self.client.credentials(HTTP_AUTHORIZATION='JWT ' + str(AccessToken.for_user(self.user)))
+
+    def cook_with(self, query):
+        response = self.client.get(reverse('recipe-cook-with') + query)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [(recipe['title'], recipe['coverage'], recipe['matched_ingredients'])
+                for recipe in response.data]
+
+    def test_ranked_by_coverage(self):
+        self.assertEqual(self.cook_with('?ingredients=eggs,flour,milk'), [
+            ('Pancakes', 1.0, ['eggs', 'flour', 'milk']),
+            ('Boiled eggs', 1.0, ['eggs']),
+            ('Omelette', 0.5, ['eggs', 'milk']),
+            ('Bread', 0.25, ['flour']),
+        ])
+
+    def test_match_all(self):
+        titles = [title for title, _, _ in self.cook_with('?ingredients=Eggs,%20milk&match=all')]
+        self.assertEqual(titles, ['Pancakes', 'Omelette'])
+        self.assertEqual(self.cook_with('?ingredients=eggs,yeast&match=all'), [])
+
+    def test_limit(self):
+        titles = [title for title, _, _ in self.cook_with('?ingredients=eggs&limit=2')]
+        self.assertEqual(titles, ['Boiled eggs', 'Pancakes'])
+
+    def test_invalid_query(self):
+        for query in ['', '?ingredients=,', '?ingredients=eggs&match=some',
+                      '?ingredients=' + ','.join(f'ingredient-{number}' for number in range(21))]:
+            with self.subTest(query=query):
+                response = self.client.get(reverse('recipe-cook-with') + query)
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_index_is_updated_by_writes(self):
+        self.cook_with('?ingredients=eggs')
+        version = ingredient_index.version
+        omelette = Recipe.objects.get(title='Omelette')
+        bread = Recipe.objects.get(title='Bread')
+        ham = Ingredient.objects.get(recipe=omelette, name='ham')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('recipe-ingredient-bulk', kwargs={'recipe_pk': bread.id}),
+                             data=[{'name': 'Eggs', 'quantity': 1}], format='json')
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.put(
+                reverse('recipe-ingredient-detail', kwargs={'recipe_pk': omelette.id, 'pk': ham.id}),
+                data={'name': 'Flour', 'quantity': 1}
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        with self.captureOnCommitCallbacks(execute=True):
+            Recipe.objects.get(title='Boiled eggs').delete()
+        # Writes were applied to loaded index, it was not loaded again
+        self.assertEqual(ingredient_index.version, version + 3)
+        self.assertEqual(self.cook_with('?ingredients=eggs,flour&match=all'), [
+            ('Pancakes', 2 / 3, ['eggs', 'flour']),
+            ('Omelette', 0.5, ['eggs', 'flour']),
+            ('Bread', 0.4, ['eggs', 'flour']),
+        ])
+        loaded = (ingredient_index.recipe_ids, ingredient_index.ingredient_counts)
+        ingredient_index.load()
+        self.assertEqual((ingredient_index.recipe_ids, ingredient_index.ingredient_counts), loaded)
+
+    def test_changes_of_other_process_are_applied(self):
+        self.cook_with('?ingredients=eggs')
+        # Index of another process
+        other_index = IngredientIndex()
+        other_index.load()
+        bread = Recipe.objects.get(title='Bread')
+        with self.captureOnCommitCallbacks(execute=True):
+            Ingredient.objects.create(recipe=bread, name='Eggs', quantity=1)
+        with self.captureOnCommitCallbacks(execute=True):
+            Recipe.objects.get(title='Boiled eggs').delete()
+        # Changes are read from cache, ingredients are not loaded again
+        with self.assertNumQueries(0):
+            other_index.refresh()
+        self.assertEqual(other_index.version, ingredient_index.version)
+        self.assertEqual((other_index.recipe_ids, other_index.ingredient_counts),
+                         (ingredient_index.recipe_ids, ingredient_index.ingredient_counts))
+
+    def test_index_is_loaded_when_changes_are_missing(self):
+        self.cook_with('?ingredients=eggs')
+        other_index = IngredientIndex()
+        other_index.load()
+        bread = Recipe.objects.get(title='Bread')
+        with self.captureOnCommitCallbacks(execute=True):
+            Ingredient.objects.create(recipe=bread, name='Eggs', quantity=1)
+        ingredient_index.invalidate()
+        with self.assertNumQueries(1):
+            other_index.refresh()
+        self.assertEqual(other_index.version, get_version())
+        titles = [title for title, _, _ in self.cook_with('?ingredients=eggs')]
+        self.assertIn('Bread', titles)
+
+    def test_rows_are_read_again_when_version_changes_during_load(self):
+        bread = Recipe.objects.get(title='Bread')
+        other_index = IngredientIndex()
+        read_rows = other_index.read_rows
+        reads = []
+
+        def read_rows_with_concurrent_write():
+            rows = read_rows()
+            reads.append(rows)
+            if len(reads) == 1:
+                # Write of another process is committed after rows were read
+                with self.captureOnCommitCallbacks(execute=True):
+                    Ingredient.objects.create(recipe=bread, name='Eggs', quantity=1)
+            return rows
+        other_index.read_rows = read_rows_with_concurrent_write
+        other_index.load()
+        self.assertEqual(len(reads), 2)
+        self.assertEqual(other_index.version, get_version())
+        # Ingredient is counted once, not applied again as a change
+        self.assertEqual(other_index.ingredient_counts[bread.id], 5)
+        other_index.refresh()
+        self.assertEqual(other_index.ingredient_counts[bread.id], 5)
+
+    def test_rolled_back_writes_are_not_indexed(self):
+        self.cook_with('?ingredients=eggs')
+        recipe = Recipe.objects.get(title='Bread')
+        version = ingredient_index.version
+        with self.captureOnCommitCallbacks(execute=True):
+            Ingredient.objects.create(recipe=recipe, name='Eggs', quantity=1)
+        self.assertEqual(ingredient_index.version, version + 1)
+        version = ingredient_index.version
+        Ingredient.objects.create(recipe=recipe, name='Milk', quantity=2)
+        self.assertEqual(ingredient_index.version, version)
+        titles = [title for title, _, _ in self.cook_with('?ingredients=milk')]
+        self.assertEqual(titles, ['Pancakes', 'Omelette'])
+
+    def test_repeated_slugs(self):
+        recipe = Recipe.objects.get(title='Boiled eggs')
+        self.cook_with('?ingredients=eggs')
+        with self.captureOnCommitCallbacks(execute=True):
+            repeat = Ingredient.objects.create(recipe=recipe, name='eggs!', quantity=1)
+        with self.captureOnCommitCallbacks(execute=True):
+            repeat.delete()
+        self.assertEqual(self.cook_with('?ingredients=eggs&limit=1'),
+                         [('Boiled eggs', 1.0, ['eggs'])])
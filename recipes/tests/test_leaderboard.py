@@ -0,0 +1,100 @@
+from io import StringIO
+from django.core.management import call_command
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
+from recipes.models import Category, Recipe, Rating
+from users.models import CustomUser
+
+
+@override_settings(RESPONSE_CACHE={'TIMEOUT': 0})
+class LeaderboardTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls) -> None:
+        users = [CustomUser.objects.create_user(username=f'user{number}',
+                                                email=f'user{number}@gmail.com',
+                                                password='34somepassword34')
+                 for number in range(1, 31)]
+        soups = Category.objects.create(title='Soups', slug='soups')
+        pasta = Category.objects.create(title='Pasta', slug='pasta')
+        # One 10/10 rating against many 9/10 ratings
+        one_vote = Recipe.objects.create(author=users[0], category=soups,
+                                         title='Soup 1', instructions='Cook soup 1')
+        Rating.objects.create(recipe=one_vote, author=users[1], value=10)
+        many_votes = Recipe.objects.create(author=users[0], category=soups,
+                                           title='Soup 2', instructions='Cook soup 2')
+        for user in users[1:]:
+            Rating.objects.create(recipe=many_votes, author=user, value=9)
+        pasta_recipe = Recipe.objects.create(author=users[0], category=pasta,
+                                             title='Pasta 1', instructions='Cook pasta 1')
+        for user in users[1:6]:
+            Rating.objects.create(recipe=pasta_recipe, author=user, value=8)
+        Recipe.objects.create(author=users[0], category=soups,
+                              title='Soup 3', instructions='Cook soup 3')
+
+    def get_titles(self, response):
+        return [recipe['title'] for recipe in response.data]
+
+    def test_score(self):
+        # Prior is 10 ratings of 5.0
+        recipe = Recipe.objects.get(title='Soup 2')
+        self.assertAlmostEqual(recipe.rating_score, (29 * 9 + 10 * 5.0) / (29 + 10))
+        recipe = Recipe.objects.get(title='Soup 1')
+        self.assertAlmostEqual(recipe.rating_score, (10 + 10 * 5.0) / (1 + 10))
+        self.assertIsNone(Recipe.objects.get(title='Soup 3').rating_score)
+
+    def test_global_leaderboard(self):
+        response = self.client.get(reverse('recipe-leaderboard'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # Recipes without ratings are not ranked
+        self.assertEqual(self.get_titles(response), ['Soup 2', 'Pasta 1', 'Soup 1'])
+        self.assertEqual([recipe['rank'] for recipe in response.data], [1, 2, 3])
+        self.assertEqual(response.data[0]['rating_count'], 29)
+
+    def test_category_leaderboard(self):
+        category = Category.objects.get(slug='soups')
+        response = self.client.get(reverse('category-leaderboard', kwargs={'pk': category.id}))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.get_titles(response), ['Soup 2', 'Soup 1'])
+
+    def test_category_leaderboard_of_nonexistent_category(self):
+        response = self.client.get(reverse('category-leaderboard', kwargs={'pk': 78}))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_limit(self):
+        response = self.client.get(reverse('recipe-leaderboard') + '?limit=1')
+        self.assertEqual(self.get_titles(response), ['Soup 2'])
+        for limit in ['0', '101', 'abc']:
+            with self.subTest(limit=limit):
+                response = self.client.get(reverse('recipe-leaderboard') + f'?limit={limit}')
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_ranking_is_updated_when_ratings_change(self):
+        recipe = Recipe.objects.get(title='Soup 3')
+        user = CustomUser.objects.get(username='user2')
+        self.client.credentials(HTTP_AUTHORIZATION='JWT ' + str(AccessToken.for_user(user)))
+        url = reverse('recipe-rating-list', kwargs={'recipe_pk': recipe.id})
+        response = self.client.post(url, data={'value': 9}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        response = self.client.get(reverse('recipe-leaderboard'))
+        self.assertEqual(self.get_titles(response), ['Soup 2', 'Pasta 1', 'Soup 1', 'Soup 3'])
+
+        rating = Rating.objects.get(recipe__title='Soup 2', author=user)
+        url = reverse('recipe-rating-detail', kwargs={'recipe_pk': rating.recipe_id, 'pk': rating.id})
+        self.client.delete(url)
+        recipe = Recipe.objects.get(title='Soup 2')
+        self.assertAlmostEqual(recipe.rating_score, (28 * 9 + 10 * 5.0) / (28 + 10))
+
+    def test_rebuild_after_settings_change(self):
+        with override_settings(LEADERBOARD={'PRIOR_COUNT': 0}):
+            call_command('rebuild_leaderboard', stdout=StringIO())
+            response = self.client.get(reverse('recipe-leaderboard'))
+        # Without prior, score is the plain average
+        self.assertEqual(self.get_titles(response), ['Soup 1', 'Soup 2', 'Pasta 1'])
+
+    def test_ordering_by_score(self):
+        response = self.client.get(reverse('recipe-list') + '?ordering=-rating_score')
+        self.assertEqual([recipe['title'] for recipe in response.data['results']][:3],
+                         ['Soup 2', 'Pasta 1', 'Soup 1'])
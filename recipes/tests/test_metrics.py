@@ -0,0 +1,122 @@
+import json
+import os
+import shutil
+import tempfile
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
+from recipes import metrics
+from recipes.models import Category, Recipe
+from users.models import CustomUser
+
+
+def get_sample(samples, name, **labels):
+    return sum(value for sample_name, sample_labels, value in samples
+               if sample_name == name and all(sample_labels.get(label) == value_
+                                              for label, value_ in labels.items()))
+
+
+class MetricsTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls) -> None:
+        user = CustomUser.objects.create_user(username='user1',
+                                              email='user1@gmail.com',
+                                              password='34somepassword34')
+        category = Category.objects.create(title='Pasta', slug='pasta')
+        for number in range(1, 4):
+            Recipe.objects.create(author=user,
+                                  category=category,
+                                  title=f'Pasta {number}',
+                                  instructions=f'Cook pasta {number}')
+
+    def setUp(self):
+        metrics.registry.samples.clear()
+
+    @override_settings(RESPONSE_CACHE={'TIMEOUT': 0})
+    def test_request_is_recorded_by_route(self):
+        response = self.client.get(reverse('recipe-list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        samples = metrics.registry.snapshot()
+        labels = {'route': 'recipe-list', 'method': 'GET'}
+        self.assertEqual(get_sample(samples, 'http_requests_total', status='200', **labels), 1)
+        self.assertEqual(get_sample(samples, 'http_request_duration_seconds_count', **labels), 1)
+        self.assertEqual(get_sample(samples, 'http_request_duration_seconds_bucket',
+                                    le='+Inf', **labels), 1)
+        self.assertEqual(get_sample(samples, 'http_response_bytes_total', **labels),
+                         len(response.content))
+        self.assertGreater(get_sample(samples, 'db_queries_total', **labels), 0)
+        self.assertGreater(get_sample(samples, 'serializer_duration_seconds_total', **labels), 0)
+
+    def test_not_found_route(self):
+        self.client.get('/not-existing/')
+        samples = metrics.registry.snapshot()
+        self.assertEqual(get_sample(samples, 'http_requests_total',
+                                    route='unmatched', status='404'), 1)
+
+    def test_metrics_endpoint(self):
+        self.client.get(reverse('category-list'))
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        content = response.content.decode()
+        self.assertIn('# TYPE http_request_duration_seconds histogram', content)
+        self.assertIn('http_requests_total{method="GET",route="category-list",status="200"} 1',
+                      content)
+        self.assertIn('http_request_duration_seconds_bucket'
+                      '{le="+Inf",method="GET",route="category-list"} 1', content)
+
+    def test_metrics_endpoint_is_protected(self):
+        url = reverse('metrics')
+        response = self.client.get(url, REMOTE_ADDR='10.0.0.1')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        admin = CustomUser.objects.create_superuser(username='admin',
+                                                    email='admin@gmail.com',
+                                                    password='34somepassword34')
+        self.client.credentials(HTTP_AUTHORIZATION='JWT ' + str(AccessToken.for_user(admin)))
+        response = self.client.get(url, REMOTE_ADDR='10.0.0.1')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        with override_settings(METRICS={'ALLOWED_IPS': ['10.0.0.1']}):
+            self.client.credentials()
+            response = self.client.get(url, REMOTE_ADDR='10.0.0.1')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_metrics_of_processes_are_added_up(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        # File written by other worker process
+        with open(os.path.join(directory, 'metrics_1_1.json'), 'w') as file:
+            json.dump([['http_requests_total',
+                        {'route': 'category-list', 'method': 'GET', 'status': '200'}, 2]], file)
+        with override_settings(METRICS={'DIRECTORY': directory}):
+            metrics.registry.path = None
+            self.addCleanup(setattr, metrics.registry, 'path', None)
+            self.client.get(reverse('category-list'))
+            response = self.client.get(reverse('metrics'))
+        self.assertIn('http_requests_total{method="GET",route="category-list",status="200"} 3',
+                      response.content.decode())
+
+    def test_metrics_of_exited_processes_are_archived(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        # File of process that was killed, pid is greater than any pid of system
+        stale_path = os.path.join(directory, 'metrics_999999999_1.json')
+        with open(stale_path, 'w') as file:
+            json.dump([['http_requests_total',
+                        {'route': 'category-list', 'method': 'GET', 'status': '200'}, 2]], file)
+        sample = 'http_requests_total{method="GET",route="category-list",status="200"} 3'
+        with override_settings(METRICS={'DIRECTORY': directory}):
+            metrics.registry.path = None
+            self.addCleanup(setattr, metrics.registry, 'path', None)
+            self.client.get(reverse('category-list'))
+            response = self.client.get(reverse('metrics'))
+            self.assertIn(sample, response.content.decode())
+            self.assertFalse(os.path.exists(stale_path))
+            # This process exits and another one serves /metrics
+            path = metrics.registry.path
+            metrics.registry.archive_file()
+            self.assertFalse(os.path.exists(path))
+            metrics.registry.path = None
+            metrics.registry.samples.clear()
+            self.assertIn(sample, metrics.render_metrics(metrics.registry.collect()))
@@ -0,0 +1,71 @@
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
+from recipes.models import Category, Recipe, Rating
+from recipes.seeding import Seeder
+from users.models import CustomUser
+
+
+@override_settings(RESPONSE_CACHE={'TIMEOUT': 0})
+class RatingHistogramTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.users = [CustomUser.objects.create_user(username=f'user{number}',
+                                                    email=f'user{number}@gmail.com',
+                                                    password='34somepassword34')
+                     for number in range(1, 5)]
+        category = Category.objects.create(title='Soups', slug='soups')
+        cls.recipe = Recipe.objects.create(author=cls.users[0], category=category,
+                                           title='Soup 1', instructions='Cook soup 1')
+        for user, value in zip(cls.users[1:], [10, 7, 7]):
+            Rating.objects.create(recipe=cls.recipe, author=user, value=value)
+
+    def get_histogram(self):
+        response = self.client.get(reverse('recipe-get-rating-histogram',
+                                           kwargs={'pk': self.recipe.id}))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def expected_histogram(self, counts):
+        histogram = [0] * 11
+        for value, count in counts.items():
+            histogram[value] = count
+        return histogram
+
+    def test_histogram(self):
+        data = self.get_histogram()
+        self.assertEqual(data['count'], 3)
+        self.assertEqual(data['average'], 8.0)
+        self.assertEqual(data['histogram'], self.expected_histogram({7: 2, 10: 1}))
+
+    def test_update_moves_vote_between_buckets(self):
+        rating = Rating.objects.get(recipe=self.recipe, value=10)
+        self.client.credentials(HTTP_AUTHORIZATION='JWT ' + str(AccessToken.for_user(rating.author)))
+        response = self.client.put(
+            reverse('recipe-rating-detail', kwargs={'recipe_pk': self.recipe.id, 'pk': rating.id}),
+            data={'value': 3}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.get_histogram()['histogram'], self.expected_histogram({3: 1, 7: 2}))
+
+    def test_delete(self):
+        Rating.objects.filter(recipe=self.recipe, value=7).first().delete()
+        self.assertEqual(self.get_histogram()['histogram'], self.expected_histogram({7: 1, 10: 1}))
+
+    def test_expand(self):
+        url = reverse('recipe-detail', kwargs={'pk': self.recipe.id}) + '?expand=rating_histogram'
+        # Recipe with histogram, and its author and category for cache tags
+        with self.assertNumQueries(2):
+            response = self.client.get(url)
+        self.assertEqual(response.data['rating_histogram'], self.expected_histogram({7: 2, 10: 1}))
+        self.assertNotIn('rating_histogram', self.client.get(reverse('recipe-list')).data['results'][0])
+
+    def test_seeded_histograms(self):
+        Seeder(random_seed=1).seed(recipes=5, ratings=12)
+        for recipe in Recipe.objects.all():
+            with self.subTest(recipe=recipe.title):
+                self.assertEqual(sum(recipe.rating_histogram), recipe.rating_count)
+                self.assertEqual(sum(value * count for value, count in enumerate(recipe.rating_histogram)),
+                                 recipe.rating_sum)
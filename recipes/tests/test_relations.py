@@ -0,0 +1,35 @@
+from django.urls import set_script_prefix, clear_script_prefix
+from rest_framework.request import Request
+from rest_framework.reverse import reverse
+from rest_framework.test import APITestCase, APIRequestFactory
+from recipes.relations import cached_reverse
+
+
+class CachedReverseTests(APITestCase):
+    def get_request(self, path='/recipes/'):
+        return Request(APIRequestFactory().get(path))
+
+    def test_cached_reverse_of_detail_url(self):
+        request = self.get_request()
+        self.assertEqual(cached_reverse('recipe-detail', kwargs={'pk': 5}, request=request),
+                         reverse('recipe-detail', kwargs={'pk': 5}, request=request))
+
+    def test_cached_reverse_of_nested_url(self):
+        request = self.get_request()
+        kwargs = {'recipe_pk': 3, 'pk': 14}
+        self.assertEqual(cached_reverse('recipe-review-detail', kwargs=kwargs, request=request),
+                         reverse('recipe-review-detail', kwargs=kwargs, request=request))
+
+    def test_cached_reverse_with_script_prefix(self):
+        request = self.get_request()
+        set_script_prefix('/api/')
+        try:
+            self.assertEqual(cached_reverse('category-detail', kwargs={'pk': 2}, request=request),
+                             'http://testserver/api/categories/2/')
+        finally:
+            clear_script_prefix()
+
+    def test_cached_reverse_with_format_override(self):
+        request = self.get_request('/recipes/?format=json')
+        self.assertEqual(cached_reverse('recipe-detail', kwargs={'pk': 5}, request=request),
+                         'http://testserver/recipes/5/?format=json')
@@ -0,0 +1,96 @@
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from recipes.models import Category, Recipe, Ingredient
+from recipes.scaling import convert
+from users.models import CustomUser
+
+
+@override_settings(RESPONSE_CACHE={'TIMEOUT': 0})
+class ScalingTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls) -> None:
+        user = CustomUser.objects.create_user(username='user1',
+                                              email='user1@gmail.com',
+                                              password='34somepassword34')
+        category = Category.objects.create(title='Baking', slug='baking')
+        cls.pancakes = Recipe.objects.create(author=user, category=category, servings=4,
+                                             title='Pancakes', instructions='Cook pancakes')
+        Ingredient.objects.create(recipe=cls.pancakes, name='Flour', quantity=250,
+                                  units_of_measurement='gm')
+        Ingredient.objects.create(recipe=cls.pancakes, name='Milk', quantity=600,
+                                  units_of_measurement='ml')
+        Ingredient.objects.create(recipe=cls.pancakes, name='Eggs', quantity=2)
+        cls.bread = Recipe.objects.create(author=user, category=category,
+                                          title='Bread', instructions='Bake bread')
+        Ingredient.objects.create(recipe=cls.bread, name='Yeast', quantity=7,
+                                  units_of_measurement='gm')
+
+    def scale(self, recipe, query=''):
+        return self.client.get(reverse('recipe-scale', kwargs={'pk': recipe.id}) + query)
+
+    def get_ingredients(self, data):
+        return [(ingredient['name'], ingredient['quantity'], ingredient['units_of_measurement'])
+                for ingredient in data['ingredients']]
+
+    def test_scale_by_servings(self):
+        response = self.scale(self.pancakes, '?servings=10&units=metric')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['factor'], 2.5)
+        self.assertEqual(response.data['servings'], 10)
+        self.assertEqual(self.get_ingredients(response.data),
+                         [('eggs', 5.0, None), ('flour', 625.0, 'gm'), ('milk', 1.5, 'l')])
+
+    def test_scale_by_factor(self):
+        response = self.scale(self.pancakes, '?factor=0.5')
+        self.assertEqual(response.data['servings'], 2)
+        self.assertEqual(self.get_ingredients(response.data),
+                         [('eggs', 1.0, None), ('flour', 125.0, 'gm'), ('milk', 300.0, 'ml')])
+
+    def test_imperial_units(self):
+        response = self.scale(self.pancakes, '?units=imperial')
+        self.assertEqual(self.get_ingredients(response.data),
+                         [('eggs', 2.0, None), ('flour', 8.82, 'oz'), ('milk', 2.54, 'cup')])
+
+    def test_scale_many(self):
+        url = reverse('recipe-scale-many')
+        response = self.client.get(url + f'?ids={self.bread.id},{self.pancakes.id}&factor=2')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([recipe['title'] for recipe in response.data], ['Bread', 'Pancakes'])
+        self.assertIsNone(response.data[0]['servings'])
+        self.assertEqual(self.get_ingredients(response.data[0]), [('yeast', 14.0, 'gm')])
+        self.assertEqual(response.data[1]['servings'], 8)
+
+    def test_scale_many_queries(self):
+        recipe_ids = ','.join(str(recipe.id) for recipe in [self.pancakes, self.bread])
+        with self.assertNumQueries(2):
+            self.client.get(reverse('recipe-scale-many') + f'?ids={recipe_ids}&units=imperial')
+
+    def test_invalid_scaling(self):
+        invalid = [
+            (self.pancakes, '?factor=2&servings=2', status.HTTP_400_BAD_REQUEST),
+            (self.pancakes, '?factor=abc', status.HTTP_400_BAD_REQUEST),
+            (self.pancakes, '?factor=0', status.HTTP_400_BAD_REQUEST),
+            (self.pancakes, '?factor=101', status.HTTP_400_BAD_REQUEST),
+            (self.pancakes, '?units=cups', status.HTTP_400_BAD_REQUEST),
+            # Recipe without servings can be scaled only by factor
+            (self.bread, '?servings=2', status.HTTP_400_BAD_REQUEST),
+        ]
+        for recipe, query, status_code in invalid:
+            with self.subTest(query=query):
+                self.assertEqual(self.scale(recipe, query).status_code, status_code)
+        url = reverse('recipe-scale-many')
+        for query, status_code in [('', status.HTTP_400_BAD_REQUEST),
+                                   ('?ids=1,a', status.HTTP_400_BAD_REQUEST),
+                                   ('?ids=' + ','.join(map(str, range(1, 52))), status.HTTP_400_BAD_REQUEST),
+                                   (f'?ids={self.bread.id},789', status.HTTP_404_NOT_FOUND)]:
+            with self.subTest(query=query):
+                self.assertEqual(self.client.get(url + query).status_code, status_code)
+
+    def test_convert(self):
+        quantities, units = convert([500, 0.5, 3], ['mg', 'l', 'oz'], [4, 1, 1], 'metric')
+        self.assertEqual(quantities, [2.0, 500.0, 85.05])
+        self.assertEqual(units, ['gm', 'ml', 'gm'])
+        quantities, units = convert([5, 15], ['ml', 'ml'], [1, 1], 'imperial')
+        self.assertEqual(units, ['tsp', 'tbsp'])
@@ -0,0 +1,86 @@
+from io import StringIO
+from random import Random
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.db.models import Count, Sum
+from django.test.utils import CaptureQueriesContext
+from django.test import TestCase
+from recipes.models import Category, Recipe, Ingredient, Review, Rating, RecipeSearchTerm
+from recipes.seeding import ZipfSampler, split_total
+from users.models import CustomUser
+
+
+class SeedDataTests(TestCase):
+    def seed(self, **options):
+        options = {'users': 30, 'categories': 4, 'recipes': 100, 'ingredients': 450,
+                   'reviews': 300, 'ratings': 600, 'chunk_size': 70, 'random_seed': 1,
+                   **options}
+        call_command('seed_data', stdout=StringIO(), **options)
+
+    def test_volumes(self):
+        self.seed()
+        self.assertEqual(CustomUser.objects.count(), 30)
+        self.assertEqual(Category.objects.count(), 4)
+        self.assertEqual(Recipe.objects.count(), 100)
+        self.assertEqual(Ingredient.objects.count(), 450)
+        self.assertEqual(Review.objects.count(), 300)
+        self.assertEqual(Rating.objects.count(), 600)
+
+    def test_generated_data_is_consistent(self):
+        self.seed()
+        for recipe in Recipe.objects.annotate(count=Count('ratings'), sum=Sum('ratings__value')):
+            self.assertEqual(recipe.rating_count, recipe.count)
+            self.assertEqual(recipe.rating_sum, recipe.sum or 0)
+            values = recipe.ratings.values_list('value', flat=True)
+            self.assertEqual(recipe.rating_histogram,
+                             [list(values).count(value) for value in range(11)])
+        self.assertEqual(RecipeSearchTerm.objects.values('recipe').distinct().count(), 100)
+        for user in CustomUser.objects.annotate(recipes_number=Count('recipes', distinct=True),
+                                                reviews_number=Count('reviews', distinct=True)):
+            self.assertEqual(user.recipe_count, user.recipes_number)
+            self.assertEqual(user.review_count, user.reviews_number)
+        self.assertEqual(sum(Category.objects.values_list('recipe_count', flat=True)), 100)
+        ingredient = Ingredient.objects.first()
+        self.assertEqual(ingredient.name, ingredient.name.lower())
+        # Every recipe has the same number of ingredients, give or take one
+        counts = Recipe.objects.annotate(count=Count('ingredients')).values_list('count', flat=True)
+        self.assertEqual(set(counts), {4, 5})
+
+    def test_objects_are_written_in_chunks(self):
+        with CaptureQueriesContext(connection) as context:
+            self.seed(chunk_size=20)
+        # Canonical ingredients are few and are created by CanonicalIngredient.resolve
+        inserts = [query['sql'] for query in context.captured_queries
+                   if query['sql'].startswith('INSERT') and 'canonicalingredient' not in query['sql']]
+        self.assertTrue(inserts)
+        for sql in inserts:
+            self.assertLessEqual(sql.count('), ('), 19)
+
+    def test_seeding_twice(self):
+        self.seed()
+        self.seed()
+        self.assertEqual(CustomUser.objects.count(), 60)
+        self.assertEqual(Recipe.objects.count(), 200)
+
+    def test_recipes_without_users(self):
+        with self.assertRaises(CommandError):
+            self.seed(users=0)
+
+
+class ZipfSamplerTests(TestCase):
+    def test_popular_items_are_drawn_more_often(self):
+        sampler = ZipfSampler(range(100), 1.1, Random(1), shuffle=False)
+        draws = sampler.sample(10000)
+        self.assertGreater(draws.count(0), draws.count(9) * 5)
+
+    def test_sample_distinct(self):
+        sampler = ZipfSampler(range(100), 1.1, Random(1))
+        self.assertEqual(len(set(sampler.sample_distinct(90))), 90)
+        self.assertEqual(len(sampler.sample_distinct(200)), 100)
+
+    def test_split_total(self):
+        sampler = ZipfSampler(range(50), 1.1, Random(1))
+        counts = split_total(1000, sampler, 40, Random(1))
+        self.assertEqual(sum(counts.values()), 1000)
+        self.assertLessEqual(max(counts.values()), 40)
@@ -0,0 +1,75 @@
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from recipes.models import Category, Recipe, Ingredient
+from recipes.scaling import combine
+from users.models import CustomUser
+
+
+@override_settings(RESPONSE_CACHE={'TIMEOUT': 0})
+class ShoppingListTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls) -> None:
+        user = CustomUser.objects.create_user(username='user1',
+                                              email='user1@gmail.com',
+                                              password='34somepassword34')
+        category = Category.objects.create(title='Baking', slug='baking')
+        cls.pancakes = Recipe.objects.create(author=user, category=category, servings=2,
+                                             title='Pancakes', instructions='Cook pancakes')
+        Ingredient.objects.create(recipe=cls.pancakes, name='Flour', quantity=250,
+                                  units_of_measurement='gm')
+        Ingredient.objects.create(recipe=cls.pancakes, name='Milk', quantity=600,
+                                  units_of_measurement='ml')
+        Ingredient.objects.create(recipe=cls.pancakes, name='Eggs', quantity=2)
+        cls.bread = Recipe.objects.create(author=user, category=category, servings=4,
+                                          title='Bread', instructions='Bake bread')
+        Ingredient.objects.create(recipe=cls.bread, name='FLOUR', quantity=1,
+                                  units_of_measurement='oz')
+        Ingredient.objects.create(recipe=cls.bread, name='Milk', quantity=0.5,
+                                  units_of_measurement='l')
+        Ingredient.objects.create(recipe=cls.bread, name='Yeast', quantity=7000,
+                                  units_of_measurement='mg')
+
+    def get_shopping_list(self, query):
+        response = self.client.get(reverse('recipe-shopping-list') + query)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [(item['name'], item['quantity'], item['units_of_measurement'], item['recipe_count'])
+                for item in response.data['items']]
+
+    def test_shopping_list(self):
+        self.assertEqual(self.get_shopping_list(f'?ids={self.pancakes.id},{self.bread.id}'), [
+            ('eggs', 2.0, None, 1),
+            ('flour', 278.35, 'gm', 2),
+            ('milk', 1.1, 'l', 2),
+            ('yeast', 7.0, 'gm', 1),
+        ])
+
+    def test_scaled_shopping_list(self):
+        self.assertEqual(self.get_shopping_list(
+            f'?ids={self.pancakes.id},{self.bread.id}&servings=4&units=imperial'
+        ), [
+            ('eggs', 4.0, None, 1),
+            ('flour', 1.16, 'lb', 2),
+            ('milk', 7.19, 'cup', 2),
+            ('yeast', 0.25, 'oz', 1),
+        ])
+
+    def test_one_query_for_ingredients(self):
+        recipe_ids = ','.join(str(recipe.id) for recipe in [self.pancakes, self.bread])
+        with self.assertNumQueries(2):
+            self.client.get(reverse('recipe-shopping-list') + f'?ids={recipe_ids}')
+
+    def test_invalid_shopping_list(self):
+        url = reverse('recipe-shopping-list')
+        for query, status_code in [('', status.HTTP_400_BAD_REQUEST),
+                                   (f'?ids={self.bread.id}&units=original', status.HTTP_400_BAD_REQUEST),
+                                   ('?ids=' + ','.join(map(str, range(1, 302))), status.HTTP_400_BAD_REQUEST),
+                                   (f'?ids={self.bread.id},789', status.HTTP_404_NOT_FOUND)]:
+            with self.subTest(query=query):
+                self.assertEqual(self.client.get(url + query).status_code, status_code)
+
+    def test_combine(self):
+        items = combine(['salt', 'salt', 'salt', 'water'], [1, 500, 2, 1],
+                        ['gm', 'mg', None, 'l'], [1, 1, 1, 2], 'metric')
+        self.assertEqual(items, [('salt', 1.5, 'gm'), ('salt', 2.0, None), ('water', 2.0, 'l')])
@@ -0,0 +1,124 @@
+import shutil
+import struct
+import tempfile
+import zlib
+from io import BytesIO
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import override_settings
+from django.urls import reverse
+from PIL import Image
+from rest_framework import status
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
+from recipes.models import Category, Recipe, RecipeImage
+from users.models import CustomUser
+
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def png_chunk(chunk_type, data):
+    return struct.pack('>I', len(data)) + chunk_type + data + \
+        struct.pack('>I', zlib.crc32(chunk_type + data))
+
+
+def make_png_header(width, height):
+    # Only signature and header of PNG, pixels that it declares are never sent
+    return b'\x89PNG\r\n\x1a\n' + \
+        png_chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)) + \
+        png_chunk(b'IDAT', zlib.compress(b'\x00' * 1024))
+
+
+def make_jpeg(size=(100, 100)):
+    image_file = BytesIO()
+    Image.new('RGB', size, color='red').save(image_file, 'jpeg')
+    return image_file.getvalue()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class UploadLimitsTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls) -> None:
+        user = CustomUser.objects.create_user(username='user1',
+                                              email='user1@gmail.com',
+                                              password='34somepassword34')
+        category = Category.objects.create(title='Pasta', slug='pasta')
+        Recipe.objects.create(author=user,
+                              category=category,
+                              title='Pasta 1',
+                              instructions='Cook pasta')
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def post_recipe_image(self, content, name='test_image.jpg', field='image'):
+        recipe = Recipe.objects.get(title='Pasta 1')
+        user = CustomUser.objects.get(username='user1')
+        token = AccessToken.for_user(user)
+        self.client.credentials(HTTP_AUTHORIZATION='JWT ' + str(token))
+        url = reverse('recipe-image-list', kwargs={'recipe_pk': recipe.id})
+        return self.client.post(url, data={field: SimpleUploadedFile(name, content)},
+                                format='multipart')
+
+    def test_valid_image_is_accepted(self):
+        response = self.post_recipe_image(make_jpeg())
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_decompression_bomb_is_rejected(self):
+        response = self.post_recipe_image(make_png_header(50000, 50000),
+                                          name='bomb.png')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['image'][0], 'Image has too many pixels.')
+        self.assertFalse(RecipeImage.objects.exists())
+
+    def test_not_image_is_rejected(self):
+        response = self.post_recipe_image(b'not an image' * 100, name='image.jpg')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertTrue(response.data['image'][0].startswith('Upload a valid image.'))
+
+    @override_settings(UPLOAD_LIMITS={'FORMATS': ['PNG']})
+    def test_image_in_not_accepted_format_is_rejected(self):
+        response = self.post_recipe_image(make_jpeg())
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['image'][0],
+                         'Images in JPEG format are not accepted.')
+
+    def test_file_in_other_field_is_rejected(self):
+        response = self.post_recipe_image(make_jpeg(), field='document')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('document', response.data)
+
+    def test_too_large_user_image_is_rejected_before_it_is_read(self):
+        # Image of user cannot be larger than 500KB
+        content = make_png_header(100, 100) + b'\x00' * 600 * 1024
+        response = self.client.post(reverse('customuser-list'),
+                                    data={'username': 'user2',
+                                          'email': 'user2@gmail.com',
+                                          'password': '34somepassword34',
+                                          'image': SimpleUploadedFile('user.png', content)},
+                                    format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        self.assertFalse(CustomUser.objects.filter(username='user2').exists())
+
+    @override_settings(UPLOAD_LIMITS={'FORM_SIZE': 1024 * 1024})
+    def test_too_large_user_image_is_rejected_while_it_is_streamed(self):
+        content = make_png_header(100, 100) + b'\x00' * 600 * 1024
+        response = self.client.post(reverse('customuser-list'),
+                                    data={'username': 'user2',
+                                          'email': 'user2@gmail.com',
+                                          'password': '34somepassword34',
+                                          'image': SimpleUploadedFile('user.png', content)},
+                                    format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        self.assertEqual(response.data['detail'], 'Files cannot be larger than 500KB')
+
+    def test_user_with_valid_image_is_created(self):
+        response = self.client.post(reverse('customuser-list'),
+                                    data={'username': 'user2',
+                                          'email': 'user2@gmail.com',
+                                          'password': '34somepassword34',
+                                          'image': SimpleUploadedFile('user.jpg', make_jpeg())},
+                                    format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
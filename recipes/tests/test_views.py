@@ -1,5 +1,7 @@
 import os
+import json
 import tempfile
+from datetime import timedelta
 from PIL import Image
 from io import BytesIO
 from django.db.models import Avg
@@ -60,6 +62,7 @@ class CategoriesTests(APITestCase):
                          'id': category.id,
                          'title': category.title,
                          'slug': category.slug,
+                         'recipe_count': category.recipe_count,
                          'get_recipes': test_server_prefix + reverse('category-get-recipes', kwargs={'pk': category.id})}
         self.assertEqual(response.data, expected_data)
 
@@ -84,7 +87,7 @@ class CategoriesTests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         recipes_count_in_category = Recipe.objects.filter(
             category=category).count()
-        self.assertEqual(len(response.data), recipes_count_in_category)
+        self.assertEqual(len(response.data['results']), recipes_count_in_category)
 
     def test_get_detail_of_nonexistent_category(self):
         url = reverse('category-detail', kwargs={'pk': 78})
@@ -135,6 +138,7 @@ class CategoriesTests(APITestCase):
                          'id': new_category.id,
                          'title': new_category.title,
                          'slug': new_category.slug,
+                         'recipe_count': new_category.recipe_count,
                          'get_recipes': test_server_prefix + reverse('category-get-recipes', kwargs={'pk': new_category.id})}
         self.assertEqual(response.data, expected_data)
 
@@ -200,6 +204,7 @@ class CategoriesTests(APITestCase):
                          'id': updated_category.id,
                          'title': updated_category.title,
                          'slug': updated_category.slug,
+                         'recipe_count': updated_category.recipe_count,
                          'get_recipes': test_server_prefix + reverse('category-get-recipes', kwargs={'pk': updated_category.id})}
         self.assertEqual(response.data, expected_data)
 
@@ -320,8 +325,13 @@ class RecipesTests(APITestCase):
                          'title': recipe.title,
                          'slug': recipe.slug,
                          'instructions': recipe.instructions,
+                         'servings': recipe.servings,
                          'published': recipe.published.replace(tzinfo=None).isoformat() + 'Z',
                          'updated': recipe.updated.replace(tzinfo=None).isoformat() + 'Z',
+                         'rating_count': recipe.rating_count,
+                         'rating_sum': recipe.rating_sum,
+                         'rating_average': recipe.rating_average,
+                         'rating_score': recipe.rating_score,
                          'author_name': recipe.author.username,
                          'author': test_server_prefix + reverse('author-detail', kwargs={'pk': recipe.author.id}),
                          'category_title': recipe.category.title,
@@ -353,7 +363,7 @@ class RecipesTests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         ingredients_count_for_recipe = Ingredient.objects.filter(
             recipe=recipe).count()
-        self.assertEqual(len(response.data), ingredients_count_for_recipe)
+        self.assertEqual(len(response.data['results']), ingredients_count_for_recipe)
 
     def test_get_reviews_of_recipe_detail(self):
         recipe = Recipe.objects.filter(title='Pasta 1').first()
@@ -368,7 +378,7 @@ class RecipesTests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         reviews_count_for_recipe = Review.objects.filter(
             recipe=recipe).count()
-        self.assertEqual(len(response.data), reviews_count_for_recipe)
+        self.assertEqual(len(response.data['results']), reviews_count_for_recipe)
 
     def test_get_ratings_of_recipe_detail(self):
         recipe = Recipe.objects.filter(title='Pasta 1').first()
@@ -383,7 +393,7 @@ class RecipesTests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         ratings_count_for_recipe = Rating.objects.filter(
             recipe=recipe).count()
-        self.assertEqual(len(response.data), ratings_count_for_recipe)
+        self.assertEqual(len(response.data['results']), ratings_count_for_recipe)
 
     def test_get_average_rating_of_recipe_detail(self):
         recipe = Recipe.objects.filter(title='Pasta 1').first()
@@ -400,6 +410,189 @@ class RecipesTests(APITestCase):
             recipe=recipe).aggregate(avg_rating=Avg('value'))
         self.assertEqual(response.data, average_recipe_rating)
 
+    def test_get_recipe_list_ordered_by_average_rating(self):
+        category = Category.objects.filter(title='Pasta').first()
+        user_1 = CustomUser.objects.filter(username='user1').first()
+        user_2 = CustomUser.objects.filter(username='user2').first()
+        recipe_1 = Recipe.objects.filter(title='Pasta 1').first()
+        recipe_2 = Recipe.objects.create(author=user_1,
+                                         category=category,
+                                         title='Pasta 2',
+                                         instructions='Cook pasta 2')
+        Rating.objects.create(recipe=recipe_1, author=user_2, value=4)
+        Rating.objects.create(recipe=recipe_2, author=user_2, value=9)
+        url = reverse('recipe-list') + '?ordering=-rating_average'
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        titles = [recipe['title'] for recipe in response.data['results']]
+        self.assertEqual(titles, ['Pasta 2', 'Pasta 1'])
+
+    def test_get_recipe_list_with_page_size(self):
+        category = Category.objects.filter(title='Pasta').first()
+        user = CustomUser.objects.filter(username='user1').first()
+        for number in range(2, 8):
+            Recipe.objects.create(author=user,
+                                  category=category,
+                                  title=f'Pasta {number}',
+                                  instructions=f'Cook pasta {number}')
+        url = reverse('recipe-list') + '?page_size=3'
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 7)
+        self.assertEqual(len(response.data['results']), 3)
+        url = reverse('recipe-list') + '?page_size=1000'
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 7)
+
+    def test_get_recipe_list_with_cursor_pagination(self):
+        category = Category.objects.filter(title='Pasta').first()
+        user = CustomUser.objects.filter(username='user1').first()
+        for number in range(2, 8):
+            Recipe.objects.create(author=user,
+                                  category=category,
+                                  title=f'Pasta {number}',
+                                  instructions=f'Cook pasta {number}')
+        url = reverse('recipe-list') + '?pagination=cursor&page_size=4'
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn('count', response.data)
+        titles = [recipe['title'] for recipe in response.data['results']]
+        self.assertEqual(titles, ['Pasta 1', 'Pasta 2', 'Pasta 3', 'Pasta 4'])
+        response = self.client.get(response.data['next'])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        titles = [recipe['title'] for recipe in response.data['results']]
+        self.assertEqual(titles, ['Pasta 5', 'Pasta 6', 'Pasta 7'])
+        self.assertIsNone(response.data['next'])
+        url = reverse('recipe-list') + '?pagination=cursor&ordering=-title'
+        response = self.client.get(url)
+        self.assertEqual(response.data['results'][0]['title'], 'Pasta 7')
+        url = reverse('recipe-list') + '?pagination=cursor&ordering=rating_count'
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_search_recipes(self):
+        category = Category.objects.filter(title='Pasta').first()
+        user = CustomUser.objects.filter(username='user1').first()
+        Recipe.objects.create(author=user,
+                              category=category,
+                              title='Tomato soup',
+                              instructions='Boil tomatoes')
+        Recipe.objects.create(author=user,
+                              category=category,
+                              title='Pasta with sauce',
+                              instructions='Make tomato sauce and cook pasta')
+        url = reverse('recipe-list') + '?search=tomato'
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        titles = [recipe['title'] for recipe in response.data['results']]
+        self.assertEqual(titles, ['Tomato soup', 'Pasta with sauce'])
+        url = reverse('recipe-list') + '?search=tomato sauce'
+        response = self.client.get(url)
+        titles = [recipe['title'] for recipe in response.data['results']]
+        self.assertEqual(titles, ['Pasta with sauce'])
+        url = reverse('recipe-list') + '?search=user1'
+        response = self.client.get(url)
+        self.assertEqual(response.data['count'], 3)
+
+    def test_search_recipes_by_single_character(self):
+        category = Category.objects.filter(title='Pasta').first()
+        user = CustomUser.objects.filter(username='user1').first()
+        Recipe.objects.create(author=user,
+                              category=category,
+                              title='Plan B',
+                              instructions='Cook anything')
+        response = self.client.get(reverse('recipe-list') + '?search=b')
+        titles = [recipe['title'] for recipe in response.data['results']]
+        self.assertEqual(titles, ['Plan B'])
+        response = self.client.get(reverse('recipe-list') + '?search=plan b')
+        titles = [recipe['title'] for recipe in response.data['results']]
+        self.assertEqual(titles, ['Plan B'])
+
+    def test_search_recipes_with_too_many_words(self):
+        url = reverse('recipe-list') + '?search=' + ' '.join(f'word{number}' for number in range(11))
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_search_recipes_after_recipe_update(self):
+        recipe = Recipe.objects.filter(title='Pasta 1').first()
+        recipe.instructions = 'Add basil'
+        recipe.save()
+        response = self.client.get(reverse('recipe-list') + '?search=cook')
+        self.assertEqual(response.data['count'], 0)
+        response = self.client.get(reverse('recipe-list') + '?search=basil')
+        self.assertEqual(response.data['count'], 1)
+
+    def test_search_recipes_after_category_and_author_update(self):
+        category = Category.objects.filter(title='Pasta').first()
+        user = CustomUser.objects.filter(username='user1').first()
+        with self.captureOnCommitCallbacks(execute=True):
+            category.title = 'Noodles'
+            category.save()
+            user.username = 'chef'
+            user.save()
+        response = self.client.get(reverse('recipe-list') + '?search=noodles chef')
+        self.assertEqual(response.data['count'], 1)
+        response = self.client.get(reverse('recipe-list') + '?search=user1')
+        self.assertEqual(response.data['count'], 0)
+
+    def test_recipe_is_not_reindexed_when_search_fields_are_same(self):
+        recipe = Recipe.objects.filter(title='Pasta 1').first()
+        recipe.servings = 4
+        # Savepoint and update of recipe, terms are not touched
+        with self.assertNumQueries(3):
+            recipe.save()
+
+    def test_get_recipe_list_with_expand(self):
+        category = Category.objects.filter(title='Pasta').first()
+        user_1 = CustomUser.objects.filter(username='user1').first()
+        user_2 = CustomUser.objects.filter(username='user2').first()
+        for number in range(2, 5):
+            recipe = Recipe.objects.create(author=user_1,
+                                           category=category,
+                                           title=f'Pasta {number}',
+                                           instructions=f'Cook pasta {number}')
+            Ingredient.objects.create(name='eggs', quantity=2, recipe=recipe)
+            Review.objects.create(recipe=recipe, author=user_2,
+                                  content='Good recipe')
+            Rating.objects.create(recipe=recipe, author=user_2, value=7)
+        url = reverse('recipe-list') + \
+            '?expand=ingredients,images,reviews,rating_summary'
+        # Count, recipes, ingredients, images and reviews,
+        # then authors and categories of recipes and reviews for cache tags
+        with self.assertNumQueries(7):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        recipe_data = response.data['results'][1]
+        self.assertEqual(recipe_data['title'], 'Pasta 2')
+        self.assertEqual(len(recipe_data['ingredients']), 1)
+        self.assertEqual(recipe_data['images'], [])
+        self.assertEqual(recipe_data['reviews'][0]['author_name'], 'user2')
+        self.assertEqual(recipe_data['rating_summary'],
+                         {'count': 1, 'sum': 7, 'average': 7.0})
+
+    def test_get_recipe_with_expanded_latest_reviews(self):
+        recipe = Recipe.objects.filter(title='Pasta 1').first()
+        for number in range(7):
+            author = CustomUser.objects.create_user(username=f'reviewer{number}',
+                                                    email=f'reviewer{number}@gmail.com',
+                                                    password='34somepassword34')
+            Review.objects.create(recipe=recipe, author=author, content=f'Review {number}')
+        url = reverse('recipe-detail', kwargs={'pk': recipe.id}) + '?expand=reviews'
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        contents = [review['content'] for review in response.data['reviews']]
+        self.assertEqual(contents, [f'Review {number}' for number in range(6, 1, -1)])
+        response = self.client.get(reverse('recipe-list') + '?expand=reviews')
+        self.assertEqual(len(response.data['results'][0]['reviews']), 5)
+
+    def test_get_recipe_detail_with_unknown_expand(self):
+        recipe = Recipe.objects.filter(title='Pasta 1').first()
+        url = reverse('recipe-detail', kwargs={'pk': recipe.id}) + \
+            '?expand=comments'
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
     def test_get_images_of_recipe_detail(self):
         recipe = Recipe.objects.filter(title='Pasta 1').first()
         image_1 = RecipeImage.objects.create(recipe=recipe,
@@ -411,7 +604,105 @@ class RecipesTests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         images_count_for_recipe = RecipeImage.objects.filter(
             recipe=recipe).count()
-        self.assertEqual(len(response.data), images_count_for_recipe)
+        self.assertEqual(len(response.data['results']), images_count_for_recipe)
+
+    def test_get_ingredients_of_recipe_detail_with_cursor_pagination(self):
+        recipe = Recipe.objects.filter(title='Pasta 1').first()
+        for name in ['eggs', 'cheese', 'salt', 'pepper']:
+            Ingredient.objects.create(name=name, quantity=1, recipe=recipe)
+        url = reverse('recipe-get-ingredients', kwargs={'pk': recipe.id}) + \
+            '?pagination=cursor&page_size=3'
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        names = [ingredient['name'] for ingredient in response.data['results']]
+        self.assertEqual(names, ['cheese', 'eggs', 'pepper'])
+        response = self.client.get(response.data['next'])
+        names = [ingredient['name'] for ingredient in response.data['results']]
+        self.assertEqual(names, ['salt'])
+
+    def test_stream_ratings_of_recipe_detail(self):
+        recipe = Recipe.objects.filter(title='Pasta 1').first()
+        user_1 = CustomUser.objects.filter(username='user1').first()
+        user_2 = CustomUser.objects.filter(username='user2').first()
+        Rating.objects.create(recipe=recipe, author=user_1, value=9)
+        Rating.objects.create(recipe=recipe, author=user_2, value=8)
+        url = reverse('recipe-get-ratings', kwargs={'pk': recipe.id}) + \
+            '?stream=true'
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        data = json.loads(b''.join(response.streaming_content))
+        self.assertEqual([rating['value'] for rating in data], [8, 9])
+
+    def test_get_recipe_detail_not_modified(self):
+        recipe = Recipe.objects.filter(title='Pasta 1').first()
+        url = reverse('recipe-detail', kwargs={'pk': recipe.id})
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+        user = CustomUser.objects.filter(username='user2').first()
+        Rating.objects.create(recipe=recipe, author=user, value=6)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_get_recipe_detail_modified_by_category_title(self):
+        recipe = Recipe.objects.filter(title='Pasta 1').first()
+        url = reverse('recipe-detail', kwargs={'pk': recipe.id})
+        etag = self.client.get(url)['ETag']
+        list_etag = self.client.get(reverse('recipe-list'))['ETag']
+        category = Category.objects.get(title='Pasta')
+        category.title = 'Noodles'
+        with self.captureOnCommitCallbacks(execute=True):
+            category.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['category_title'], 'Noodles')
+        response = self.client.get(reverse('recipe-list'), HTTP_IF_NONE_MATCH=list_etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_get_recipe_detail_modified_since_rating(self):
+        recipe = Recipe.objects.filter(title='Pasta 1').first()
+        an_hour_ago = recipe.updated - timedelta(hours=1)
+        Recipe.objects.filter(pk=recipe.pk).update(updated=an_hour_ago)
+        Category.objects.filter(pk=recipe.category_id).update(updated=an_hour_ago)
+        CustomUser.objects.filter(pk=recipe.author_id).update(updated=an_hour_ago)
+        url = reverse('recipe-detail', kwargs={'pk': recipe.id})
+        last_modified = self.client.get(url)['Last-Modified']
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        user = CustomUser.objects.filter(username='user2').first()
+        with self.captureOnCommitCallbacks(execute=True):
+            Rating.objects.create(recipe=recipe, author=user, value=6)
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['rating_count'], 1)
+        # Recipe itself was not edited
+        self.assertEqual(Recipe.objects.get(pk=recipe.pk).updated, an_hour_ago)
+
+    def test_get_recipe_list_modified_by_ratings_that_cancel_out(self):
+        recipe = Recipe.objects.filter(title='Pasta 1').first()
+        other_recipe = Recipe.objects.create(author=recipe.author, category=recipe.category,
+                                             title='Pasta 2', instructions='Cook pasta 2')
+        user = CustomUser.objects.filter(username='user2').first()
+        rating = Rating.objects.create(recipe=recipe, author=user, value=6)
+        url = reverse('recipe-list')
+        etag = self.client.get(url)['ETag']
+        rating.delete()
+        Rating.objects.create(recipe=other_recipe, author=user, value=6)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_get_recipe_list_not_modified_since(self):
+        url = reverse('recipe-list')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        last_modified = response['Last-Modified']
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
 
     def test_get_nonexistent_recipe(self):
         url = reverse('recipe-detail', kwargs={'pk': 789})
@@ -464,6 +755,7 @@ class RecipesTests(APITestCase):
                          'id': recipe.id,
                          'title': recipe.title,
                          'instructions': recipe.instructions,
+                         'servings': recipe.servings,
                          'published': recipe.published.replace(tzinfo=None).isoformat() + 'Z',
                          'updated': recipe.updated.replace(tzinfo=None).isoformat() + 'Z',
                          'category_title': recipe.category.title,
@@ -542,6 +834,7 @@ class RecipesTests(APITestCase):
                          'id': recipe.id,
                          'title': recipe.title,
                          'instructions': recipe.instructions,
+                         'servings': recipe.servings,
                          'published': recipe.published.replace(tzinfo=None).isoformat() + 'Z',
                          'updated': recipe.updated.replace(tzinfo=None).isoformat() + 'Z',
                          'category_title': recipe.category.title,
@@ -795,6 +1088,64 @@ class IngredientsTests(APITestCase):
                                                'quantity': 2}, format='json')
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
 
+    # POST bulk
+    def test_recipe_author_posts_bulk_ingredients(self):
+        recipe = Recipe.objects.filter(title='Pasta 1').first()
+        token = AccessToken.for_user(recipe.author)
+        self.client.credentials(HTTP_AUTHORIZATION='JWT ' + str(token))
+        url = reverse('recipe-ingredient-bulk',
+                      kwargs={'recipe_pk': recipe.id})
+        response = self.client.post(url, data=[{'name': 'Salt', 'quantity': 5, 'units_of_measurement': 'gm'},
+                                               {'name': 'Pepper', 'quantity': 2}],
+                                    format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(sorted(ingredient['name'] for ingredient in response.data),
+                         ['pepper', 'salt'])
+        self.assertEqual(Ingredient.objects.filter(recipe=recipe).count(), 4)
+        self.assertEqual(Ingredient.objects.get(recipe=recipe, name='salt').slug, 'salt')
+
+    def test_recipe_author_posts_bulk_ingredients_with_repeated_names(self):
+        recipe = Recipe.objects.filter(title='Pasta 1').first()
+        token = AccessToken.for_user(recipe.author)
+        self.client.credentials(HTTP_AUTHORIZATION='JWT ' + str(token))
+        url = reverse('recipe-ingredient-bulk',
+                      kwargs={'recipe_pk': recipe.id})
+        response = self.client.post(url, data=[{'name': 'Eggs', 'quantity': 1},
+                                               {'name': 'Salt', 'quantity': 5},
+                                               {'name': 'salt', 'quantity': 2}],
+                                    format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data[0]['name'][0],
+                         "Ingredient with name 'eggs' already exists for this recipe.")
+        self.assertEqual(response.data[1], {})
+        self.assertEqual(response.data[2]['name'][0],
+                         "Ingredient with name 'salt' is repeated in the list.")
+        self.assertEqual(Ingredient.objects.filter(recipe=recipe).count(), 2)
+
+    def test_recipe_author_replaces_ingredients_with_bulk(self):
+        recipe = Recipe.objects.filter(title='Pasta 1').first()
+        token = AccessToken.for_user(recipe.author)
+        self.client.credentials(HTTP_AUTHORIZATION='JWT ' + str(token))
+        url = reverse('recipe-ingredient-bulk',
+                      kwargs={'recipe_pk': recipe.id})
+        response = self.client.put(url, data=[{'name': 'Eggs', 'quantity': 4}],
+                                   format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        ingredients = Ingredient.objects.filter(recipe=recipe)
+        self.assertEqual([(ingredient.name, ingredient.quantity) for ingredient in ingredients],
+                         [('eggs', 4)])
+
+    def test_logged_user_without_permission_posts_bulk_ingredients(self):
+        recipe = Recipe.objects.filter(title='Pasta 1').first()
+        user = CustomUser.objects.filter(username='user2').first()
+        token = AccessToken.for_user(user)
+        self.client.credentials(HTTP_AUTHORIZATION='JWT ' + str(token))
+        url = reverse('recipe-ingredient-bulk',
+                      kwargs={'recipe_pk': recipe.id})
+        response = self.client.post(url, data=[{'name': 'Salt', 'quantity': 5}],
+                                    format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
     # PUT
     def test_logged_user_updates_ingredient_with_not_unique_name(self):
         recipe = Recipe.objects.filter(title='Pasta 1').first()
@@ -858,6 +1209,20 @@ class IngredientsTests(APITestCase):
         }
         self.assertEqual(response.data, expected_data)
 
+    def test_logged_user_partially_updates_ingredient(self):
+        recipe = Recipe.objects.filter(title='Pasta 1').first()
+        ingredient = Ingredient.objects.filter(
+            Q(recipe=recipe) & Q(name='cheese')).first()
+        user = CustomUser.objects.filter(username='user1').first()
+        token = AccessToken.for_user(user)
+        self.client.credentials(HTTP_AUTHORIZATION='JWT ' + str(token))
+        url = reverse('recipe-ingredient-detail', kwargs={'recipe_pk': recipe.id,
+                                                          'pk': ingredient.id})
+        response = self.client.patch(url, data={'quantity': 35}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['name'], 'cheese')
+        self.assertEqual(response.data['quantity'], '35.00')
+
     def test_logged_user_updates_nonexistent_ingredient(self):
         user = CustomUser.objects.filter(username='user1').first()
         recipe = Recipe.objects.filter(title='Pasta 1').first()
@@ -1045,7 +1410,10 @@ class RecipeImagesTests(APITestCase):
             'image': image_path_on_test_server,
             'recipe_title': recipe.title,
             'recipe': test_server_prefix + reverse('recipe-detail',
-                                                   kwargs={'pk': recipe.id})
+                                                   kwargs={'pk': recipe.id}),
+            'width': None,
+            'height': None,
+            'variants': {}
         }
         self.assertEqual(response.data, expected_data)
 
@@ -1097,7 +1465,10 @@ class RecipeImagesTests(APITestCase):
             'image': test_server_prefix + '/media/' + str(image.image),
             'recipe_title': recipe.title,
             'recipe': test_server_prefix + reverse('recipe-detail',
-                                                   kwargs={'pk': recipe.id})
+                                                   kwargs={'pk': recipe.id}),
+            'width': None,
+            'height': None,
+            'variants': {}
         }
         self.assertEqual(response.data, expected_data)
 
@@ -1297,6 +1668,31 @@ class ReviewsTests(APITestCase):
                          }
         self.assertEqual(response.data, expected_data)
 
+    def test_get_review_detail_loads_recipe_once(self):
+        recipe = Recipe.objects.filter(title='Pasta 1').first()
+        review = Review.objects.filter(author__username='user2').first()
+        url = reverse('recipe-review-detail',
+                      kwargs={'recipe_pk': recipe.id,
+                              'pk': review.id})
+        # One query for recipe from url, one for validators
+        # of conditional GET and one for review itself
+        with self.assertNumQueries(3):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_get_review_list_not_modified(self):
+        recipe = Recipe.objects.filter(title='Pasta 1').first()
+        url = reverse('recipe-review-list',
+                      kwargs={'recipe_pk': recipe.id})
+        response = self.client.get(url)
+        etag = response['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        user = CustomUser.objects.filter(username='user1').first()
+        Review.objects.create(recipe=recipe, author=user, content='Nice')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
     def test_get_nonexistent_review_detail(self):
         recipe = Recipe.objects.filter(title='Pasta 1').first()
         url = reverse('recipe-review-detail',
@@ -1886,6 +2282,43 @@ class RatingsTests(APITestCase):
         response = self.client.delete(url)
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
 
+    def test_rating_aggregates_of_recipe(self):
+        recipe = Recipe.objects.filter(title='Pasta 1').first()
+        self.assertEqual(recipe.rating_count, 1)
+        self.assertEqual(recipe.rating_sum, 9)
+        self.assertEqual(recipe.rating_average, 9.0)
+
+    def test_rating_aggregates_after_post_update_and_delete(self):
+        recipe = Recipe.objects.filter(title='Pasta 1').first()
+        user = CustomUser.objects.filter(username='user1').first()
+        token = AccessToken.for_user(user)
+        self.client.credentials(HTTP_AUTHORIZATION='JWT ' + str(token))
+        url = reverse('recipe-rating-list',
+                      kwargs={'recipe_pk': recipe.id})
+        response = self.client.post(url, data={'value': 4}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.rating_count, 2)
+        self.assertEqual(recipe.rating_sum, 13)
+        self.assertEqual(recipe.rating_average, 6.5)
+
+        url = reverse('recipe-rating-detail',
+                      kwargs={'recipe_pk': recipe.id,
+                              'pk': response.data['id']})
+        response = self.client.put(url, data={'value': 7}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.rating_count, 2)
+        self.assertEqual(recipe.rating_sum, 16)
+        self.assertEqual(recipe.rating_average, 8.0)
+
+        response = self.client.delete(url)
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.rating_count, 1)
+        self.assertEqual(recipe.rating_sum, 9)
+        self.assertEqual(recipe.rating_average, 9.0)
+
     def test_logged_user_deletes_nonexistent_rating(self):
         recipe = Recipe.objects.filter(title='Pasta 1').first()
         user = CustomUser.objects.filter(username='user1').first()
@@ -1957,6 +2390,9 @@ class AuthorsTests(APITestCase):
             'id': author.id,
             'username': author.username,
             'image': None,
+            'recipe_count': author.recipe_count,
+            'review_count': author.review_count,
+            'rating_count': author.rating_count,
             'get_recipes': test_server_prefix + reverse('author-get-recipes',
                                                         kwargs={'pk': author.id})
         }
@@ -1980,7 +2416,7 @@ class AuthorsTests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         number_of_recipes_by_author = Recipe.objects.filter(
             author=author).count()
-        self.assertEqual(len(response.data),
+        self.assertEqual(len(response.data['results']),
                          number_of_recipes_by_author)
 
     def test_nonexistent_author_detail(self):
@@ -0,0 +1,124 @@
+import time
+from io import BytesIO
+from django.conf import settings
+from django.core.files.uploadhandler import FileUploadHandler
+from PIL import Image
+from rest_framework.exceptions import ValidationError
+from recipes.exceptions import RequestEntityTooLarge, RequestTimeout
+
+
+UPLOAD_LIMITS = {
+    'FORMATS': ['JPEG', 'PNG', 'WEBP', 'GIF'],
+    # Images with more pixels are rejected before they are decoded,
+    # as small compressed file can expand to gigabytes in memory
+    'MAX_PIXELS': 40_000_000,
+    'MAX_SIDE': 10_000,
+    # Bytes from the start of file, in which header of image must be found
+    'SNIFF_SIZE': 256 * 1024,
+    # Bytes of request body that are allowed in addition to files
+    'FORM_SIZE': 64 * 1024,
+    # Seconds in which whole body must be received
+    'MAX_SECONDS': 60,
+}
+
+INVALID_IMAGE_MESSAGE = 'Upload a valid image. The file you uploaded was either not an image or a corrupted image.'
+
+
+def get_upload_limits_settings():
+    return {**UPLOAD_LIMITS, **getattr(settings, 'UPLOAD_LIMITS', {})}
+
+
+class LimitedImageUploadHandler(FileUploadHandler):
+    # Is put before upload handlers of Django and checks every chunk of
+    # multipart body before it is stored in memory or in temporary file,
+    # so request is rejected as soon as limit is exceeded or header of
+    # image turns out to be invalid, instead of after the whole upload
+    def __init__(self, request=None, field_limits=None):
+        super().__init__(request)
+        self.field_limits = field_limits or {}
+        self.limits = get_upload_limits_settings()
+        self.started = time.monotonic()
+
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        self.started = time.monotonic()
+        max_content_length = sum(self.field_limits.values()) + self.limits['FORM_SIZE']
+        if content_length > max_content_length:
+            raise RequestEntityTooLarge()
+        return None
+
+    def new_file(self, field_name, *args, **kwargs):
+        super().new_file(field_name, *args, **kwargs)
+        if field_name not in self.field_limits:
+            raise ValidationError(
+                detail={field_name: ['Files cannot be uploaded in this field.']}
+            )
+        self.check_size(self.content_length or 0)
+        self.header = b''
+        self.identified = False
+
+    def receive_data_chunk(self, raw_data, start):
+        self.check_time()
+        self.check_size(start + len(raw_data))
+        if not self.identified:
+            self.header += raw_data
+            self.identified = self.sniff(
+                final=len(self.header) >= self.limits['SNIFF_SIZE']
+            )
+        return raw_data
+
+    def file_complete(self, file_size):
+        if not self.identified:
+            self.sniff(final=True)
+        # File itself is created by the next handler
+        return None
+
+    def check_size(self, size):
+        max_size = self.field_limits[self.field_name]
+        if size > max_size:
+            raise RequestEntityTooLarge(
+                detail=f'Files cannot be larger than {max_size // 1024}KB'
+            )
+
+    def check_time(self):
+        if time.monotonic() - self.started > self.limits['MAX_SECONDS']:
+            raise RequestTimeout()
+
+    def sniff(self, final):
+        # Returns True when header of image was read and accepted,
+        # only format and size are read by Pillow, pixels are not decoded
+        try:
+            with Image.open(BytesIO(self.header)) as image:
+                image_format = image.format
+                width, height = image.size
+        except Image.DecompressionBombError:
+            self.reject('Image has too many pixels.')
+        except Exception:
+            # Header may be incomplete until more chunks are received
+            if final:
+                self.reject(INVALID_IMAGE_MESSAGE)
+            return False
+        if image_format not in self.limits['FORMATS']:
+            self.reject(f'Images in {image_format} format are not accepted.')
+        if width > self.limits['MAX_SIDE'] or height > self.limits['MAX_SIDE'] or \
+                width * height > self.limits['MAX_PIXELS']:
+            self.reject('Image has too many pixels.')
+        self.header = b''
+        return True
+
+    def reject(self, message):
+        raise ValidationError(detail={self.field_name: [message]})
+
+
+class UploadLimitsMixin:
+    # Maximum sizes in bytes of image fields accepted by view, files
+    # in other fields are rejected
+    upload_limits = {}
+
+    def initialize_request(self, request, *args, **kwargs):
+        # Handlers can be changed only before body is parsed
+        if self.upload_limits:
+            request.upload_handlers = [
+                LimitedImageUploadHandler(request, self.upload_limits),
+                *request.upload_handlers
+            ]
+        return super().initialize_request(request, *args, **kwargs)
@@ -1,8 +1,12 @@
 from django.core.exceptions import ValidationError
 
 
+# About 10MB, limit of uploads too(see RecipeImageViewSet)
+MAX_IMAGE_KB_SIZE = 10000
+
+
 def validate_file_size(file):
-    max_kb_size = 1000000
+    max_kb_size = MAX_IMAGE_KB_SIZE
 
     if file.size > max_kb_size * 1024:
         raise ValidationError(f'Files cannot be larger than {max_kb_size}KB')
@@ -1,5 +1,10 @@
-from django.db.models import Avg
+from collections import Counter
+from django.db import transaction
+from django.db.models import Prefetch, FloatField
+from django.db.models.functions import Cast
 from django.db.models.query_utils import Q
+from django.http import Http404
+from django.template.defaultfilters import slugify
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import viewsets, mixins
 from rest_framework import filters
@@ -8,24 +13,232 @@ from rest_framework.parsers import MultiPartParser, FormParser
 from rest_framework.decorators import action
 from rest_framework.exceptions import NotFound, MethodNotAllowed, ValidationError
 from rest_framework.response import Response
+from rest_framework.reverse import reverse
 from rest_framework.permissions import IsAuthenticatedOrReadOnly, SAFE_METHODS
-from recipes.models import Category, Recipe, Ingredient, RecipeImage, Review, Rating
+from recipes.models import Category, Recipe, CanonicalIngredient, Ingredient, RecipeImage, Review, Rating, \
+    HISTOGRAM_FIELDS
 from recipes.serializers import CategorySerializer, RecipeSerializer, CreateUpdateRecipeSerializer,\
-    IngredientSerializer, CreateUpdateIngredientSerializer, RecipeImageSerializer, ReviewSerializer,\
-    RatingSerializer, AuthorSerializer
+    LeaderboardRecipeSerializer, IngredientMatchRecipeSerializer, IngredientSerializer, CreateUpdateIngredientSerializer, RecipeImageSerializer, ReviewSerializer,\
+    RatingSerializer, AuthorSerializer, AuthorAutocompleteSerializer
 from recipes.permissions import IsAdminOrReadOnly, IsAuthorOrReadOnly, IsRecipeAuthorOrReadOnly, \
     NestedIsAuthenticatedOrReadOnly, NestedIsAuthorOrReadOnly
 from recipes.exceptions import ConflictException
-from users.models import CustomUser
-
-
-class CategoryViewSet(viewsets.ModelViewSet):
+from recipes.pagination import PageNumberOrCursorPagination
+from recipes.filters import RecipeSearchFilter
+from recipes.streaming import stream_serialized_list
+from recipes.cache import ResponseCacheMixin, invalidate_tags
+from recipes.conditional import ConditionalGetMixin
+from recipes.async_views import AsyncReadMixin, gather_queries, set_prefetched_objects
+from recipes.uploads import UploadLimitsMixin
+from recipes.metrics import SerializerMetricsMixin, get_serialized_data
+from recipes.leaderboard import get_leaderboard_settings
+from recipes.autocomplete import get_autocomplete_settings, prefix_range
+from recipes.ingredient_index import get_ingredient_index_settings, ingredient_index
+from recipes.scaling import get_scaling_settings, convert, combine, ORIGINAL_UNITS, UNIT_SYSTEMS
+from recipes.validators import MAX_IMAGE_KB_SIZE
+from users.models import CustomUser, fold_username
+
+
+class SubCollectionMixin:
+    # Returns collections of related objects from actions either paginated
+    # (by page number or by cursor) or, if client asks for it
+    # with '?stream=true', streamed as one JSON array
+    stream_query_param = 'stream'
+
+    def get_sub_collection_response(self, queryset, serializer_class, ordering):
+        queryset = queryset.order_by(*ordering)
+        context = {'request': self.request}
+        if self.request.query_params.get(self.stream_query_param) == 'true':
+            return stream_serialized_list(queryset, serializer_class, context)
+        paginator = PageNumberOrCursorPagination(ordering=ordering)
+        page = paginator.paginate_queryset(queryset, self.request)
+        serializer = serializer_class(page, many=True, context=context)
+        return paginator.get_paginated_response(get_serialized_data(serializer))
+
+
+def get_limit(request, limit_query_param, default_limit, max_limit):
+    value = request.query_params.get(limit_query_param)
+    if value is None:
+        return default_limit
+    try:
+        limit = int(value)
+    except ValueError:
+        limit = 0
+    if not 0 < limit <= max_limit:
+        raise ValidationError(
+            detail=f"Limit must be a number from 1 to {max_limit}.")
+    return limit
+
+
+class LeaderboardMixin:
+    # Returns top of recipes ranked by rating_score with '?limit=', scores
+    # are stored on recipes, so top is read from index on score
+    limit_query_param = 'limit'
+
+    def get_leaderboard_limit(self):
+        leaderboard_settings = get_leaderboard_settings()
+        return get_limit(self.request, self.limit_query_param,
+                         leaderboard_settings['DEFAULT_LIMIT'],
+                         leaderboard_settings['MAX_LIMIT'])
+
+    def get_leaderboard_response(self, recipes):
+        limit = self.get_leaderboard_limit()
+        # Recipes without ratings have no score
+        recipes = list(recipes.select_related('author', 'category').
+                       filter(rating_score__isnull=False).
+                       order_by('-rating_score', '-id')[:limit])
+        for rank, recipe in enumerate(recipes, start=1):
+            recipe.rank = rank
+        serializer = LeaderboardRecipeSerializer(recipes, many=True,
+                                                 context={'request': self.request})
+        return Response(get_serialized_data(serializer))
+
+
+class ScalingMixin:
+    # Returns ingredients of recipes scaled by '?factor=' or to '?servings='
+    # and converted to '?units=' (metric or imperial). Quantities of all
+    # recipes are loaded with one query and converted as columns at once.
+    ids_query_param = 'ids'
+    factor_query_param = 'factor'
+    servings_query_param = 'servings'
+    units_query_param = 'units'
+
+    def get_scaling(self, unit_systems=(ORIGINAL_UNITS, *UNIT_SYSTEMS), default_units=ORIGINAL_UNITS):
+        params = self.request.query_params
+        unit_system = params.get(self.units_query_param, default_units)
+        if unit_system not in unit_systems:
+            raise ValidationError(detail=f"Units must be one of: {', '.join(unit_systems)}.")
+        factor = params.get(self.factor_query_param)
+        servings = params.get(self.servings_query_param)
+        if factor is not None and servings is not None:
+            raise ValidationError(detail='Provide either factor or servings, not both.')
+        try:
+            factor = float(factor) if factor is not None else None
+            servings = int(servings) if servings is not None else None
+        except ValueError:
+            raise ValidationError(detail='Factor and servings must be numbers.')
+        if (factor is not None and not factor > 0) or (servings is not None and servings < 1):
+            raise ValidationError(detail='Factor and servings must be greater than 0.')
+        return factor, servings, unit_system
+
+    def get_recipe_ids(self, max_recipes):
+        # Ids of recipes from '?ids=' (comma separated)
+        value = self.request.query_params.get(self.ids_query_param, '')
+        try:
+            recipe_ids = list(dict.fromkeys(int(recipe_id) for recipe_id in value.split(',')
+                                            if recipe_id.strip()))
+        except ValueError:
+            raise ValidationError(detail='Ids must be comma separated numbers.')
+        if not recipe_ids:
+            raise ValidationError(detail='Provide ids of recipes, e.g. ?ids=1,2,3.')
+        if len(recipe_ids) > max_recipes:
+            raise ValidationError(detail=f"More than {max_recipes} recipes cannot be given at once.")
+        return recipe_ids
+
+    def get_factors(self, recipe_ids, factor, servings):
+        # Returns recipes and factor every recipe is scaled by
+        max_factor = get_scaling_settings()['MAX_FACTOR']
+        recipes = Recipe.objects.only('id', 'title', 'servings').in_bulk(recipe_ids)
+        missing = [str(recipe_id) for recipe_id in recipe_ids if recipe_id not in recipes]
+        if missing:
+            raise NotFound(detail=f"Recipes {', '.join(missing)} do not exist.")
+
+        factors = {}
+        for recipe_id, recipe in recipes.items():
+            if servings is None:
+                factors[recipe_id] = 1.0 if factor is None else factor
+            elif recipe.servings:
+                factors[recipe_id] = servings / recipe.servings
+            else:
+                raise ValidationError(
+                    detail=f"Recipe {recipe_id} has no servings, it can be scaled only by factor.")
+            if factors[recipe_id] > max_factor:
+                raise ValidationError(detail=f"Recipes cannot be scaled more than {max_factor} times.")
+        return recipes, factors
+
+    def get_scaled_recipes(self, recipe_ids):
+        factor, servings, unit_system = self.get_scaling()
+        recipes, factors = self.get_factors(recipe_ids, factor, servings)
+
+        # Quantities are read as floats, so no Decimal is made for every row
+        rows = Ingredient.objects.filter(recipe_id__in=recipe_ids).\
+            order_by('recipe_id', 'name', 'id').\
+            values_list('recipe_id', 'id', 'name', Cast('quantity', FloatField()),
+                        'units_of_measurement')
+        recipe_column, ids, names, quantities, units = list(zip(*rows)) or [()] * 5
+        quantities, units = convert(quantities, units,
+                                    [factors[recipe_id] for recipe_id in recipe_column],
+                                    unit_system)
+
+        ingredients = {recipe_id: [] for recipe_id in recipe_ids}
+        for recipe_id, ingredient_id, name, quantity, unit in \
+                zip(recipe_column, ids, names, quantities, units):
+            ingredients[recipe_id].append({'id': ingredient_id, 'name': name,
+                                           'quantity': quantity, 'units_of_measurement': unit})
+        results = []
+        for recipe_id in recipe_ids:
+            recipe = recipes[recipe_id]
+            scaled_servings = servings
+            if scaled_servings is None and recipe.servings:
+                scaled_servings = round(recipe.servings * factors[recipe_id], 2)
+            results.append({
+                'url': reverse('recipe-detail', kwargs={'pk': recipe_id}, request=self.request),
+                'id': recipe_id,
+                'title': recipe.title,
+                'servings': scaled_servings,
+                'factor': factors[recipe_id],
+                'units': unit_system,
+                'ingredients': ingredients[recipe_id],
+            })
+        return results
+
+    def get_shopping_list(self, recipe_ids):
+        factor, servings, unit_system = self.get_scaling(unit_systems=UNIT_SYSTEMS,
+                                                         default_units='metric')
+        _, factors = self.get_factors(recipe_ids, factor, servings)
+        rows = Ingredient.objects.filter(recipe_id__in=recipe_ids).order_by().\
+            values_list('recipe_id', 'canonical_id', 'canonical__name',
+                        Cast('quantity', FloatField()), 'units_of_measurement')
+        recipe_column, canonical_ids, names, quantities, units = list(zip(*rows)) or [()] * 5
+        items = combine(canonical_ids, quantities, units,
+                        [factors[recipe_id] for recipe_id in recipe_column], unit_system)
+        names = dict(zip(canonical_ids, names))
+        # Number of recipes that need every ingredient
+        recipe_counts = Counter(canonical_id for canonical_id, _ in
+                                set(zip(canonical_ids, recipe_column)))
+        return {
+            'recipes': recipe_ids,
+            'units': unit_system,
+            'items': sorted(({'name': names[canonical_id], 'quantity': quantity,
+                              'units_of_measurement': unit,
+                              'recipe_count': recipe_counts[canonical_id]}
+                             for canonical_id, quantity, unit in items),
+                            key=lambda item: (item['name'], item['units_of_measurement'] or '')),
+        }
+
+
+class CategoryViewSet(SerializerMetricsMixin, ResponseCacheMixin, AsyncReadMixin, SubCollectionMixin,
+                      LeaderboardMixin, viewsets.ModelViewSet):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
     permission_classes = [IsAdminOrReadOnly]
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
     search_fields = ['title', 'slug']
-    ordering_fields = ['title', 'slug']
+    ordering_fields = ['title', 'slug', 'recipe_count']
+    cache_tags = {
+        'list': ['category'],
+        'retrieve': ['category:{pk}'],
+        'get_recipes': ['category:{pk}', 'recipe'],
+        'leaderboard': ['category:{pk}', 'recipe', 'rating'],
+    }
+    item_tags = {
+        'list': ['category:{id}'],
+        'get_recipes': ['recipe:{id}', 'author:{author_id}'],
+        'leaderboard': ['recipe:{id}', 'author:{author_id}'],
+    }
+    item_models = {'get_recipes': Recipe, 'leaderboard': Recipe}
+    ordering_tags = {'recipe_count': 'recipe'}
+    async_actions = ['list', 'retrieve', 'get_recipes']
 
     def destroy(self, request, *args, **kwargs):
         if Recipe.objects.filter(category_id=self.kwargs['pk']):
@@ -39,19 +252,144 @@ class CategoryViewSet(viewsets.ModelViewSet):
         recipes = Recipe.objects.\
             select_related('category', 'author').\
             filter(category=category).all()
-        if request.method == 'GET':
-            serializer = RecipeSerializer(
-                recipes, many=True, context={'request': request})
-            return Response(serializer.data)
+        return self.get_sub_collection_response(recipes, RecipeSerializer,
+                                                ordering=['title', 'id'])
 
+    async def aget_recipes(self, request, *args, **kwargs):
+        recipes = Recipe.objects.select_related('category', 'author')
+        return await self.aget_sub_collection_response(recipes, 'category', RecipeSerializer,
+                                                       ordering=['title', 'id'])
+
+    @action(detail=True, methods=['GET', 'HEAD', 'OPTIONS'])
+    def leaderboard(self, request, *args, **kwargs):
+        category = self.get_object()
+        return self.get_leaderboard_response(Recipe.objects.filter(category=category))
 
-class RecipeViewSet(viewsets.ModelViewSet):
+
+class RecipeViewSet(SerializerMetricsMixin, ConditionalGetMixin, ResponseCacheMixin, AsyncReadMixin,
+                    SubCollectionMixin, LeaderboardMixin, ScalingMixin, viewsets.ModelViewSet):
     queryset = Recipe.objects.select_related('author', 'category').all()
     permission_classes = [IsAuthenticatedOrReadOnly, IsAuthorOrReadOnly]
-    filter_backends = [filters.SearchFilter, filters.OrderingFilter]
-    search_fields = ['title', 'slug', 'instructions',
-                     'category__title', 'author__username']
-    ordering_fields = ['title', 'slug', 'category__title', 'author__username']
+    # Search goes after ordering, so that recipes found
+    # are ranked by relevance when no ordering was requested
+    filter_backends = [filters.OrderingFilter, RecipeSearchFilter]
+    ordering_fields = ['title', 'slug', 'category__title', 'author__username',
+                       'rating_count', 'rating_sum', 'rating_average', 'rating_score']
+    ordering = ['title', 'id']
+    pagination_class = PageNumberOrCursorPagination
+    # published of recipe is nullable and rating counters are not indexed
+    # and mostly equal, so they cannot be position of cursor
+    cursor_ordering_fields = ['title']
+    expand_param = 'expand'
+    # Sub-resources that can be embedded into recipe with '?expand=',
+    # each of them is loaded with one query for the whole page of recipes
+    expand_prefetches = {
+        'ingredients': Prefetch('ingredients'),
+        'images': Prefetch('images'),
+        'reviews': Prefetch('reviews',
+                            queryset=Review.objects.select_related('author').
+                            order_by('-published', '-id'),
+                            to_attr='latest_reviews'),
+        'rating_summary': None,
+        'rating_histogram': None,
+    }
+    # Most objects embedded into every recipe, all of them are listed
+    # by get_<name> action, e.g. latest reviews are embedded and get_reviews lists all
+    expand_limits = {'reviews': 5}
+    cache_tags = {
+        'list': ['recipe'],
+        'retrieve': ['recipe:{pk}'],
+        'get_ingredients': ['recipe:{pk}'],
+        'get_reviews': ['recipe:{pk}'],
+        'get_ratings': ['recipe:{pk}'],
+        'get_average_rating': ['recipe:{pk}'],
+        'get_rating_histogram': ['recipe:{pk}'],
+        'get_images': ['recipe:{pk}'],
+        'leaderboard': ['recipe', 'rating'],
+        'cook_with': ['recipe', 'ingredient'],
+        'scale': ['recipe:{pk}'],
+        'scale_many': ['recipe'],
+        'shopping_list': ['recipe'],
+    }
+    # Recipes show username of author and title of category,
+    # so they are tagged with the author and category they show
+    item_tags = {
+        'list': ['recipe:{id}', 'author:{author_id}', 'category:{category_id}'],
+        'retrieve': ['recipe:{id}', 'author:{author_id}', 'category:{category_id}'],
+        'get_reviews': ['author:{author_id}'],
+        'get_ratings': ['author:{author_id}'],
+        'leaderboard': ['recipe:{id}', 'author:{author_id}', 'category:{category_id}'],
+        'cook_with': ['recipe:{id}', 'author:{author_id}', 'category:{category_id}'],
+        'scale_many': ['recipe:{id}'],
+        'shopping_list': ['recipe:{id}'],
+    }
+    item_models = {'get_reviews': Review, 'get_ratings': Rating}
+    ordering_tags = {'rating_count': 'rating', 'rating_sum': 'rating',
+                     'rating_average': 'rating', 'rating_score': 'rating'}
+    ingredients_query_param = 'ingredients'
+    match_query_param = 'match'
+    # Author's username and category's title are shown in recipe
+    validator_relations = ['author', 'category']
+    validator_fields = ['rating_updated']
+    async_actions = ['list', 'retrieve', 'get_ingredients', 'get_reviews',
+                     'get_ratings', 'get_average_rating', 'get_rating_histogram', 'get_images']
+
+    def get_item_ids(self, data):
+        if self.action == 'shopping_list':
+            return data['recipes']
+        return super().get_item_ids(data)
+
+    def get_item_tags(self, data):
+        tags = super().get_item_tags(data)
+        # Reviews embedded with '?expand=' show usernames of their authors
+        review_ids = [review['id'] for item in self.get_items(data) if isinstance(item, dict)
+                      for review in item.get('reviews', [])]
+        if review_ids:
+            author_ids = Review.objects.filter(id__in=review_ids).\
+                values_list('author_id', flat=True).order_by().distinct()
+            tags += [f'author:{author_id}' for author_id in author_ids
+                     if f'author:{author_id}' not in tags]
+        return tags
+
+    def get_expand(self):
+        if self.action not in ('list', 'retrieve'):
+            return []
+        value = self.request.query_params.get(self.expand_param, '')
+        expand = [name.strip() for name in value.split(',') if name.strip()]
+        unknown = [name for name in expand if name not in self.expand_prefetches]
+        if unknown:
+            raise ValidationError(
+                detail=f"Cannot expand {', '.join(unknown)}, "
+                f"available values are: {', '.join(self.expand_prefetches)}.")
+        return expand
+
+    def get_expand_prefetches(self):
+        prefetches = {}
+        for name in self.get_expand():
+            prefetch = self.expand_prefetches[name]
+            if prefetch is None:
+                continue
+            if name in self.expand_limits:
+                # Sliced prefetch is loaded with one query for all recipes too,
+                # it can only be stored in list of to_attr
+                prefetch = Prefetch(prefetch.prefetch_through,
+                                    queryset=prefetch.queryset[:self.expand_limits[name]],
+                                    to_attr=prefetch.to_attr)
+            prefetches[name] = prefetch
+        return prefetches
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        return queryset.prefetch_related(*self.get_expand_prefetches().values())
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['expand'] = self.get_expand()
+        return context
+
+    def uses_conditional_get(self):
+        # Embedded objects are not covered by validators of recipe
+        return super().uses_conditional_get() and not self.get_expand()
 
     def perform_create(self, serializer):
         serializer.save(author_id=self.request.user.id)
@@ -62,17 +400,79 @@ class RecipeViewSet(viewsets.ModelViewSet):
         else:
             return CreateUpdateRecipeSerializer
 
+    @action(detail=False, methods=['GET', 'HEAD', 'OPTIONS'])
+    def leaderboard(self, request, *args, **kwargs):
+        return self.get_leaderboard_response(Recipe.objects.all())
+
+    @action(detail=False, methods=['GET', 'HEAD', 'OPTIONS'])
+    def cook_with(self, request, *args, **kwargs):
+        # Recipes that can be cooked with '?ingredients=' (comma separated slugs),
+        # ranked by share of their ingredients that are given. With '?match=all'
+        # only recipes that have all of the ingredients are returned.
+        index_settings = get_ingredient_index_settings()
+        value = request.query_params.get(self.ingredients_query_param, '')
+        slugs = [slug for slug in dict.fromkeys(slugify(name) for name in value.split(',')) if slug]
+        if not slugs:
+            raise ValidationError(detail='Provide ingredients, e.g. ?ingredients=eggs,flour,milk.')
+        if len(slugs) > index_settings['MAX_INGREDIENTS']:
+            raise ValidationError(
+                detail=f"More than {index_settings['MAX_INGREDIENTS']} ingredients cannot be given.")
+        match = request.query_params.get(self.match_query_param, 'any')
+        if match not in ('any', 'all'):
+            raise ValidationError(detail="Match must be 'any' or 'all'.")
+        limit = get_limit(request, self.limit_query_param,
+                          index_settings['DEFAULT_LIMIT'], index_settings['MAX_LIMIT'])
+
+        # Names that are not in dictionary of ingredients are not in any recipe
+        canonical_ids = CanonicalIngredient.resolve(slugs, create=False)
+        if match == 'all' and len(canonical_ids) < len(slugs):
+            return Response([])
+        slugs_by_id = {}
+        for slug in slugs:
+            if slug in canonical_ids:
+                slugs_by_id.setdefault(canonical_ids[slug], slug)
+        matches = ingredient_index.search(slugs_by_id, limit, match_all=match == 'all')
+        recipes = Recipe.objects.select_related('author', 'category').\
+            in_bulk([match['recipe_id'] for match in matches])
+        results = []
+        for match in matches:
+            # Recipe could be deleted after index was read
+            recipe = recipes.get(match['recipe_id'])
+            if recipe is not None:
+                recipe.matched_ingredients = [slugs_by_id[canonical_id]
+                                              for canonical_id in match['matched_ingredients']]
+                recipe.coverage = match['coverage']
+                results.append(recipe)
+        serializer = IngredientMatchRecipeSerializer(results, many=True,
+                                                     context={'request': request})
+        return Response(get_serialized_data(serializer))
+
+    @action(detail=True, methods=['GET', 'HEAD', 'OPTIONS'])
+    def scale(self, request, *args, **kwargs):
+        recipe = self.get_object()
+        return Response(self.get_scaled_recipes([recipe.pk])[0])
+
+    @action(detail=False, methods=['GET', 'HEAD', 'OPTIONS'])
+    def scale_many(self, request, *args, **kwargs):
+        # Recipes of '?ids=' (comma separated) scaled the same way, e.g. for meal plans
+        recipe_ids = self.get_recipe_ids(get_scaling_settings()['MAX_RECIPES'])
+        return Response(self.get_scaled_recipes(recipe_ids))
+
+    @action(detail=False, methods=['GET', 'HEAD', 'OPTIONS'])
+    def shopping_list(self, request, *args, **kwargs):
+        # Ingredients of recipes of '?ids=' merged by canonical ingredient,
+        # recipes can be scaled as by scale_many
+        recipe_ids = self.get_recipe_ids(get_scaling_settings()['MAX_SHOPPING_LIST_RECIPES'])
+        return Response(self.get_shopping_list(recipe_ids))
+
     @action(detail=True, methods=['GET', 'HEAD', 'OPTIONS'])
     def get_ingredients(self, request, *args, **kwargs):
         recipe = self.get_object()
         ingredients = Ingredient.objects.\
             select_related('recipe').filter(
                 recipe=recipe).all()
-        if request.method == 'GET':
-            serializer = IngredientSerializer(ingredients,
-                                              many=True,
-                                              context={'request': request})
-            return Response(serializer.data)
+        return self.get_sub_collection_response(ingredients, IngredientSerializer,
+                                                ordering=['name', 'id'])
 
     @action(detail=True,  methods=['GET', 'HEAD', 'OPTIONS'])
     def get_reviews(self, request, *args, **kwargs):
@@ -81,32 +481,33 @@ class RecipeViewSet(viewsets.ModelViewSet):
             select_related('recipe', 'author').filter(
                 recipe=recipe
             ).all()
-        if request.method == 'GET':
-            serializer = ReviewSerializer(
-                reviews, many=True,
-                context={'request': request}
-            )
-            return Response(serializer.data)
+        return self.get_sub_collection_response(reviews, ReviewSerializer,
+                                                ordering=['-published', '-id'])
 
     @action(detail=True, methods=['GET', 'HEAD', 'OPTIONS'])
     def get_ratings(self, request, *args, **kwargs):
         recipe = self.get_object()
         ratings = Rating.objects.\
             filter(recipe=recipe).select_related('author', 'recipe').all()
-        if request.method == 'GET':
-            serializer = RatingSerializer(
-                ratings, many=True,
-                context={'request': request}
-            )
-            return Response(serializer.data)
+        return self.get_sub_collection_response(ratings, RatingSerializer,
+                                                ordering=['-published', '-id'])
 
     @action(detail=True,  methods=['GET', 'HEAD', 'OPTIONS'])
     def get_average_rating(self, request, *args, **kwargs):
         recipe = self.get_object()
         if request.method == 'GET':
-            average_rating = Rating.objects.\
-                filter(recipe=recipe).aggregate(avg_rating=Avg('value'))
-            return Response(average_rating)
+            return Response({'avg_rating': recipe.rating_average})
+
+    @action(detail=True, methods=['GET', 'HEAD', 'OPTIONS'])
+    def get_rating_histogram(self, request, *args, **kwargs):
+        recipe = self.get_object()
+        return Response(self.get_rating_histogram_data(recipe.rating_count, recipe.rating_average,
+                                                       recipe.rating_histogram))
+
+    def get_rating_histogram_data(self, count, average, histogram):
+        # Histogram is made of counters stored on recipe, index of
+        # every count in histogram is value of ratings it counts
+        return {'count': count, 'average': average, 'histogram': histogram}
 
     @action(detail=True,  methods=['GET', 'HEAD', 'OPTIONS'])
     def get_images(self, request, *args, **kwargs):
@@ -114,19 +515,94 @@ class RecipeViewSet(viewsets.ModelViewSet):
         images = RecipeImage.objects.\
             select_related('recipe').\
             filter(recipe=recipe).all()
-        if request.method == 'GET':
-            serializer = RecipeImageSerializer(
-                images, many=True,
-                context={'request': request}
-            )
-            return Response(serializer.data)
-
-
-class IngredientViewSet(viewsets.ModelViewSet):
+        return self.get_sub_collection_response(images, RecipeImageSerializer,
+                                                ordering=['id'])
+
+    async def aretrieve(self, request, *args, **kwargs):
+        # Recipe and every collection embedded with '?expand='
+        # are loaded concurrently instead of with prefetch_related
+        prefetches = self.get_expand_prefetches()
+        recipe_queryset = self.get_object_queryset().prefetch_related(None)
+        queries = [recipe_queryset.first]
+        for name in prefetches:
+            prefetch = self.expand_prefetches[name]
+            related = getattr(Recipe, name)
+            queryset = prefetch.queryset if prefetch.queryset is not None else \
+                related.rel.related_model.objects.all()
+            queryset = queryset.filter(**{related.field.name: self.kwargs['pk']})
+            if name in self.expand_limits:
+                queryset = queryset[:self.expand_limits[name]]
+            queries.append(lambda queryset=queryset: list(queryset))
+        recipe, *collections = await gather_queries(*queries)
+        self.check_object(recipe)
+        for (name, prefetch), objects in zip(prefetches.items(), collections):
+            if prefetch.to_attr:
+                for obj in objects:
+                    setattr(obj, getattr(Recipe, name).field.name, recipe)
+                setattr(recipe, prefetch.to_attr, objects)
+            else:
+                set_prefetched_objects(recipe, name, objects)
+        serializer = self.get_serializer(recipe)
+        return Response(get_serialized_data(serializer))
+
+    async def aget_ingredients(self, request, *args, **kwargs):
+        ingredients = Ingredient.objects.select_related('recipe')
+        return await self.aget_sub_collection_response(ingredients, 'recipe', IngredientSerializer,
+                                                       ordering=['name', 'id'])
+
+    async def aget_reviews(self, request, *args, **kwargs):
+        reviews = Review.objects.select_related('recipe', 'author')
+        return await self.aget_sub_collection_response(reviews, 'recipe', ReviewSerializer,
+                                                       ordering=['-published', '-id'])
+
+    async def aget_ratings(self, request, *args, **kwargs):
+        ratings = Rating.objects.select_related('author', 'recipe')
+        return await self.aget_sub_collection_response(ratings, 'recipe', RatingSerializer,
+                                                       ordering=['-published', '-id'])
+
+    async def aget_average_rating(self, request, *args, **kwargs):
+        values = await self.get_object_queryset().values('rating_average').afirst()
+        if values is None:
+            raise Http404
+        return Response({'avg_rating': values['rating_average']})
+
+    async def aget_rating_histogram(self, request, *args, **kwargs):
+        values = await self.get_object_queryset().\
+            values('rating_count', 'rating_average', *HISTOGRAM_FIELDS).afirst()
+        if values is None:
+            raise Http404
+        return Response(self.get_rating_histogram_data(
+            values['rating_count'], values['rating_average'],
+            [values[field] for field in HISTOGRAM_FIELDS]
+        ))
+
+    async def aget_images(self, request, *args, **kwargs):
+        images = RecipeImage.objects.select_related('recipe')
+        return await self.aget_sub_collection_response(images, 'recipe', RecipeImageSerializer,
+                                                       ordering=['id'])
+
+
+class NestedRecipeMixin:
+    # Resolves recipe referenced in url of nested route once per request,
+    # permissions, querysets and perform_create of view all reuse it
+    def get_recipe(self):
+        if not hasattr(self, '_recipe'):
+            recipe_id = self.kwargs['recipe_pk']
+            recipe = Recipe.objects.select_related('author').\
+                filter(id=recipe_id).first()
+            if not recipe:
+                raise NotFound(
+                    detail=f"Recipe with id {recipe_id} was not found.")
+            self._recipe = recipe
+        return self._recipe
+
+
+class IngredientViewSet(SerializerMetricsMixin, NestedRecipeMixin, viewsets.ModelViewSet):
     permission_classes = [IsRecipeAuthorOrReadOnly]
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
     search_fields = ['name, slug']
     ordering_fields = ['name', 'slug']
+    max_bulk_size = 100
 
     def get_serializer_class(self):
         if self.request.method in SAFE_METHODS:
@@ -137,49 +613,118 @@ class IngredientViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         return Ingredient.objects.\
             select_related('recipe', 'recipe__author').\
-            filter(recipe__id=self.kwargs['recipe_pk']).all()
+            filter(recipe=self.get_recipe()).all()
+
+    def resolve_canonical_id(self, name):
+        # Name is looked up in dictionary of ingredients, aliases
+        # resolve to ingredient they were merged into
+        return CanonicalIngredient.resolve([name])[slugify(name)]
 
     def perform_create(self, serializer):
-        ingredient_name = str(self.request.data['name']).lower()
+        recipe = self.get_recipe()
+        ingredient_name = serializer.validated_data['name'].lower()
         ingredient = Ingredient.objects.filter(
             Q(name=ingredient_name) &
-            Q(recipe__id=self.kwargs['recipe_pk'])
+            Q(recipe=recipe)
         ).first()
         if ingredient:
             raise ValidationError(
                 detail=f"Ingredient with name '{ingredient_name}' already exists for this recipe.")
-        serializer.save(recipe_id=self.kwargs['recipe_pk'])
+        serializer.save(recipe=recipe, canonical_id=self.resolve_canonical_id(ingredient_name))
 
     def perform_update(self, serializer):
-        ingredient = self.get_object()
-        ingredient_name = str(self.request.data['name']).lower()
+        ingredient = serializer.instance
+        # Name can be left out of PATCH
+        ingredient_name = serializer.validated_data.get('name', ingredient.name).lower()
         ingredient_with_name = Ingredient.objects.filter(
-            Q(recipe__id=self.kwargs['recipe_pk']) &
+            Q(recipe=self.get_recipe()) &
             Q(name=ingredient_name)
         ).first()
         if ingredient_with_name and (ingredient_with_name != ingredient):
             raise ValidationError(detail=f"Ingredient with name '{ingredient_name}' already exists\
                                     for this recipe.")
-        return super().perform_update(serializer)
-
-
-class RecipeImageViewSet(mixins.ListModelMixin,
+        serializer.save(canonical_id=self.resolve_canonical_id(ingredient_name))
+
+    @action(detail=False, methods=['POST', 'PUT'])
+    def bulk(self, request, *args, **kwargs):
+        # POST adds list of ingredients to recipe, PUT replaces
+        # all ingredients of recipe with the list
+        recipe = self.get_recipe()
+        if not isinstance(request.data, list):
+            raise ValidationError(detail='Expected a list of ingredients.')
+        if len(request.data) > self.max_bulk_size:
+            raise ValidationError(
+                detail=f"More than {self.max_bulk_size} ingredients cannot be posted at once.")
+        serializer = CreateUpdateIngredientSerializer(data=request.data, many=True,
+                                                      context=self.get_serializer_context())
+        serializer.is_valid(raise_exception=True)
+
+        names = [item['name'].lower() for item in serializer.validated_data]
+        existing_names = set()
+        if request.method == 'POST':
+            existing_names = set(Ingredient.objects.filter(
+                Q(recipe=recipe) &
+                Q(name__in=names)
+            ).values_list('name', flat=True))
+        errors = []
+        seen_names = set()
+        for name in names:
+            if name in existing_names:
+                errors.append({'name': [f"Ingredient with name '{name}' already exists for this recipe."]})
+            elif name in seen_names:
+                errors.append({'name': [f"Ingredient with name '{name}' is repeated in the list."]})
+            else:
+                errors.append({})
+            seen_names.add(name)
+        if any(errors):
+            raise ValidationError(detail=errors)
+
+        ingredients = [Ingredient(recipe=recipe, **item)
+                       for item in serializer.validated_data]
+        canonical_ids = CanonicalIngredient.resolve(names)
+        for ingredient in ingredients:
+            ingredient.normalize_name()
+            ingredient.canonical_id = canonical_ids[ingredient.slug]
+        with transaction.atomic():
+            if request.method == 'PUT':
+                Ingredient.objects.filter(recipe=recipe).delete()
+            Ingredient.objects.bulk_create(ingredients)
+            ingredient_index.apply_on_commit(
+                added=[(ingredient.canonical_id, recipe.pk) for ingredient in ingredients])
+        # bulk_create does not send post_save signals
+        invalidate_tags([f'recipe:{recipe.pk}', 'ingredient'])
+
+        # Primary keys are not set by bulk_create on every database
+        created = Ingredient.objects.select_related('recipe').\
+            filter(Q(recipe=recipe) & Q(name__in=names))
+        serializer = IngredientSerializer(created, many=True,
+                                          context=self.get_serializer_context())
+        # PUT replaces existing collection, so it is not creation of a new resource
+        response_status = status.HTTP_200_OK if request.method == 'PUT' else status.HTTP_201_CREATED
+        return Response(get_serialized_data(serializer), status=response_status)
+
+
+class RecipeImageViewSet(SerializerMetricsMixin,
+                         UploadLimitsMixin,
+                         NestedRecipeMixin,
+                         mixins.ListModelMixin,
                          mixins.RetrieveModelMixin,
                          mixins.CreateModelMixin,
                          mixins.DestroyModelMixin,
                          viewsets.GenericViewSet):
     serializer_class = RecipeImageSerializer
     permission_classes = [IsRecipeAuthorOrReadOnly]
+    upload_limits = {'image': MAX_IMAGE_KB_SIZE * 1024}
 
     def get_queryset(self):
         return RecipeImage.objects.\
             select_related('recipe', 'recipe__author').\
-            filter(recipe__id=self.kwargs['recipe_pk']).all()
+            filter(recipe=self.get_recipe()).all()
 
     def perform_create(self, serializer):
-        recipe_pk = self.kwargs['recipe_pk']
+        recipe = self.get_recipe()
         number_of_images = RecipeImage.objects.filter(
-            recipe__id=recipe_pk
+            recipe=recipe
         ).count()
         max_number_of_images = 3
         if number_of_images == max_number_of_images:
@@ -187,29 +732,32 @@ class RecipeImageViewSet(mixins.ListModelMixin,
                 detail=f"More than {max_number_of_images} images cannot be posted for one recipe."
             )
         else:
-            serializer.save(recipe_id=self.kwargs['recipe_pk'])
+            serializer.save(recipe=recipe)
 
 
-class ReviewViewSet(viewsets.ModelViewSet):
+class ReviewViewSet(SerializerMetricsMixin, ConditionalGetMixin, NestedRecipeMixin,
+                    viewsets.ModelViewSet):
     serializer_class = ReviewSerializer
     permission_classes = [
         NestedIsAuthenticatedOrReadOnly, NestedIsAuthorOrReadOnly]
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
     search_fields = ['author__username', 'content']
     ordering_fields = ['author__username', 'content', 'published']
+    ordering = ['-published', '-id']
+    pagination_class = PageNumberOrCursorPagination
+    cursor_ordering_fields = ['published']
+    validator_relations = ['author', 'recipe']
 
     def get_queryset(self):
-        recipe_pk = self.kwargs['recipe_pk']
-        recipe = Recipe.objects.filter(id=recipe_pk).first()
         return Review.objects.select_related('recipe', 'author').\
-            filter(recipe=recipe).all()
+            filter(recipe=self.get_recipe()).all()
 
     def perform_create(self, serializer):
-        recipe_pk = self.kwargs['recipe_pk']
+        recipe = self.get_recipe()
         user_pk = self.request.user.id
         review = Review.objects.filter(
             Q(author__id=user_pk) &
-            Q(recipe__id=recipe_pk)
+            Q(recipe=recipe)
         ).first()
         if review:
             raise ConflictException(
@@ -217,28 +765,31 @@ class ReviewViewSet(viewsets.ModelViewSet):
                 detail='User can only have one review for each recipe.'
             )
         serializer.save(
-            recipe_id=recipe_pk,
+            recipe=recipe,
             author_id=user_pk
         )
 
 
-class RatingViewSet(viewsets.ModelViewSet):
+class RatingViewSet(SerializerMetricsMixin, ConditionalGetMixin, NestedRecipeMixin,
+                    viewsets.ModelViewSet):
     serializer_class = RatingSerializer
     permission_classes = [
         NestedIsAuthenticatedOrReadOnly, NestedIsAuthorOrReadOnly]
+    ordering = ['-published', '-id']
+    pagination_class = PageNumberOrCursorPagination
+    cursor_ordering_fields = ['published']
+    validator_relations = ['author', 'recipe']
 
     def get_queryset(self):
-        recipe_pk = self.kwargs['recipe_pk']
-        recipe = Recipe.objects.filter(id=recipe_pk).first()
         return Rating.objects.select_related('recipe', 'author').\
-            filter(recipe=recipe).all()
+            filter(recipe=self.get_recipe()).all()
 
     def perform_create(self, serializer):
-        recipe_pk = self.kwargs['recipe_pk']
+        recipe = self.get_recipe()
         user_pk = self.request.user.id
         rating = Rating.objects.filter(
             Q(author__id=user_pk) &
-            Q(recipe__id=recipe_pk)
+            Q(recipe=recipe)
         ).first()
         if rating:
             raise ConflictException(
@@ -246,24 +797,66 @@ class RatingViewSet(viewsets.ModelViewSet):
                 detail='User can only have one rating for each recipe.'
             )
         serializer.save(
-            recipe_id=recipe_pk,
+            recipe=recipe,
             author_id=user_pk
         )
 
 
-class AuthorViewSet(viewsets.ReadOnlyModelViewSet):
+class AuthorViewSet(SerializerMetricsMixin, ResponseCacheMixin, AsyncReadMixin, SubCollectionMixin,
+                    viewsets.ReadOnlyModelViewSet):
     queryset = CustomUser.objects.filter(is_superuser=False).all()
     serializer_class = AuthorSerializer
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
-    searching_fields = ['username']
-    ordering_fields = ['username']
+    search_fields = ['username']
+    ordering_fields = ['username', 'recipe_count', 'review_count', 'rating_count']
+    ordering = ['username', 'id']
+    pagination_class = PageNumberOrCursorPagination
+    cursor_ordering_fields = ['username']
+    cache_tags = {
+        'list': ['author'],
+        'retrieve': ['author:{pk}'],
+        'get_recipes': ['author:{pk}', 'recipe'],
+        'autocomplete': ['author'],
+    }
+    item_tags = {
+        'list': ['author:{id}'],
+        'get_recipes': ['recipe:{id}', 'category:{category_id}'],
+        'autocomplete': ['author:{id}'],
+    }
+    item_models = {'get_recipes': Recipe}
+    ordering_tags = {'recipe_count': 'recipe', 'review_count': 'review', 'rating_count': 'rating'}
+    async_actions = ['list', 'retrieve', 'get_recipes']
+    autocomplete_query_param = 'q'
+    limit_query_param = 'limit'
+
+    @action(detail=False, methods=['GET', 'OPTIONS', 'HEAD'])
+    def autocomplete(self, request, *args, **kwargs):
+        # Authors whose usernames start with '?q=', case-insensitively.
+        # Prefix is looked up as range of index on folded usernames,
+        # so every keystroke reads only rows that are returned
+        autocomplete_settings = get_autocomplete_settings()
+        limit = get_limit(request, self.limit_query_param,
+                          autocomplete_settings['DEFAULT_LIMIT'],
+                          autocomplete_settings['MAX_LIMIT'])
+        prefix = fold_username(request.query_params.get(self.autocomplete_query_param, '').strip())
+        if not prefix:
+            return Response([])
+        authors = self.get_queryset().\
+            filter(**prefix_range('username_folded', prefix)).\
+            order_by('username_folded', 'id')[:limit]
+        serializer = AuthorAutocompleteSerializer(authors, many=True,
+                                                  context={'request': request})
+        return Response(get_serialized_data(serializer))
 
     @action(detail=True, methods=['GET', 'OPTIONS', 'HEAD'])
     def get_recipes(self, request, *args, **kwargs):
         author = self.get_object()
         recipes = Recipe.objects.select_related('category', 'author').\
             filter(author=author).all()
-        if request.method == 'GET':
-            serializer = RecipeSerializer(recipes, many=True,
-                                          context={'request': request})
-            return Response(serializer.data)
+        return self.get_sub_collection_response(recipes, RecipeSerializer,
+                                                ordering=['title', 'id'])
+
+    async def aget_recipes(self, request, *args, **kwargs):
+        recipes = Recipe.objects.select_related('category', 'author')
+        return await self.aget_sub_collection_response(recipes, 'author', RecipeSerializer,
+                                                       ordering=['title', 'id'])
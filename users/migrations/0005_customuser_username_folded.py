@@ -0,0 +1,37 @@
+# Generated by Django 4.2.4 on 2026-10-18 09:55
+
+from django.db import migrations, models
+
+
+CHUNK_SIZE = 2000
+
+
+def fold_usernames(apps, schema_editor):
+    # Usernames are folded in Python, casefold() of SQL does not exist
+    CustomUser = apps.get_model('users', 'CustomUser')
+    last_id = 0
+    while True:
+        users = list(CustomUser.objects.filter(id__gt=last_id).order_by('id').
+                     only('id', 'username')[:CHUNK_SIZE])
+        if not users:
+            break
+        for user in users:
+            user.username_folded = user.username.casefold()[:150]
+        CustomUser.objects.bulk_update(users, ['username_folded'])
+        last_id = users[-1].id
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0004_customuser_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='username_folded',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=150),
+        ),
+        migrations.RunPython(fold_usernames, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.4 on 2026-10-18 11:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0005_customuser_username_folded'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='updated',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
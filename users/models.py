@@ -1,10 +1,21 @@
 from django.db import models
+from django.db.models import F
 from django.core.exceptions import ValidationError
 from django.contrib.auth.models import AbstractUser
 
 
+MAX_IMAGE_KB_SIZE = 500
+USERNAME_MAX_LENGTH = 150
+
+
+def fold_username(username):
+    # Case-insensitive form of username, casefold() can make
+    # username longer, e.g. 'ß' becomes 'ss'
+    return username.casefold()[:USERNAME_MAX_LENGTH]
+
+
 def validate_file_size(file):
-    max_kb_size = 500
+    max_kb_size = MAX_IMAGE_KB_SIZE
 
     if file.size > max_kb_size * 1024:
         raise ValidationError(f'Files cannot be larger than {max_kb_size}KB')
@@ -19,6 +30,43 @@ class CustomUser(AbstractUser):
     email = models.EmailField(unique=True)
     image = models.ImageField(upload_to='users/images/',
                               validators=[validate_file_size], null=True)
+    # Counters of user's recipes, reviews and ratings, they are
+    # maintained by signals in recipes.signals, so they should never be set directly
+    recipe_count = models.PositiveIntegerField(default=0, db_index=True)
+    review_count = models.PositiveIntegerField(default=0, db_index=True)
+    rating_count = models.PositiveIntegerField(default=0, db_index=True)
+    # Username in one case, autocomplete of usernames reads
+    # ranges of its index, it is set from username on every save
+    username_folded = models.CharField(max_length=USERNAME_MAX_LENGTH, default='',
+                                       editable=False, db_index=True)
+    # Username is shown in recipes, reviews and ratings, so conditional GET
+    # of them uses it(see recipes/conditional.py)
+    updated = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['username']
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember username and image that are stored in the database,
+        # so that recipes of user are indexed for search again and cached
+        # responses that show user are invalidated only when they change
+        instance._loaded_username = instance.__dict__.get('username')
+        instance._loaded_image = instance.__dict__.get('image') or None
+        return instance
+
+    def save(self, *args, **kwargs):
+        self.username_folded = fold_username(self.username)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'username' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'username_folded'}
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def update_counters(cls, user_id, **deltas):
+        # Counters are moved with F expressions, so concurrent writes
+        # do not overwrite each other
+        cls.objects.filter(pk=user_id).update(
+            **{name: F(name) + delta for name, delta in deltas.items()}
+        )
@@ -0,0 +1,8 @@
+from rest_framework.routers import DefaultRouter
+from users.views import UserViewSet
+
+# Replaces router of djoser.urls, so that uploads of user images are limited
+router = DefaultRouter()
+router.register('users', UserViewSet)
+
+urlpatterns = router.urls
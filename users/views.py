@@ -1,3 +1,8 @@
-from django.shortcuts import render
+from djoser.views import UserViewSet as BaseUserViewSet
+from recipes.metrics import SerializerMetricsMixin
+from recipes.uploads import UploadLimitsMixin
+from users.models import MAX_IMAGE_KB_SIZE
 
-# Create your views here.
+
+class UserViewSet(SerializerMetricsMixin, UploadLimitsMixin, BaseUserViewSet):
+    upload_limits = {'image': MAX_IMAGE_KB_SIZE * 1024}